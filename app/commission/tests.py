@@ -1,3 +1,19 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from commission.views import _csv_chunks, _gzip_chunks
+
+
+class StatementStreamingTests(SimpleTestCase):
+    def test_csv_is_sent_in_chunks_of_lines(self):
+        rows = [[f'agent{i}', f'{i}.00'] for i in range(5)]
+        chunks = list(_csv_chunks(['Agent', 'Amount'], rows, chunk_size=2))
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [2, 2, 2])
+        self.assertEqual(list(csv.reader(io.StringIO(''.join(chunks)))), [['Agent', 'Amount'], *rows])
+
+    def test_gzip_variant_decompresses_to_the_csv(self):
+        chunks = list(_csv_chunks(['Agent', 'Amount'], [['a, b', '1.00']]))
+        self.assertEqual(gzip.decompress(b''.join(_gzip_chunks(iter(chunks)))).decode(), ''.join(chunks))
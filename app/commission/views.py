@@ -2,8 +2,9 @@
 import json
 import csv
 import datetime
+import zlib
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.db import transaction
 from django.db.models import Q, Sum, Count
 from django.views.decorators.http import require_POST, require_GET
@@ -11,7 +12,7 @@ from django.utils.dateparse import parse_date
 from django.utils import timezone
 
 from inventory.views import staff_required
-from core.dates import format_display_date, format_display_datetime
+from core.dates import DISPLAY_DATE_FORMAT, DISPLAY_DATETIME_FORMAT, format_display_date
 from .models import CommissionLedger
 
 @staff_required
@@ -149,46 +150,118 @@ def api_pay_commissions(request):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+STATEMENT_HEADERS = [
+    'Date Earned', 'Agent Username', 'Agent Email', 'Order ID', 'Product', 'Quantity', 'Amount (RM)', 'Status', 'Paid Date',
+]
+# Ledger rows fetched per database round trip, and CSV lines sent per response chunk.
+STATEMENT_CHUNK_SIZE = 2000
+
+
+class _EchoBuffer:
+    """csv.writer target that returns each formatted line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(header, rows, chunk_size=STATEMENT_CHUNK_SIZE):
+    """CSV text in chunks of chunk_size lines, so the response is not one write per row."""
+    writer = csv.writer(_EchoBuffer())
+    lines = [writer.writerow(header)]
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def _gzip_chunks(chunks):
+    """Gzip a stream of text chunks as it is sent (a .gz download, not Content-Encoding)."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)  # | 16: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _commission_statement_rows(qs):
+    """
+    Statement lines from a values_list projection streamed with .iterator(): no ledger
+    instances or related objects are built, and dates are formatted with the display
+    formats directly (one timezone lookup per export, not per row).
+    """
+    tz = timezone.get_current_timezone()
+    status_labels = dict(CommissionLedger.CommissionStatus.choices)
+    rows = qs.values_list(
+        'created_at',
+        'agent__username',
+        'agent__email',
+        'order_item__order_id',
+        'order_item__product__name',
+        'order_item__quantity',
+        'amount',
+        'status',
+        'paid_at',
+    ).iterator(chunk_size=STATEMENT_CHUNK_SIZE)
+    for created_at, username, email, order_id, product_name, quantity, amount, status, paid_at in rows:
+        yield [
+            created_at.astimezone(tz).strftime(DISPLAY_DATETIME_FORMAT),
+            username,
+            email,
+            order_id,
+            product_name,
+            quantity,
+            f"{amount:.2f}",
+            status_labels.get(status, status),
+            paid_at.astimezone(tz).strftime(DISPLAY_DATE_FORMAT) if paid_at else '-',
+        ]
+
+
 @staff_required
 @require_GET
 def export_commission_statement(request):
     """
-    Export commissions to CSV.
+    Stream commissions as CSV: the month/year statement, or every commission earned
+    between start_date and end_date (YYYY-MM-DD, either optional) when one is given.
+    gzip=1 streams a .csv.gz instead (for multi-year statements).
     """
     try:
         month = int(request.GET.get('month', timezone.now().month))
         year = int(request.GET.get('year', timezone.now().year))
-        status = request.GET.get('status', '')
-
-        qs = CommissionLedger.objects.filter(
-            created_at__year=year,
-            created_at__month=month
-        ).select_related('agent', 'order_item__order', 'order_item__product').order_by('created_at')
-
-        if status:
-            qs = qs.filter(status=status)
-
-        response = HttpResponse(content_type='text/csv')
+        start_date = parse_date(request.GET.get('start_date') or '')
+        end_date = parse_date(request.GET.get('end_date') or '')
+    except ValueError:
+        return HttpResponse("Invalid month, year or date.", status=400)
+    status = request.GET.get('status', '')
+    compress = request.GET.get('gzip') in ('1', 'true', 'on')
+
+    qs = CommissionLedger.objects.order_by('created_at')
+    if start_date or end_date:
+        if start_date:
+            qs = qs.filter(created_at__date__gte=start_date)
+        if end_date:
+            qs = qs.filter(created_at__date__lte=end_date)
+        filename_parts = ['commission_statement']
+        if start_date:
+            filename_parts.append(start_date.strftime('%Y%m%d'))
+        if end_date:
+            filename_parts.append(end_date.strftime('%Y%m%d'))
+        filename = f'{"_".join(filename_parts)}.csv'
+    else:
+        qs = qs.filter(created_at__year=year, created_at__month=month)
         filename = f"commission_statement_{year}_{month:02d}.csv"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-        writer = csv.writer(response)
-        writer.writerow(['Date Earned', 'Agent Username', 'Agent Email', 'Order ID', 'Product', 'Quantity', 'Amount (RM)', 'Status', 'Paid Date'])
-
-        for c in qs:
-            writer.writerow([
-                format_display_datetime(c.created_at),
-                c.agent.username,
-                c.agent.email,
-                c.order_item.order.id,
-                c.order_item.product.name,
-                c.order_item.quantity,
-                f"{c.amount:.2f}",
-                c.get_status_display(),
-                format_display_date(c.paid_at) if c.paid_at else '-'
-            ])
-
-        return response
 
-    except Exception as e:
-        return HttpResponse(f"Error exporting CSV: {str(e)}", status=500)
+    if status:
+        qs = qs.filter(status=status)
+
+    chunks = _csv_chunks(STATEMENT_HEADERS, _commission_statement_rows(qs))
+    if compress:
+        response = StreamingHttpResponse(_gzip_chunks(chunks), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(chunks, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,130 @@
+# distributorplatform/app/core/cache.py
+# Versioned two-level cache (a per-worker in-process L1 in front of the shared Redis cache),
+# and the raw Redis client behind it for sets, lists and sorted sets.
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def redis_connection():
+    """Raw Redis client behind the default cache, or None (e.g. LocMemCache in development)."""
+    try:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+class VersionedCache:
+    """
+    A namespace of cached values that are invalidated together.
+
+    Every key is stored in the shared cache as '<namespace>:v<version>:<key>'.
+    invalidate() bumps the namespace version (after the surrounding transaction
+    commits), so all old entries become unreachable at once and simply expire.
+
+    Each worker also keeps the current version and recently read values in
+    process memory for `l1_ttl` seconds. Hot reads therefore skip Redis
+    entirely; other workers pick up a bump within `l1_ttl` seconds.
+    If the shared cache is unreachable, values are built on every call.
+    """
+
+    def __init__(self, namespace: str, *, timeout: int = 60 * 60, l1_ttl: float = 5.0, l1_max_entries: int = 256):
+        self.namespace = namespace
+        self.timeout = timeout
+        self.l1_ttl = l1_ttl
+        self.l1_max_entries = l1_max_entries
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = 0.0
+        self._local: dict[str, tuple[object, object, float]] = {}
+
+    @property
+    def version_key(self) -> str:
+        return f"{self.namespace}:version"
+
+    def _full_key(self, version, key: str) -> str:
+        return f"{self.namespace}:v{version}:{key}"
+
+    def current_version(self):
+        """Shared namespace version, re-read from the shared cache at most every l1_ttl seconds."""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._version_checked_at < self.l1_ttl:
+                return self._version
+        try:
+            version = cache.get(self.version_key)
+            if version is None:
+                # Seed with a timestamp so a lost version key never resurrects old entries.
+                cache.add(self.version_key, time.time_ns(), timeout=None)
+                version = cache.get(self.version_key)
+        except Exception:
+            logger.warning("[VersionedCache] %s: shared cache unavailable", self.namespace, exc_info=True)
+            return None
+        with self._lock:
+            self._version = version
+            self._version_checked_at = now
+        return version
+
+    def get_or_build(self, key: str, builder):
+        """Return the cached value for key, calling builder() and storing the result on a miss."""
+        version = self.current_version()
+        if version is None:
+            return builder()
+
+        now = time.monotonic()
+        with self._lock:
+            local = self._local.get(key)
+            if local is not None and local[0] == version and local[2] > now:
+                return local[1]
+
+        full_key = self._full_key(version, key)
+        try:
+            value = cache.get(full_key, _MISSING)
+        except Exception:
+            logger.warning("[VersionedCache] %s: read failed for %s", self.namespace, key, exc_info=True)
+            value = _MISSING
+
+        if value is _MISSING:
+            value = builder()
+            try:
+                cache.set(full_key, value, self.timeout)
+            except Exception:
+                logger.warning("[VersionedCache] %s: write failed for %s", self.namespace, key, exc_info=True)
+
+        with self._lock:
+            if len(self._local) >= self.l1_max_entries:
+                self._local.clear()
+            self._local[key] = (version, value, now + self.l1_ttl)
+        return value
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._version = None
+            self._version_checked_at = 0.0
+            self._local.clear()
+
+    def _bump(self) -> None:
+        self.clear_local()
+        try:
+            try:
+                cache.incr(self.version_key)
+            except ValueError:
+                # Version key missing (evicted or never seeded): start a fresh timestamp version.
+                cache.set(self.version_key, time.time_ns(), timeout=None)
+        except Exception:
+            logger.warning("[VersionedCache] %s: could not bump version", self.namespace, exc_info=True)
+
+    def invalidate(self) -> None:
+        """Drop every entry in the namespace once the current transaction commits."""
+        transaction.on_commit(self._bump)
@@ -1,10 +1,17 @@
 # distributorplatform/app/core/context_processors.py
+from .cache import VersionedCache
 from .models import SiteSetting, ProductFeature, Banner
 from blog.models import Post
 
-def site_settings_context(request):
+# Site chrome (settings, menus, features, banners) is identical for every visitor.
+# Invalidated by core.signals whenever one of the source models changes.
+site_chrome_cache = VersionedCache('site_chrome')
+
+
+def build_site_chrome():
     """
-    Returns the singleton SiteSetting object, global footer links, and main menu links.
+    Loads the singleton SiteSetting object, global footer links, main menu links,
+    product features and active banners as plain lists so the bundle can be cached.
     """
     try:
         # Get the first object, or create one if it doesn't exist
@@ -16,24 +23,24 @@ def site_settings_context(request):
 
     # Fetch Footer Links
     try:
-        footer_quick_links = Post.objects.filter(
+        footer_quick_links = list(Post.objects.filter(
             post_type=Post.PostType.FOOTER_LINK,
             status=Post.PostStatus.PUBLISHED
-        ).order_by('title')
+        ).order_by('title'))
     except Exception:
         footer_quick_links = []
 
     # --- NEW: Fetch Main Menu Links ---
     try:
-        main_menu_links = Post.objects.filter(
+        main_menu_links = list(Post.objects.filter(
             post_type=Post.PostType.MAIN_MENU,
             status=Post.PostStatus.PUBLISHED
-        ).order_by('order', 'created_at') # Sort by Order first
+        ).order_by('order', 'created_at')) # Sort by Order first
     except Exception:
         main_menu_links = []
 
     try:
-        global_product_features = ProductFeature.objects.all().order_by('order')
+        global_product_features = list(ProductFeature.objects.all().order_by('order'))
     except Exception:
         global_product_features = []
 
@@ -41,9 +48,9 @@ def site_settings_context(request):
         location='HOME_HERO', is_active=True
     ).order_by('order', '-created_at').first()
 
-    active_home_sub_banners = Banner.objects.filter(
+    active_home_sub_banners = list(Banner.objects.filter(
         location='HOME_SUB', is_active=True
-    ).order_by('order', '-created_at')[:2]
+    ).order_by('order', '-created_at')[:2])
 
     active_global_banner = Banner.objects.filter(
         location='GLOBAL_TOP', is_active=True
@@ -58,3 +65,11 @@ def site_settings_context(request):
         'active_home_sub_banners': active_home_sub_banners,
         'active_global_banner': active_global_banner,
     }
+
+
+def site_settings_context(request):
+    """
+    Returns the singleton SiteSetting object, global footer links, and main menu links.
+    Served from the versioned site chrome cache, so a warm page view runs no queries here.
+    """
+    return dict(site_chrome_cache.get_or_build('bundle', build_site_chrome))
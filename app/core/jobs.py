@@ -0,0 +1,259 @@
+# distributorplatform/app/core/jobs.py
+# Background jobs: task registry, Redis-list queue, worker loop and the JSON the browser polls.
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core.cache import redis_connection
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'jobs:queue'
+# Redis set of job ids pushed to QUEUE_KEY and not yet run; a queued job missing from it
+# was never pushed (or Redis lost both), so recovery pushes it again.
+PUSHED_KEY = 'jobs:pushed'
+# Finished jobs (and their files) are kept this long for downloads and diagnostics.
+JOB_RETENTION = timedelta(days=7)
+# The worker refreshes a running job's heartbeat_at this often (seconds).
+HEARTBEAT_INTERVAL = 30
+# A running job whose heartbeat is this old lost its worker (crash, redeploy).
+STALE_AFTER = timedelta(minutes=5)
+# Queued jobs younger than this may still be waiting for their on_commit push.
+LOST_PUSH_AFTER = timedelta(minutes=1)
+RECOVER_INTERVAL = 300
+
+_TASKS = {}
+
+
+class JobFailed(Exception):
+    """Raised by a task to fail its job with a user-facing message; `detail` becomes the job result."""
+
+    def __init__(self, message, *, detail=None):
+        super().__init__(message)
+        self.detail = detail
+
+
+def job_task(kind: str):
+    """Register `func(job, **payload)` as the task run for jobs of this kind (in an app's tasks.py)."""
+    def register(func):
+        _TASKS[kind] = func
+        return func
+    return register
+
+
+def get_task(kind: str):
+    if kind not in _TASKS:
+        autodiscover_modules('tasks')
+    try:
+        return _TASKS[kind]
+    except KeyError:
+        raise LookupError(f'Unknown job kind {kind!r}.') from None
+
+
+def _push(job_id) -> None:
+    redis = redis_connection()
+    if redis is None:
+        # No Redis behind the cache: run in this process rather than never.
+        run_job(job_id)
+        return
+    try:
+        pipe = redis.pipeline()
+        pipe.sadd(PUSHED_KEY, str(job_id))
+        pipe.lpush(QUEUE_KEY, str(job_id))
+        pipe.execute()
+    except Exception:
+        # The job stays queued; the worker re-pushes it on its next recovery pass.
+        logger.warning('[jobs] could not queue job %s', job_id, exc_info=True)
+
+
+def purge_expired_jobs() -> int:
+    """Delete jobs older than JOB_RETENTION together with their stored files."""
+    from core.models import Job
+
+    expired = Job.objects.filter(created_at__lt=timezone.now() - JOB_RETENTION)
+    for job in expired.exclude(input_file='', result_file=''):
+        for field in (job.input_file, job.result_file):
+            if field:
+                field.delete(save=False)
+    return expired.delete()[0]
+
+
+def enqueue(kind: str, *, user=None, payload=None, input_file=None):
+    """
+    Create a job and hand it to the configured backend. With JOB_BACKEND='redis' the job
+    is pushed once the surrounding transaction commits and the caller returns at once;
+    with 'sync' it runs before enqueue() returns. `input_file` (e.g. an upload) is
+    copied to job storage so a worker on another host can read it.
+    """
+    from core.models import Job
+
+    get_task(kind)
+    purge_expired_jobs()
+    job = Job(kind=kind, created_by=user, payload=payload or {})
+    if input_file is not None:
+        job.input_file.save(os.path.basename(input_file.name), input_file, save=False)
+    job.save()
+    if settings.JOB_BACKEND == 'sync':
+        run_job(job.pk)
+        job.refresh_from_db()
+    else:
+        transaction.on_commit(lambda: _push(job.pk))
+    return job
+
+
+@contextmanager
+def _heartbeat(job_id):
+    """Refresh the running job's heartbeat_at every HEARTBEAT_INTERVAL seconds from a side thread."""
+    from core.models import Job
+
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                Job.objects.filter(pk=job_id, status=Job.Status.RUNNING).update(heartbeat_at=timezone.now())
+        except Exception:
+            logger.warning('[jobs] heartbeat for job %s stopped', job_id, exc_info=True)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'job-heartbeat-{job_id}', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job_id) -> bool:
+    """
+    Claim a queued job and run its task, recording the result or the error.
+    Returns False when the job is gone or another worker already claimed it.
+    The outcome is only written while the job is still RUNNING, so a job that
+    recovery already failed as stale stays failed.
+    """
+    from core.models import Job
+
+    now = timezone.now()
+    claimed = Job.objects.filter(pk=job_id, status=Job.Status.QUEUED).update(
+        status=Job.Status.RUNNING, started_at=now, heartbeat_at=now,
+    )
+    if not claimed:
+        return False
+    job = Job.objects.get(pk=job_id)
+    started = time.monotonic()
+    try:
+        with _heartbeat(job.pk):
+            result = get_task(job.kind)(job, **job.payload)
+    except JobFailed as exc:
+        job.status, job.error, job.result = Job.Status.FAILED, str(exc), exc.detail
+    except Exception as exc:
+        logger.exception('[jobs] %s %s failed', job.kind, job.pk)
+        job.status, job.error = Job.Status.FAILED, str(exc) or exc.__class__.__name__
+    else:
+        job.status, job.result, job.percent = Job.Status.SUCCEEDED, result, 100
+    job.finished_at = timezone.now()
+    written = Job.objects.filter(pk=job.pk, status=Job.Status.RUNNING).update(
+        status=job.status, result=job.result, error=job.error, percent=job.percent, finished_at=job.finished_at,
+    )
+    if not written:
+        logger.warning('[jobs] %s %s finished after it was marked stale; outcome %s dropped',
+                       job.kind, job.pk, job.status)
+    logger.info('[jobs] %s %s %s in %.1fs', job.kind, job.pk, job.status, time.monotonic() - started)
+    return True
+
+
+def recover_lost_jobs() -> tuple[int, int]:
+    """
+    Fail running jobs whose heartbeat stopped (the worker died) and re-push queued jobs
+    that are not in PUSHED_KEY (the push failed, or Redis lost the queue). Jobs waiting
+    their turn in the queue are left alone. Returns (requeued, failed).
+    """
+    from core.models import Job
+
+    now = timezone.now()
+    cutoff = now - STALE_AFTER
+    failed = Job.objects.filter(status=Job.Status.RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+    ).update(status=Job.Status.FAILED, error='The worker stopped before the job finished.', finished_at=now)
+    queued = [
+        str(pk) for pk in Job.objects.filter(status=Job.Status.QUEUED, created_at__lt=now - LOST_PUSH_AFTER)
+        .order_by('created_at').values_list('pk', flat=True)
+    ]
+    redis = redis_connection()
+    if queued and redis is not None:
+        queued = [job_id for job_id, pushed in zip(queued, redis.smismember(PUSHED_KEY, queued)) if not pushed]
+    for job_id in queued:
+        _push(job_id)
+    return len(queued), failed
+
+
+def work(*, burst=False, max_jobs=None, should_stop=lambda: False, poll_timeout=5) -> int:
+    """
+    Worker loop: pop job ids from the Redis queue and run them until should_stop()
+    (checked between jobs), max_jobs jobs ran, or, with burst, the queue is empty.
+    Returns the number of jobs run.
+    """
+    redis = redis_connection()
+    if redis is None:
+        raise ImproperlyConfigured('The job worker needs the django_redis cache backend.')
+    processed = 0
+    last_recovery = time.monotonic()
+    while not should_stop() and (max_jobs is None or processed < max_jobs):
+        if time.monotonic() - last_recovery > RECOVER_INTERVAL:
+            recover_lost_jobs()
+            last_recovery = time.monotonic()
+        item = redis.brpop(QUEUE_KEY, timeout=poll_timeout)
+        if item is None:
+            if burst:
+                break
+            continue
+        job_id = item[1].decode()
+        close_old_connections()
+        try:
+            if run_job(job_id):
+                processed += 1
+        except Exception:
+            logger.exception('[jobs] could not run job %s', job_id)
+        finally:
+            redis.srem(PUSHED_KEY, job_id)
+            close_old_connections()
+    return processed
+
+
+def serialize_job(job) -> dict:
+    """What the status endpoint (and every enqueueing endpoint) returns for a job."""
+    return {
+        'id': str(job.pk),
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'percent': job.percent,
+        'message': job.message,
+        'result': job.result,
+        'error': job.error,
+        'status_url': reverse('core:job_status', args=[job.pk]),
+        'file_url': reverse('core:job_file', args=[job.pk]) if job.result_file else None,
+        'filename': job.result_filename,
+    }
+
+
+def job_accepted_response(job) -> JsonResponse:
+    """202 response for an enqueueing endpoint; the browser polls job.status_url (see waitForJob)."""
+    return JsonResponse({'success': True, 'job': serialize_job(job)}, status=202)
@@ -0,0 +1,74 @@
+# distributorplatform/app/core/management/commands/run_job_worker.py
+# Long-running worker for background jobs (imports, exports, cost syncs) queued in Redis.
+
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.jobs import recover_lost_jobs, work
+
+
+def _work_until_signalled(burst, max_jobs):
+    """Run jobs until SIGTERM/SIGINT; the job in progress is finished first."""
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    return work(burst=burst, max_jobs=max_jobs, should_stop=lambda: bool(stopping))
+
+
+class Command(BaseCommand):
+    help = 'Runs background jobs queued in Redis (JOB_BACKEND=redis) in one or more worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=settings.JOB_WORKER_PROCESSES,
+            help='Worker processes; each runs one job at a time.',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Exit a worker after this many jobs (recycles memory when run under a supervisor).',
+        )
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        requeued, failed = recover_lost_jobs()
+        if requeued or failed:
+            self.stdout.write(f'Re-queued {requeued} lost job(s); failed {failed} stale job(s).')
+
+        processes = max(1, options['processes'])
+        if processes == 1:
+            processed = _work_until_signalled(options['burst'], options['max_jobs'])
+            self.stdout.write(self.style.SUCCESS(f'Job worker stopped after {processed} job(s).'))
+            return
+
+        # Children must not inherit the parent's database connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_work_until_signalled, args=(options['burst'], options['max_jobs']))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+
+        def stop_workers(signum, frame):
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+
+        signal.signal(signal.SIGTERM, stop_workers)
+        signal.signal(signal.SIGINT, stop_workers)
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS(f'{processes} job worker processes stopped.'))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_sitesetting_favicon'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitesetting',
+            name='homepage_category_product_limit',
+            field=models.PositiveSmallIntegerField(default=4, help_text='Number of products shown in each homepage category section.'),
+        ),
+    ]
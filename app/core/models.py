@@ -1,9 +1,13 @@
 # distributorplatform/app/core/models.py
 import os
+import uuid
 from io import BytesIO
 from PIL import Image
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
 
 class SiteSetting(models.Model):
@@ -277,6 +281,10 @@ class SiteSetting(models.Model):
         default="查看全部 | View All",
         help_text="Label for 'View All' links on the homepage category sections."
     )
+    homepage_category_product_limit = models.PositiveSmallIntegerField(
+        default=4,
+        help_text="Number of products shown in each homepage category section."
+    )
     place_order_add_text = models.CharField(
         max_length=50,
         default="加入购物车 | Add to Cart",
@@ -1095,3 +1103,97 @@ class PaymentOption(models.Model):
     class Meta:
         verbose_name = "Payment Option"
         verbose_name_plural = "Payment Options"
+
+
+class JobFileStorage(FileSystemStorage):
+    """
+    FileSystemStorage rooted at settings.JOB_FILES_ROOT, read on each access rather than
+    when the model is imported, so override_settings(JOB_FILES_ROOT=...) takes effect.
+    """
+    @property
+    def base_location(self):
+        return settings.JOB_FILES_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+def job_file_storage():
+    """Private storage for job inputs and results (settings.JOB_FILES_ROOT), downloaded through core:job_file."""
+    return JobFileStorage()
+
+
+class Job(models.Model):
+    """
+    A heavy import/export/sync run by the background worker (manage.py run_job_worker).
+    The enqueueing view returns immediately; the browser polls core:job_status until the
+    job succeeds (result / result_file) or fails (error). See core.jobs.
+    """
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        SUCCEEDED = 'succeeded', 'Succeeded'
+        FAILED = 'failed', 'Failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED, db_index=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        null=True,
+        blank=True,
+    )
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    input_file = models.FileField(upload_to='input/%Y/%m/', storage=job_file_storage, blank=True)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    percent = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    result_file = models.FileField(upload_to='results/%Y/%m/', storage=job_file_storage, blank=True)
+    result_filename = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while the task runs; see core.jobs.recover_lost_jobs.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.kind} {self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.SUCCEEDED, self.Status.FAILED)
+
+    def report_progress(self, progress, total=None, message=None):
+        """
+        Publish progress to pollers right away. Writes outside the model save, so call it
+        between the task's transactions: updates made inside an open transaction stay
+        invisible to the status endpoint until it commits.
+        """
+        if total is not None:
+            self.total = total
+        self.progress = progress
+        self.percent = min(100, progress * 100 // self.total) if self.total else 0
+        if message is not None:
+            self.message = message[:255]
+        Job.objects.filter(pk=self.pk).update(
+            progress=self.progress, total=self.total, percent=self.percent, message=self.message,
+        )
+
+    def save_result_file(self, filename, content):
+        """Store the job's output (bytes or a file object) as the download offered by core:job_file."""
+        if isinstance(content, bytes):
+            content = ContentFile(content)
+        elif not isinstance(content, File):
+            content = File(content)
+        self.result_filename = filename[:255]
+        self.result_file.save(filename, content, save=False)
+        Job.objects.filter(pk=self.pk).update(result_file=self.result_file.name, result_filename=self.result_filename)
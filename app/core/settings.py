@@ -205,6 +205,20 @@ TINYMCE_DEFAULT_CONFIG = {
 }
 TINYMCE_SPELLCHECKER = False
 
+# --- SUPPLIER PRICE-LIST PDF PARSING ---
+# Pages of multi-page PDFs are parsed in a process pool (1 = in-process, sequential).
+PDF_PARSE_WORKERS = int(os.environ.get('PDF_PARSE_WORKERS', min(4, os.cpu_count() or 1)))
+# Seconds a page may spend trying table strategies (keeps uploads under the 180s proxy timeout).
+PDF_PAGE_TIME_BUDGET = float(os.environ.get('PDF_PAGE_TIME_BUDGET', 20))
+
+# --- BACKGROUND JOBS ---
+# 'redis': jobs are queued in Redis and run by `manage.py run_job_worker`.
+# 'sync': jobs run inside the enqueueing request (tests, single-process development).
+JOB_BACKEND = os.environ.get('JOB_BACKEND', 'redis')
+JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', 2))
+# Uploaded inputs and generated exports; outside MEDIA_ROOT so Nginx never serves them.
+JOB_FILES_ROOT = os.environ.get('JOB_FILES_ROOT', '/vol/web/jobs')
+
 # --- EMAIL CONFIGURATION ---
 # Default to Console Backend for local dev (prints email to terminal)
 EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
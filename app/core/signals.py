@@ -0,0 +1,45 @@
+# distributorplatform/app/core/signals.py
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from blog.models import Post
+from .context_processors import site_chrome_cache
+from .models import SiteSetting, ThemeSetting, PaymentSetting, ProductFeature, Banner
+
+CHROME_POST_TYPES = {Post.PostType.FOOTER_LINK, Post.PostType.MAIN_MENU}
+
+
+def _invalidate_site_chrome(sender, **kwargs):
+    site_chrome_cache.invalidate()
+
+
+# Proxy models (Theme/Payment admin pages) send signals with their own class as sender.
+for _model in (SiteSetting, ThemeSetting, PaymentSetting, ProductFeature, Banner):
+    post_save.connect(_invalidate_site_chrome, sender=_model, dispatch_uid=f'site_chrome_save_{_model.__name__}')
+    post_delete.connect(_invalidate_site_chrome, sender=_model, dispatch_uid=f'site_chrome_delete_{_model.__name__}')
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post_type(sender, instance, **kwargs):
+    """
+    Record the stored post_type so a link that is re-typed away from
+    FOOTER_LINK / MAIN_MENU still drops it from the cached menus.
+    """
+    instance._chrome_previous_post_type = None
+    if instance.pk:
+        instance._chrome_previous_post_type = (
+            Post.objects.filter(pk=instance.pk).values_list('post_type', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def invalidate_site_chrome_on_post_save(sender, instance, **kwargs):
+    previous_type = getattr(instance, '_chrome_previous_post_type', None)
+    if instance.post_type in CHROME_POST_TYPES or previous_type in CHROME_POST_TYPES:
+        site_chrome_cache.invalidate()
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_site_chrome_on_post_delete(sender, instance, **kwargs):
+    if instance.post_type in CHROME_POST_TYPES:
+        site_chrome_cache.invalidate()
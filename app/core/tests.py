@@ -0,0 +1,160 @@
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.cache import VersionedCache
+from core.jobs import JobFailed, enqueue, job_task, recover_lost_jobs, run_job
+from core.models import Job
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'core-tests',
+    }
+}
+
+
+def _run_on_commit_now(func, *args, **kwargs):
+    func()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@mock.patch('core.cache.transaction.on_commit', _run_on_commit_now)
+class VersionedCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def _builder(self, value='built'):
+        def build():
+            self.calls += 1
+            return value
+        return build
+
+    def test_value_is_built_once(self):
+        versioned = VersionedCache('test_ns')
+        self.assertEqual(versioned.get_or_build('k', self._builder()), 'built')
+        self.assertEqual(versioned.get_or_build('k', self._builder()), 'built')
+        self.assertEqual(self.calls, 1)
+
+    def test_other_worker_reads_shared_value(self):
+        VersionedCache('test_ns').get_or_build('k', self._builder())
+        other_worker = VersionedCache('test_ns')
+        self.assertEqual(other_worker.get_or_build('k', self._builder('rebuilt')), 'built')
+        self.assertEqual(self.calls, 1)
+
+    def test_invalidate_bumps_version_for_all_workers(self):
+        versioned = VersionedCache('test_ns', l1_ttl=0)
+        other_worker = VersionedCache('test_ns', l1_ttl=0)
+        versioned.get_or_build('k', self._builder())
+        versioned.invalidate()
+        self.assertEqual(other_worker.get_or_build('k', self._builder('rebuilt')), 'rebuilt')
+        self.assertEqual(versioned.get_or_build('k', self._builder('again')), 'rebuilt')
+        self.assertEqual(self.calls, 2)
+
+    def test_lost_version_key_does_not_resurrect_old_entries(self):
+        versioned = VersionedCache('test_ns', l1_ttl=0)
+        versioned.get_or_build('k', self._builder())
+        cache.delete(versioned.version_key)
+        versioned.invalidate()
+        self.assertEqual(versioned.get_or_build('k', self._builder('rebuilt')), 'rebuilt')
+
+
+@job_task('core.test_echo')
+def _echo_task(job, *, value, fail=False):
+    job.report_progress(1, 2, 'Halfway')
+    if fail:
+        raise JobFailed('Bad value.', detail={'value': value})
+    job.save_result_file('echo.txt', str(value).encode())
+    return {'value': value}
+
+
+@job_task('core.test_marked_stale')
+def _marked_stale_task(job):
+    # Recovery failing the job while it still runs, e.g. after a missed heartbeat.
+    Job.objects.filter(pk=job.pk).update(status=Job.Status.FAILED, error='stale')
+    return {'done': True}
+
+
+@override_settings(JOB_BACKEND='sync')
+class JobRunnerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        job_files = tempfile.TemporaryDirectory(prefix='jobs-tests-')
+        cls.addClassCleanup(job_files.cleanup)
+        cls.enterClassContext(override_settings(JOB_FILES_ROOT=job_files.name))
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user(
+            username='jobstaff', email='jobstaff@example.com', password='testpass123', is_staff=True,
+        )
+
+    def test_sync_backend_runs_job_before_enqueue_returns(self):
+        job = enqueue('core.test_echo', user=self.staff, payload={'value': 42})
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertEqual((job.result, job.percent, job.message), ({'value': 42}, 100, 'Halfway'))
+        self.assertEqual(job.result_filename, 'echo.txt')
+
+    def test_job_failed_records_message_and_detail(self):
+        job = enqueue('core.test_echo', user=self.staff, payload={'value': 'x', 'fail': True})
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual((job.error, job.result), ('Bad value.', {'value': 'x'}))
+
+    def test_unknown_kind_is_rejected_at_enqueue(self):
+        with self.assertRaises(LookupError):
+            enqueue('core.no_such_task')
+
+    def test_job_is_claimed_once(self):
+        job = Job.objects.create(kind='core.test_echo', payload={'value': 1})
+        self.assertTrue(run_job(job.pk))
+        self.assertFalse(run_job(job.pk))
+
+    def test_outcome_does_not_overwrite_a_job_failed_as_stale(self):
+        job = Job.objects.create(kind='core.test_marked_stale')
+        self.assertTrue(run_job(job.pk))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (Job.Status.FAILED, 'stale'))
+
+    def test_recovery_uses_heartbeat_and_pushed_set(self):
+        long_ago = timezone.now() - timedelta(hours=2)
+        alive = Job.objects.create(
+            kind='core.test_echo', status=Job.Status.RUNNING, started_at=long_ago, heartbeat_at=timezone.now(),
+        )
+        dead = Job.objects.create(
+            kind='core.test_echo', status=Job.Status.RUNNING, started_at=long_ago, heartbeat_at=long_ago,
+        )
+        waiting = Job.objects.create(kind='core.test_echo', payload={'value': 1})
+        lost = Job.objects.create(kind='core.test_echo', payload={'value': 2})
+        Job.objects.filter(pk=waiting.pk).update(created_at=long_ago)
+        Job.objects.filter(pk=lost.pk).update(created_at=long_ago + timedelta(minutes=1))
+
+        redis = mock.Mock()
+        redis.smismember.return_value = [1, 0]
+        with mock.patch('core.jobs.redis_connection', return_value=redis):
+            self.assertEqual(recover_lost_jobs(), (1, 1))
+
+        self.assertEqual(redis.smismember.call_args.args[1], [str(waiting.pk), str(lost.pk)])
+        redis.pipeline.return_value.lpush.assert_called_once_with('jobs:queue', str(lost.pk))
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual((statuses[alive.pk], statuses[dead.pk]), (Job.Status.RUNNING, Job.Status.FAILED))
+
+    def test_status_and_file_are_visible_to_owner_only(self):
+        job = enqueue('core.test_echo', user=self.staff, payload={'value': 7})
+        self.client.force_login(self.staff)
+        status = self.client.get(reverse('core:job_status', args=[job.pk])).json()
+        self.assertEqual(status['job']['status'], 'succeeded')
+        download = self.client.get(status['job']['file_url'])
+        self.assertEqual(b''.join(download.streaming_content), b'7')
+
+        other = get_user_model().objects.create_user(
+            username='otherstaff', email='otherstaff@example.com', password='testpass123', is_staff=True,
+        )
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('core:job_status', args=[job.pk])).status_code, 404)
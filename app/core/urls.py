@@ -14,6 +14,8 @@ core_patterns = [
     path('manage/api/save-banner/', views.api_save_banner, name='api_save_banner'),
     path('manage/api/save-banner/<int:banner_id>/', views.api_save_banner, name='api_update_banner'),
     path('manage/api/delete-banner/<int:banner_id>/', views.api_delete_banner, name='api_delete_banner'),
+    path('manage/jobs/<uuid:job_id>/', views.job_status, name='job_status'),
+    path('manage/jobs/<uuid:job_id>/file/', views.job_file, name='job_file'),
 ]
 
 urlpatterns = [
@@ -5,11 +5,12 @@ from inventory.models import Supplier
 from product.models import Category
 from images.models import ImageCategory
 from inventory.views import staff_required
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import FileResponse, Http404, JsonResponse
+from django.views.decorators.http import require_GET, require_POST
 import datetime
 import json
 import logging
+import os
 
 from inventory.forms import (
     InventoryBatchForm, QuotationUploadForm, InvoiceUploadForm,
@@ -22,8 +23,9 @@ from sales.models import Invoice
 from blog.models import Post
 from seo.models import PageMetadata
 from user.models import UserGroup
-from .models import Banner
+from .models import Banner, Job
 from .forms import BannerForm
+from .jobs import serialize_job
 
 logger = logging.getLogger(__name__)
 
@@ -175,3 +177,31 @@ def api_delete_banner(request, banner_id):
     banner = get_object_or_404(Banner, pk=banner_id)
     banner.delete()
     return JsonResponse({'success': True})
+
+
+def _visible_jobs(user):
+    """Staff poll and download their own jobs; superusers can see every job."""
+    jobs = Job.objects.all()
+    return jobs if user.is_superuser else jobs.filter(created_by=user)
+
+
+@staff_required
+@require_GET
+def job_status(request, job_id):
+    """Current state of a background job (polled by window.waitForJob)."""
+    job = get_object_or_404(_visible_jobs(request.user), pk=job_id)
+    return JsonResponse({'success': True, 'job': serialize_job(job)})
+
+
+@staff_required
+@require_GET
+def job_file(request, job_id):
+    """Download the file produced by a finished export job."""
+    job = get_object_or_404(_visible_jobs(request.user), pk=job_id, status=Job.Status.SUCCEEDED)
+    if not job.result_file:
+        raise Http404('This job has no file.')
+    return FileResponse(
+        job.result_file.open('rb'),
+        as_attachment=True,
+        filename=job.result_filename or os.path.basename(job.result_file.name),
+    )
@@ -0,0 +1,73 @@
+# distributorplatform/app/inventory/import_staging.py
+# Server-side staging of parsed uploads between the preview and confirm requests.
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+# A preview left open longer than this has to be uploaded again.
+SESSION_TTL = timedelta(hours=24)
+IMPORT_SESSION_EXPIRED = 'This import preview has expired. Upload the file again.'
+# Fields the browser may change on a staged row at confirm time (everything else comes from the file).
+INVOICE_OVERRIDE_FIELDS = ('action', 'supplier_id', 'new_supplier_name', 'new_supplier_code')
+MATRIX_OVERRIDE_FIELDS = ('product_id', 'new_product_name', 'new_product_sku')
+
+
+class ImportSessionExpired(Exception):
+    """The session id is unknown, expired, of another kind, or belongs to another user."""
+
+
+def stage_import(kind: str, user, rows, *, source_filename: str = ''):
+    """
+    Store parsed rows (JSON-serializable dicts, Decimals allowed) in a new session
+    with one bulk insert and return the session. Also purges expired sessions.
+    """
+    from inventory.models import ImportSession, ImportStagingRow
+
+    ImportSession.objects.filter(created_at__lt=timezone.now() - SESSION_TTL).delete()
+    session = ImportSession.objects.create(kind=kind, created_by=user, source_filename=source_filename[:255])
+    ImportStagingRow.objects.bulk_create(
+        [ImportStagingRow(session=session, row_index=index, data=row) for index, row in enumerate(rows)],
+        batch_size=BATCH_SIZE,
+    )
+    return session
+
+
+def get_import_session(session_id, kind: str, user):
+    """The live session of this kind created by user; raises ImportSessionExpired otherwise."""
+    from django.core.exceptions import ValidationError
+
+    from inventory.models import ImportSession
+
+    try:
+        return ImportSession.objects.get(
+            pk=session_id,
+            kind=kind,
+            created_by=user,
+            created_at__gte=timezone.now() - SESSION_TTL,
+        )
+    except (ImportSession.DoesNotExist, ValidationError, ValueError) as exc:
+        raise ImportSessionExpired(session_id) from exc
+
+
+def load_staged_rows(session_id, kind: str, user):
+    """(session, rows in staging order) for a live session of this kind created by user."""
+    session = get_import_session(session_id, kind, user)
+    rows = list(session.rows.order_by('row_index').values_list('data', flat=True))
+    return session, rows
+
+
+def apply_row_overrides(rows, overrides, *, key: str, fields) -> list[dict]:
+    """
+    Copy of rows with the user's per-row choices applied. overrides is a list of
+    dicts identifying their row by `key` (e.g. row_index); only `fields` are taken,
+    so staged values such as prices cannot be rewritten by the client.
+    """
+    by_key = {str(override.get(key)): override for override in overrides or [] if isinstance(override, dict)}
+    merged = []
+    for row in rows:
+        override = by_key.get(str(row.get(key)), {})
+        merged.append({**row, **{field: override[field] for field in fields if field in override}})
+    return merged
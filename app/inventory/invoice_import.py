@@ -3,17 +3,21 @@ from __future__ import annotations
 
 import logging
 import re
+import time
 from collections import defaultdict
 from datetime import date, datetime
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from io import BytesIO
-from typing import Any
+from typing import Any, Iterable, Iterator
 
 from django.utils import timezone as django_timezone
 from openpyxl import load_workbook
 
 logger = logging.getLogger(__name__)
 
+# Bump when parse output changes, so cached previews (inventory.parse_cache) are not reused.
+PAYABLE_INVOICE_PARSER_VERSION = 1
+
 HEADER_ALIASES = {
     'invoice date': 'invoice_date',
     'source': 'source',
@@ -215,22 +219,14 @@ def _resolve_line_quantity(row: tuple | list, col_map: dict[str, int]) -> int:
     return 0
 
 
-def _find_header_row(rows: list[tuple]) -> tuple[int | None, dict[str, int]]:
-    best_i: int | None = None
-    best_map: dict[str, int] = {}
-    best_score = 0
-    for i, row in enumerate(rows):
-        headers = [_normalize_header(c) for c in row]
-        col_map = _map_headers_to_columns(headers)
-        if 'reference' not in col_map or 'description' not in col_map:
-            continue
-        _fill_standard_column_gaps(col_map)
-        score = len(col_map)
-        if score > best_score:
-            best_score = score
-            best_i = i
-            best_map = col_map
-    return best_i, best_map
+def _header_col_map(row: tuple) -> dict[str, int] | None:
+    """Column map when the row is the invoice table header (has Reference and Description)."""
+    headers = [_normalize_header(c) for c in row]
+    col_map = _map_headers_to_columns(headers)
+    if 'reference' not in col_map or 'description' not in col_map:
+        return None
+    _fill_standard_column_gaps(col_map)
+    return col_map
 
 
 def _is_metadata_or_blank_row(row: tuple) -> bool:
@@ -307,46 +303,37 @@ def suggest_supplier_code(
     return code
 
 
-def _read_xlsx_rows(file) -> list[tuple]:
-    if hasattr(file, 'read'):
-        content = file.read()
-        if hasattr(file, 'seek'):
-            file.seek(0)
-    else:
-        content = file
-    wb = load_workbook(BytesIO(content), read_only=True, data_only=True)
-    ws = wb.active
-    raw_rows: list[tuple] = []
-    max_len = 0
-    for row in ws.iter_rows(values_only=True):
-        row_tuple = tuple(row)
-        max_len = max(max_len, len(row_tuple))
-        raw_rows.append(row_tuple)
-    wb.close()
-    if max_len == 0:
-        return []
-    return [
-        row + (None,) * (max_len - len(row))
-        for row in raw_rows
-    ]
-
-
-def parse_payable_invoice_detail_file(file) -> tuple[dict | None, str | None]:
+def _open_xlsx(file):
     """
-    Parse a Payable Invoice Detail .xlsx export.
-    Returns ({ suppliers: [...], summary: {...} }, None) or (None, error_message).
+    Open an upload or raw bytes in openpyxl read-only mode, which parses the sheet
+    XML lazily so only the current row is held in memory. The caller closes it.
     """
-    name = getattr(file, 'name', '') or ''
-    if not name.lower().endswith(('.xlsx', '.xls')):
-        return None, 'Please upload an Excel file (.xlsx) exported as Payable Invoice Detail.'
+    source = file if hasattr(file, 'read') else BytesIO(file)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return load_workbook(source, read_only=True, data_only=True)
+
+
+def _padded_rows(rows: Iterable[tuple]) -> Iterator[tuple]:
+    """Pad each row with None up to the widest row seen so far (short trailing rows)."""
+    width = 0
+    for row in rows:
+        width = max(width, len(row))
+        yield row + (None,) * (width - len(row)) if len(row) < width else row
 
-    try:
-        rows = _read_xlsx_rows(file)
-    except Exception as exc:
-        return None, f'Could not read Excel file: {exc}'
 
-    header_idx, col_map = _find_header_row(rows)
-    if header_idx is None:
+def _read_supplier_buckets(rows: Iterable[tuple]) -> tuple[dict | None, str | None]:
+    """
+    Group the streamed line rows by supplier title row and invoice reference.
+    Returns ({ supplier key: bucket }, None) or (None, error_message).
+    """
+    # Rows above the table header (report title, filters) are skipped as they stream by.
+    col_map = None
+    for row in rows:
+        col_map = _header_col_map(row)
+        if col_map is not None:
+            break
+    if col_map is None:
         return None, (
             'Could not find the invoice table header row. '
             'Expected columns such as Reference and Description.'
@@ -355,7 +342,7 @@ def parse_payable_invoice_detail_file(file) -> tuple[dict | None, str | None]:
     current_supplier_key: str | None = None
     supplier_buckets: dict[str, dict] = {}
 
-    for row in rows[header_idx + 1:]:
+    for row in rows:
         if _is_metadata_or_blank_row(row):
             continue
         if _is_supplier_row(row, col_map):
@@ -415,6 +402,31 @@ def parse_payable_invoice_detail_file(file) -> tuple[dict | None, str | None]:
             'original_currency': _cell_str(row, col_map.get('original_currency')),
         })
 
+    return supplier_buckets, None
+
+
+def parse_payable_invoice_detail_file(file) -> tuple[dict | None, str | None]:
+    """
+    Parse a Payable Invoice Detail .xlsx export.
+    Returns ({ suppliers: [...], summary: {...} }, None) or (None, error_message).
+    """
+    name = getattr(file, 'name', '') or ''
+    if not name.lower().endswith(('.xlsx', '.xls')):
+        return None, 'Please upload an Excel file (.xlsx) exported as Payable Invoice Detail.'
+
+    # The whole streamed read is guarded: openpyxl can fail on any row, not just the header.
+    wb = None
+    try:
+        wb = _open_xlsx(file)
+        supplier_buckets, error = _read_supplier_buckets(_padded_rows(wb.active.iter_rows(values_only=True)))
+    except Exception as exc:
+        return None, f'Could not read Excel file: {exc}'
+    finally:
+        if wb is not None:
+            wb.close()
+    if error:
+        return None, error
+
     if not supplier_buckets:
         return None, 'No invoice line items found in file.'
 
@@ -546,51 +558,54 @@ def _matrix_tier_snapshot(unit_myr, unit_source=None) -> list[dict]:
     return [tier]
 
 
-def _refresh_matrix_entry_from_latest_record(entry) -> None:
-    """Set live tiers on a matrix entry from its newest effective-dated upload record."""
-    from inventory.models import SupplierPriceMatrixTier
-
-    record = entry.upload_records.order_by('-effective_date', '-uploaded_at').first()
-    if not record:
-        return
-    entry.tiers.all().delete()
-    for tier in record.tiers or []:
-        SupplierPriceMatrixTier.objects.create(
-            entry=entry,
-            min_quantity=int(tier.get('min_quantity', 1)),
-            max_quantity=tier.get('max_quantity'),
-            unit_price=Decimal(str(tier['unit_price'])),
-        )
-    entry.price_currency = record.price_currency
-    entry.conversion_rate = record.conversion_rate
-    entry.effective_date = record.effective_date
-    entry.source_filename = record.source_filename
-    entry.save(update_fields=[
-        'price_currency', 'conversion_rate', 'effective_date', 'source_filename', 'updated_at',
-    ])
-
-
-def _upsert_supplier_price_matrix_from_line(
-    supplier,
-    product,
-    line: dict,
-    *,
-    invoice_date: date | None,
-    invoice_reference: str,
-    source_filename: str = '',
-) -> None:
-    """Append invoice-priced snapshot to supplier matrix upload history."""
+def _refresh_matrix_entries_from_latest_records(entry_ids) -> None:
+    """
+    Set live tiers on matrix entries from their newest effective-dated upload records.
+    Set-based: one query for the latest record per entry, one for the entries, then
+    bulk tier and entry writes (callers refresh the affected products' snapshots).
+    """
     from inventory.models import SupplierPriceMatrixEntry, SupplierPriceMatrixUploadRecord
-    from inventory.supplier_pricing import sync_saved_base_costs_for_products
+    from inventory.supplier_pricing import replace_matrix_tiers
 
-    desc = (line.get('description') or '').strip()
-    if not desc:
+    latest = {
+        record.entry_id: record
+        for record in SupplierPriceMatrixUploadRecord.objects.filter(entry_id__in=entry_ids)
+        .order_by('entry_id', '-effective_date', '-uploaded_at', '-pk')
+        .distinct('entry_id')
+    }
+    if not latest:
         return
+    replace_matrix_tiers({
+        entry_id: [
+            (int(tier.get('min_quantity', 1)), tier.get('max_quantity'), Decimal(str(tier['unit_price'])))
+            for tier in record.tiers or []
+        ]
+        for entry_id, record in latest.items()
+    })
+
+    entries = SupplierPriceMatrixEntry.objects.in_bulk(list(latest))
+    now = django_timezone.now()
+    for entry_id, record in latest.items():
+        entry = entries[entry_id]
+        entry.price_currency = record.price_currency
+        entry.conversion_rate = record.conversion_rate
+        entry.effective_date = record.effective_date
+        entry.source_filename = record.source_filename
+        entry.updated_at = now
+    SupplierPriceMatrixEntry.objects.bulk_update(
+        list(entries.values()),
+        ['price_currency', 'conversion_rate', 'effective_date', 'source_filename', 'updated_at'],
+        batch_size=1000,
+    )
+
+
+def _matrix_line_snapshot(line: dict) -> dict | None:
+    """Currency, conversion rate and tier snapshot for one invoice line (None when it has no price)."""
     unit_myr = line.get('unit_price_myr')
     if unit_myr is None:
         unit_myr = line.get('unit_price_source')
     if unit_myr is None:
-        return
+        return None
 
     currency = (line.get('original_currency') or 'MYR').strip().upper()[:3] or 'MYR'
     if currency not in ('MYR', 'USD', 'EUR'):
@@ -604,64 +619,157 @@ def _upsert_supplier_price_matrix_from_line(
             conversion_rate = (unit_myr_dec / Decimal(str(unit_source))).quantize(Decimal('0.0001'))
         except (InvalidOperation, ZeroDivisionError):
             conversion_rate = None
+    return {
+        'price_currency': currency,
+        'conversion_rate': conversion_rate,
+        'tiers': _matrix_tier_snapshot(unit_myr_dec, unit_source=unit_source),
+    }
+
+
+def _upsert_supplier_price_matrix_from_lines(matrix_lines, *, source_filename: str = '') -> int:
+    """
+    Append invoice-priced snapshots to the supplier matrix upload history for many lines.
+    matrix_lines holds (supplier, product, line, invoice_date, invoice_reference) tuples.
+    Entries are keyed by (supplier, description) as before; each (entry, effective date,
+    source) gets one upload record. Runs a fixed number of queries for the whole import
+    and returns the number of lines applied.
+    """
+    from inventory.models import SupplierPriceMatrixEntry, SupplierPriceMatrixUploadRecord
+    from inventory.supplier_pricing import sync_saved_base_costs_for_products
 
-    entry, _created = SupplierPriceMatrixEntry.objects.update_or_create(
-        supplier=supplier,
-        line_medication=desc[:255],
-        strength='',
-        size='',
-        defaults={
-            'form': '',
+    prepared = []
+    for supplier, product, line, invoice_date, invoice_reference in matrix_lines:
+        desc = (line.get('description') or '').strip()
+        if not desc:
+            continue
+        try:
+            snapshot = _matrix_line_snapshot(line)
+        except (InvalidOperation, TypeError, ValueError) as exc:
+            logger.warning('Supplier price matrix update failed for %s: %s', desc, exc)
+            continue
+        if snapshot is None:
+            continue
+        invoice_label = (invoice_reference or '').strip()
+        record_source = source_filename or 'payable invoice import'
+        if invoice_label:
+            record_source = f'{record_source} · {invoice_label}'
+        prepared.append({
+            'key': (supplier.pk, desc[:255]),
             'product': product,
-        },
+            'effective_date': invoice_date or django_timezone.now().date(),
+            'source_filename': record_source,
+            **snapshot,
+        })
+    if not prepared:
+        return 0
+
+    # Entries: one lookup, then create the new ones and re-point changed ones in bulk.
+    # The last line for an entry decides its product, as with row-by-row update_or_create.
+    product_by_key = {row['key']: row['product'] for row in prepared}
+    entries = {
+        (entry.supplier_id, entry.line_medication): entry
+        for entry in SupplierPriceMatrixEntry.objects.filter(
+            supplier_id__in={supplier_id for supplier_id, _ in product_by_key},
+            line_medication__in={medication for _, medication in product_by_key},
+            strength='',
+            size='',
+        )
+        if (entry.supplier_id, entry.line_medication) in product_by_key
+    }
+    product_ids = set()
+    new_entries, changed_entries = [], []
+    for key, product in product_by_key.items():
+        entry = entries.get(key)
+        if entry is None:
+            entry = SupplierPriceMatrixEntry(
+                supplier_id=key[0], line_medication=key[1], strength='', size='', form='', product=product,
+            )
+            entries[key] = entry
+            new_entries.append(entry)
+        elif entry.product_id != product.pk or entry.form:
+            product_ids.add(entry.product_id)
+            entry.product = product
+            entry.form = ''
+            changed_entries.append(entry)
+        product_ids.add(product.pk)
+    SupplierPriceMatrixEntry.objects.bulk_create(new_entries, batch_size=1000)
+    SupplierPriceMatrixEntry.objects.bulk_update(changed_entries, ['product', 'form'], batch_size=1000)
+
+    entry_ids = [entry.pk for entry in entries.values()]
+    seen_records = set(
+        SupplierPriceMatrixUploadRecord.objects.filter(
+            entry_id__in=entry_ids,
+            source_filename__in={row['source_filename'] for row in prepared},
+        ).values_list('entry_id', 'effective_date', 'source_filename')
     )
-    if product and entry.product_id != product.pk:
-        entry.product = product
-        entry.save(update_fields=['product', 'updated_at'])
-
-    effective = invoice_date or django_timezone.now().date()
-    invoice_label = (invoice_reference or '').strip()
-    record_source = source_filename or 'payable invoice import'
-    if invoice_label:
-        record_source = f'{record_source} · {invoice_label}'
-
-    snapshot = _matrix_tier_snapshot(unit_myr_dec, unit_source=unit_source)
-    existing_record = entry.upload_records.filter(
-        effective_date=effective,
-        source_filename=record_source,
-    ).first()
-    if not existing_record:
-        SupplierPriceMatrixUploadRecord.objects.create(
+    records = []
+    for row in prepared:
+        entry = entries[row['key']]
+        record_key = (entry.pk, row['effective_date'], row['source_filename'])
+        if record_key in seen_records:
+            continue
+        seen_records.add(record_key)
+        records.append(SupplierPriceMatrixUploadRecord(
             entry=entry,
-            effective_date=effective,
-            source_filename=record_source,
-            price_currency=currency,
-            conversion_rate=conversion_rate,
-            tiers=snapshot,
-        )
-
-    _refresh_matrix_entry_from_latest_record(entry)
-
-    if product:
-        sync_saved_base_costs_for_products([product.pk])
+            effective_date=row['effective_date'],
+            source_filename=row['source_filename'],
+            price_currency=row['price_currency'],
+            conversion_rate=row['conversion_rate'],
+            tiers=row['tiers'],
+        ))
+    SupplierPriceMatrixUploadRecord.objects.bulk_create(records, batch_size=1000)
+
+    _refresh_matrix_entries_from_latest_records(entry_ids)
+    product_ids.discard(None)
+    sync_saved_base_costs_for_products(list(product_ids))
+    return len(prepared)
+
+
+def _invoice_line_subtotal(lines) -> Decimal:
+    subtotal = Decimal('0')
+    for line in lines:
+        gross = line.get('gross_myr')
+        if gross is not None:
+            subtotal += Decimal(str(gross))
+        else:
+            qty = int(line.get('quantity') or 0)
+            unit = line.get('unit_price_myr')
+            if unit is not None and qty:
+                subtotal += Decimal(str(unit)) * qty
+    return subtotal
 
 
 def confirm_payable_invoice_import(payload: dict, *, product_model, supplier_model, invoice_model, invoice_item_model) -> dict:
     """
     Create/update standalone invoices from preview payload and supplier mappings.
-    Returns counts for toast messaging.
+
+    Runs in phases, each a fixed number of queries regardless of line count:
+    suppliers, invoices (one prefetch by invoice_id, then bulk_create / bulk_update),
+    products (in memory via CatalogMatcher), items (one delete, one bulk_create) and
+    one batched supplier matrix upsert. Returns counts for toast messaging plus
+    'timings': seconds spent per phase, to watch import throughput.
     """
+    from product.catalog import CatalogMatcher
+    from product.cost_snapshot import refresh_cost_snapshots_for_bulk_items
     from sales.models import Invoice
 
-    products_created = 0
-    products_matched = 0
-    invoices_created = 0
-    invoices_updated = 0
-    invoices_skipped = 0
+    timings: dict[str, float] = {}
+    phase_started = time.perf_counter()
+
+    def end_phase(name):
+        nonlocal phase_started
+        now = time.perf_counter()
+        timings[name] = round(now - phase_started, 4)
+        phase_started = now
+
+    source_filename = payload.get('source_filename') or ''
     suppliers_ignored = 0
-    matrix_rows_updated = 0
     supplier_import_cache: dict[str, object] = {}
-
+    # invoice_id -> plan. Every occurrence of a reference is kept: all of their lines
+    # are matched, linked to their supplier and priced into the matrix, while the
+    # invoice header and items come from the last occurrence (it replaces the earlier
+    # occurrences' items, as re-importing an invoice does).
+    plans: dict[str, dict] = {}
     for sup_block in payload.get('suppliers') or []:
         supplier, action = _resolve_or_create_supplier(
             sup_block, supplier_model, import_cache=supplier_import_cache,
@@ -674,14 +782,8 @@ def confirm_payable_invoice_import(payload: dict, *, product_model, supplier_mod
             reference = (inv_data.get('reference') or '').strip()
             if not reference:
                 continue
-
             invoice_id = _safe_invoice_id(reference)
 
-            existing = invoice_model.objects.filter(invoice_id=invoice_id).select_related('quotation').first()
-            if existing and existing.quotation_id is not None:
-                invoices_skipped += 1
-                continue
-
             inv_date_raw = inv_data.get('invoice_date')
             if inv_date_raw:
                 inv_date = datetime.strptime(inv_date_raw[:10], '%Y-%m-%d').date()
@@ -689,107 +791,134 @@ def confirm_payable_invoice_import(payload: dict, *, product_model, supplier_mod
                 inv_date = django_timezone.now().date()
 
             lines = inv_data.get('lines') or []
-            subtotal = Decimal('0')
-            for line in lines:
-                gross = line.get('gross_myr')
-                if gross is not None:
-                    subtotal += Decimal(str(gross))
-                else:
-                    qty = int(line.get('quantity') or 0)
-                    unit = line.get('unit_price_myr')
-                    if unit is not None and qty:
-                        subtotal += Decimal(str(unit)) * qty
-
-            invoice_total = inv_data.get('invoice_total_myr')
             transport = Decimal('0')
+            invoice_total = inv_data.get('invoice_total_myr')
             if invoice_total is not None:
-                transport = max(Decimal('0'), Decimal(str(invoice_total)) - subtotal)
-
-            if existing:
-                invoice = existing
-                invoice.supplier = supplier
-                invoice.date_issued = inv_date
-                invoice.transportation_cost = transport
-                invoice.status = Invoice.InvoiceStatus.PAID
-                invoice.save()
-                invoices_updated += 1
-                invoice.items.all().delete()
-            else:
-                invoice = invoice_model.objects.create(
-                    invoice_id=invoice_id,
-                    quotation=None,
-                    supplier=supplier,
-                    date_issued=inv_date,
-                    transportation_cost=transport,
-                    status=Invoice.InvoiceStatus.PAID,
-                    notes=f'Imported from {payload.get("source_filename") or "spreadsheet"}',
-                )
-                invoices_created += 1
-
-            items_to_create = []
-            for line in lines:
-                desc = (line.get('description') or '').strip()
-                if not desc:
-                    continue
-                item_code = (line.get('item_code') or '').strip()
-                product = None
-                if item_code:
-                    product = product_model.objects.filter(sku__iexact=item_code).first()
-                if not product:
-                    product = product_model.objects.filter(name__iexact=desc).first()
-                if not product:
-                    name = desc[:200]
-                    product, created = product_model.objects.get_or_create(
-                        name=name,
-                        defaults={'description': 'Auto-imported from payable invoice'},
-                    )
-                    if created:
-                        products_created += 1
-                    else:
-                        products_matched += 1
+                transport = max(Decimal('0'), Decimal(str(invoice_total)) - _invoice_line_subtotal(lines))
+
+            occurrence = {
+                'reference': reference,
+                'supplier': supplier,
+                'date_issued': inv_date,
+                'lines': [line for line in lines if (line.get('description') or '').strip()],
+            }
+            plan = plans.setdefault(invoice_id, {'occurrences': []})
+            plan['occurrences'].append(occurrence)
+            plan.update(supplier=supplier, date_issued=inv_date, transport=transport)
+    end_phase('suppliers')
+
+    # --- Invoices: one prefetch, then bulk writes ---
+    invoices_created = 0
+    invoices_updated = 0
+    invoices_skipped = 0
+    today = django_timezone.now().date()
+    now = django_timezone.now()
+    existing = invoice_model.objects.in_bulk(list(plans), field_name='invoice_id')
+    new_invoices, updated_invoices = [], []
+    for invoice_id, plan in list(plans.items()):
+        invoice = existing.get(invoice_id)
+        if invoice is not None and invoice.quotation_id is not None:
+            invoices_skipped += len(plan['occurrences'])
+            del plans[invoice_id]
+            continue
+        if invoice is None:
+            # Invoice.save() fills payment_date for PAID invoices; bulk_create does not call it.
+            invoice = invoice_model(
+                invoice_id=invoice_id,
+                quotation=None,
+                notes=f'Imported from {source_filename or "spreadsheet"}',
+                payment_date=today,
+            )
+            new_invoices.append(invoice)
+            invoices_created += 1
+            invoices_updated += len(plan['occurrences']) - 1
+        else:
+            updated_invoices.append(invoice)
+            invoices_updated += len(plan['occurrences'])
+            invoice.payment_date = invoice.payment_date or today
+            invoice.updated_at = now
+        invoice.supplier = plan['supplier']
+        invoice.date_issued = plan['date_issued']
+        invoice.transportation_cost = plan['transport']
+        invoice.status = Invoice.InvoiceStatus.PAID
+        plan['invoice'] = invoice
+    invoice_model.objects.bulk_create(new_invoices, batch_size=1000)
+    invoice_model.objects.bulk_update(
+        updated_invoices,
+        ['supplier', 'date_issued', 'transportation_cost', 'status', 'payment_date', 'updated_at'],
+        batch_size=1000,
+    )
+    end_phase('invoices')
+
+    # --- Products: every line matched in memory, missing names created together ---
+    matcher = CatalogMatcher()
+    line_products = matcher.resolve_all(
+        [
+            (line.get('item_code'), line.get('description'))
+            for plan in plans.values() for occurrence in plan['occurrences'] for line in occurrence['lines']
+        ],
+        defaults={'description': 'Auto-imported from payable invoice'},
+    )
+    products_created = 0
+    products_matched = 0
+    counted_created: set[int] = set()
+    product_ids_by_supplier = defaultdict(set)
+    products_iter = iter(line_products)
+    for plan in plans.values():
+        for occurrence in plan['occurrences']:
+            occurrence['products'] = [next(products_iter) for _ in occurrence['lines']]
+            for product in occurrence['products']:
+                if product.pk in matcher.created_ids and product.pk not in counted_created:
+                    counted_created.add(product.pk)
+                    products_created += 1
                 else:
                     products_matched += 1
-
-                if supplier and not product.suppliers.filter(pk=supplier.pk).exists():
-                    product.suppliers.add(supplier)
-
-                qty = _parse_quantity(line.get('quantity'))
+                product_ids_by_supplier[occurrence['supplier']].add(product.pk)
+    for supplier, product_ids in product_ids_by_supplier.items():
+        supplier.products.add(*product_ids)
+    end_phase('products')
+
+    # --- Items: replace the lines of updated invoices in two statements ---
+    if updated_invoices:
+        invoice_item_model.objects.filter(invoice__in=updated_invoices).delete()
+    items_to_create = []
+    matrix_lines = []
+    for plan in plans.values():
+        for occurrence in plan['occurrences']:
+            is_last = occurrence is plan['occurrences'][-1]
+            for line, product in zip(occurrence['lines'], occurrence['products']):
                 unit_price = line.get('unit_price_myr')
                 if unit_price is None:
                     unit_price = line.get('unit_price_source')
                 if unit_price is None:
                     continue
-                original_currency = (line.get('original_currency') or '').strip().upper()[:3]
+                matrix_lines.append(
+                    (occurrence['supplier'], product, line, occurrence['date_issued'], occurrence['reference'])
+                )
+                if not is_last:
+                    continue
                 unit_price_source = line.get('unit_price_source')
                 gross_source = line.get('gross_source')
                 item_kwargs = {
-                    'invoice': invoice,
+                    'invoice': plan['invoice'],
                     'product': product,
-                    'description': desc,
-                    'quantity': max(qty, 0),
+                    'description': line['description'].strip(),
+                    'quantity': max(_parse_quantity(line.get('quantity')), 0),
                     'unit_price': Decimal(str(unit_price)),
                 }
                 if hasattr(invoice_item_model, 'original_currency'):
-                    item_kwargs['original_currency'] = original_currency
+                    item_kwargs['original_currency'] = (line.get('original_currency') or '').strip().upper()[:3]
                 if hasattr(invoice_item_model, 'unit_price_source') and unit_price_source is not None:
                     item_kwargs['unit_price_source'] = Decimal(str(unit_price_source))
                 if hasattr(invoice_item_model, 'gross_source') and gross_source is not None:
                     item_kwargs['gross_source'] = Decimal(str(gross_source))
                 items_to_create.append(invoice_item_model(**item_kwargs))
-                try:
-                    _upsert_supplier_price_matrix_from_line(
-                        supplier,
-                        product,
-                        line,
-                        invoice_date=inv_date,
-                        invoice_reference=reference,
-                        source_filename=payload.get('source_filename') or '',
-                    )
-                    matrix_rows_updated += 1
-                except Exception as exc:
-                    logger.warning('Supplier price matrix update failed for %s: %s', desc, exc)
-            if items_to_create:
-                invoice_item_model.objects.bulk_create(items_to_create)
+    invoice_item_model.objects.bulk_create(items_to_create, batch_size=1000)
+    refresh_cost_snapshots_for_bulk_items(items_to_create)
+    end_phase('items')
+
+    matrix_rows_updated = _upsert_supplier_price_matrix_from_lines(matrix_lines, source_filename=source_filename)
+    end_phase('matrix')
 
     return {
         'products_created': products_created,
@@ -799,4 +928,5 @@ def confirm_payable_invoice_import(payload: dict, *, product_model, supplier_mod
         'invoices_skipped': invoices_skipped,
         'suppliers_ignored': suppliers_ignored,
         'matrix_rows_updated': matrix_rows_updated,
+        'timings': timings,
     }
@@ -0,0 +1,21 @@
+# distributorplatform/app/inventory/management/commands/parse_cache_stats.py
+
+from django.core.management.base import BaseCommand
+
+from inventory.invoice_import import parse_payable_invoice_detail_file
+from inventory.parse_cache import parse_cache_stats
+from inventory.supplier_pricing import parse_supplier_price_matrix_file
+
+
+class Command(BaseCommand):
+    help = 'Shows hit/miss counters of the upload parse cache (price lists and payable invoice files).'
+
+    def handle(self, *args, **options):
+        stats = parse_cache_stats([parse_supplier_price_matrix_file, parse_payable_invoice_detail_file])
+        for parser_name, counts in stats.items():
+            total = counts['hits'] + counts['misses']
+            hit_rate = counts['hits'] / total if total else 0.0
+            self.stdout.write(
+                f"{parser_name}: {counts['hits']} hits, {counts['misses']} misses ({hit_rate:.0%} hit rate)"
+            )
+        self.stdout.write(self.style.SUCCESS('Parse cache stats listed.'))
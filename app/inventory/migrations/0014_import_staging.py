@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:24
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0013_inventorybatch_batch_number_optional'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('payable_invoices', 'Payable invoices'), ('price_matrix', 'Supplier price matrix')], max_length=30)),
+                ('source_filename', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportStagingRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_index', models.PositiveIntegerField()),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='inventory.importsession')),
+            ],
+            options={
+                'ordering': ['session', 'row_index'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importstagingrow',
+            constraint=models.UniqueConstraint(fields=('session', 'row_index'), name='uniq_import_staging_row'),
+        ),
+    ]
@@ -1,6 +1,9 @@
 # distributorplatform/app/inventory/models.py
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
-from django.db.models import Sum, F
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When, Window
+from django.db.models.functions import Coalesce, NullIf
 import uuid
 from decimal import Decimal
 from django.utils import timezone
@@ -99,6 +102,53 @@ class Quotation(models.Model):
         supplier_name = self.supplier.name if getattr(self, "supplier", None) else "Unknown supplier"
         return f"Quotation {self.quotation_id} from {supplier_name}"
 
+def landed_cost_window_annotations(parent: str, price: str) -> dict:
+    """
+    Annotations shared by quotation and invoice lines: `<parent>_total` is
+    SUM(quantity * price) OVER (PARTITION BY <parent>_id), and the per-unit
+    transport share / landed cost are derived from it in the same SELECT.
+    Only lines with quantity > 0 carry transport; the caller decides what a
+    zero-quantity line's landed cost is.
+    """
+    money = DecimalField(max_digits=20, decimal_places=4)
+    total_alias = f'{parent}_total'
+    line_total = ExpressionWrapper(F('quantity') * F(price), output_field=money)
+    transport = Coalesce(F(f'{parent}__transportation_cost'), Value(Decimal('0.00')), output_field=money)
+    return {
+        total_alias: Window(Sum(line_total), partition_by=[F(f'{parent}_id')], output_field=money),
+        'annotated_transport_cost_per_unit': Case(
+            When(
+                Q(quantity__gt=0) & Q(**{f'{total_alias}__gt': 0}),
+                then=ExpressionWrapper(transport * F(price) / F(total_alias), output_field=money),
+            ),
+            default=Value(Decimal('0.00')),
+            output_field=money,
+        ),
+    }
+
+
+class QuotationItemQuerySet(models.QuerySet):
+    def whole_quotations(self):
+        """Every line of the quotations that have a line in this queryset."""
+        return self.model._default_manager.filter(quotation_id__in=self.values('quotation_id'))
+
+    def with_landed_cost(self):
+        """
+        Annotate quotation_total, annotated_transport_cost_per_unit and
+        annotated_landed_cost_per_unit in SQL, so landed_cost_per_unit does not
+        load the quotation's other lines. The window runs after WHERE: use it on
+        whole quotations (whole_quotations()) and narrow the rows in Python.
+        """
+        money = DecimalField(max_digits=20, decimal_places=4)
+        return self.annotate(**landed_cost_window_annotations('quotation', 'quoted_price')).annotate(
+            annotated_landed_cost_per_unit=Case(
+                When(quantity=0, then=NullIf(F('quoted_price'), Value(Decimal('0.00')))),
+                default=F('quoted_price') + F('annotated_transport_cost_per_unit'),
+                output_field=money,
+            ),
+        )
+
+
 class QuotationItem(models.Model):
     INPUT_CURRENCY_EUR = 'EUR'
     INPUT_CURRENCY_USD = 'USD'
@@ -137,6 +187,8 @@ class QuotationItem(models.Model):
         help_text="Price in input_currency. Used to recompute quoted_price (MYR) when rate changes."
     )
 
+    objects = QuotationItemQuerySet.as_manager()
+
     @property
     def total_item_price(self):
         """Calculates the total price for this line item (quantity * price)."""
@@ -150,6 +202,8 @@ class QuotationItem(models.Model):
         Calculates the landed cost per unit for this item,
         distributing the quotation's transport cost pro-rata by value.
         """
+        if hasattr(self, 'annotated_landed_cost_per_unit'):
+            return self.annotated_landed_cost_per_unit
         if self.quantity is None or self.quantity == 0 or self.quoted_price is None:
             return self.quoted_price or None
 
@@ -175,6 +229,8 @@ class QuotationItem(models.Model):
         """
         Calculates the share of transportation cost for a single unit of this item.
         """
+        if hasattr(self, 'annotated_transport_cost_per_unit'):
+            return self.annotated_transport_cost_per_unit
         if self.quantity is None or self.quantity == 0 or self.quoted_price is None:
             return Decimal('0.00')
 
@@ -364,3 +420,49 @@ class InventoryBatch(models.Model):
         label = self.batch_number or f'#{self.pk}'
         return f"Batch {label} for {self.product.name}"
 
+
+class ImportSession(models.Model):
+    """
+    Parsed upload staged server-side between preview and confirm, so confirm posts
+    only the session id and the user's per-row choices instead of the whole file.
+    Sessions are deleted after a successful confirm or once they expire.
+    """
+    class Kind(models.TextChoices):
+        PAYABLE_INVOICES = 'payable_invoices', 'Payable invoices'
+        PRICE_MATRIX = 'price_matrix', 'Supplier price matrix'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=30, choices=Kind.choices)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='import_sessions',
+    )
+    source_filename = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} import {self.pk} ({self.source_filename or 'no file'})"
+
+
+class ImportStagingRow(models.Model):
+    """One parsed row (or supplier group, for payable invoices) of an import session."""
+    session = models.ForeignKey(
+        ImportSession,
+        on_delete=models.CASCADE,
+        related_name='rows',
+    )
+    row_index = models.PositiveIntegerField()
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        ordering = ['session', 'row_index']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['session', 'row_index'],
+                name='uniq_import_staging_row',
+            ),
+        ]
@@ -0,0 +1,129 @@
+# distributorplatform/app/inventory/parse_cache.py
+# Content-hash cache for parsed uploads: re-uploading the same price list or invoice file skips the parser.
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import time
+
+from django.core.cache import cache
+
+from core.cache import redis_connection
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = 'parse_cache'
+# Parsed previews are only useful while staff are working on an upload.
+PARSE_CACHE_TIMEOUT = 60 * 60 * 24
+# LRU bound: parsed price lists run to a few hundred KB, so keep the shared cache small.
+PARSE_CACHE_MAX_ENTRIES = 200
+_INDEX_KEY = f'{NAMESPACE}:index'
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def upload_digest(file) -> str:
+    """SHA-256 of an upload's bytes, read in chunks; the file is rewound afterwards."""
+    digest = hashlib.sha256()
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    for chunk in iter(lambda: file.read(_HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return digest.hexdigest()
+
+
+def _parser_name(parser) -> str:
+    return f'{parser.__module__}.{parser.__name__}'
+
+
+def _counter_key(parser_name: str, outcome: str) -> str:
+    return f'{NAMESPACE}:{outcome}:{parser_name}'
+
+
+def _count(parser_name: str, outcome: str) -> None:
+    key = _counter_key(parser_name, outcome)
+    try:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+    except Exception:
+        logger.warning('[parse_cache] could not count %s for %s', outcome, parser_name, exc_info=True)
+
+
+def _touch_index(key: str, *, added: bool) -> None:
+    """Move key to the most-recent end of the LRU index; evict the oldest entries past the bound."""
+    redis = redis_connection()
+    if redis is not None:
+        # Sorted set scored by last use. ZADD and the rank trim run in one MULTI/EXEC,
+        # so concurrent previews cannot overwrite each other's index updates.
+        pipe = redis.pipeline()
+        pipe.zadd(_INDEX_KEY, {key: time.time()})
+        if added:
+            pipe.zrange(_INDEX_KEY, 0, -PARSE_CACHE_MAX_ENTRIES - 1)
+            pipe.zremrangebyrank(_INDEX_KEY, 0, -PARSE_CACHE_MAX_ENTRIES - 1)
+        pipe.expire(_INDEX_KEY, PARSE_CACHE_TIMEOUT)
+        results = pipe.execute()
+        evicted = results[1] if added else []
+        if evicted:
+            cache.delete_many([k.decode() if isinstance(k, bytes) else k for k in evicted])
+        return
+    # Non-Redis caches: best-effort (not atomic), good enough for development.
+    index = [k for k in cache.get(_INDEX_KEY) or [] if k != key]
+    index.append(key)
+    evicted = index[:-PARSE_CACHE_MAX_ENTRIES] if added else []
+    if evicted:
+        cache.delete_many(evicted)
+        index = index[len(evicted):]
+    cache.set(_INDEX_KEY, index, PARSE_CACHE_TIMEOUT)
+
+
+def cached_parse(file, parser, *, version: int):
+    """
+    Return parser(file), reusing the stored result when the same bytes were parsed
+    before by the same parser version. Keys are '<parser>:v<version>:<ext>:<sha256>'
+    (the extension is part of the key because parsers dispatch on the filename).
+    Only successful (result, None) parses are stored; on cache errors the file is
+    simply parsed.
+    """
+    parser_name = _parser_name(parser)
+    ext = os.path.splitext(getattr(file, 'name', '') or '')[1].lower()
+    try:
+        key = f'{NAMESPACE}:{parser_name}:v{version}:{ext}:{upload_digest(file)}'
+        cached = cache.get(key)
+    except Exception:
+        logger.warning('[parse_cache] read failed for %s', parser_name, exc_info=True)
+        return parser(file)
+
+    if cached is not None:
+        _count(parser_name, 'hits')
+        try:
+            _touch_index(key, added=False)
+        except Exception:
+            logger.warning('[parse_cache] index update failed', exc_info=True)
+        return cached, None
+
+    _count(parser_name, 'misses')
+    result, error = parser(file)
+    if error is None:
+        try:
+            cache.set(key, result, PARSE_CACHE_TIMEOUT)
+            _touch_index(key, added=True)
+        except Exception:
+            logger.warning('[parse_cache] write failed for %s', parser_name, exc_info=True)
+    return result, error
+
+
+def parse_cache_stats(parsers) -> dict[str, dict[str, int]]:
+    """Hit/miss counters keyed by parser ('module.function'), for diagnostics."""
+    parser_names = [_parser_name(parser) for parser in parsers]
+    keys = {
+        (name, outcome): _counter_key(name, outcome)
+        for name in parser_names
+        for outcome in ('hits', 'misses')
+    }
+    values = cache.get_many(list(keys.values()))
+    stats = {name: {'hits': 0, 'misses': 0} for name in parser_names}
+    for (name, outcome), key in keys.items():
+        stats[name][outcome] = int(values.get(key) or 0)
+    return stats
@@ -1,12 +1,37 @@
 # distributorplatform/app/inventory/resources.py
 from import_export import resources, fields, widgets
 from .models import Quotation, QuotationItem, Supplier, InventoryBatch # <-- Add InventoryBatch
+from product.catalog import CatalogMatcher
 from product.models import Product # Keep Product import here
 from sales.models import Invoice, InvoiceItem
 from django.utils.dateparse import parse_date
 from datetime import date, datetime
 from decimal import Decimal # Import Decimal
 
+_PRODUCT_NAME_COLUMNS = ('Product Name', 'Product', 'System product name')
+
+
+def _preloaded_products(dataset, is_placeholder):
+    """
+    Resolve every product the file names in one pass: one CatalogMatcher, matched
+    products loaded with one query and missing ones created with one bulk_create.
+    Returns the matcher and a {(sku, name): Product} map that _resolve_product_from_row()
+    reads instead of resolving (and creating) row by row.
+    """
+    matcher = CatalogMatcher()
+    pairs = []
+    for row in dataset.dict:
+        names = (row.get(key) for key in _PRODUCT_NAME_COLUMNS)
+        name = next((str(value).strip() for value in names if value is not None and str(value).strip()), '')
+        if is_placeholder(name):
+            continue
+        sku = row.get('Product SKU')
+        pairs.append((str(sku).strip() if sku is not None else '', name))
+    pairs = list(dict.fromkeys(pairs))
+    products = matcher.resolve_all(pairs, defaults={'description': 'Auto-imported'})
+    return matcher, dict(zip(pairs, products))
+
+
 # --- UPDATED RESOURCE for Supplier ---
 class SupplierResource(resources.ModelResource):
     class Meta:
@@ -85,11 +110,6 @@ class QuotationResource(resources.ModelResource):
         supplier, _ = Supplier.objects.get_or_create(name=name)
         return supplier
 
-    def _get_or_create_product(self, name):
-        """ Finds or creates a product """
-        product, _ = Product.objects.get_or_create(name=name, defaults={'description': 'Auto-imported'})
-        return product
-
     def _get_or_create_quotation(self, quotation_id, supplier, date_quoted, notes, transport_cost):
         """ Finds or creates/updates a quotation header (notes must be str, not None). """
         notes_val = notes if notes is not None else ''
@@ -110,7 +130,7 @@ class QuotationResource(resources.ModelResource):
 
     def before_import(self, dataset, **kwargs):
         """Prepare data before importing rows (django-import-export passes extra flags in **kwargs)."""
-        pass
+        self._catalog, self._row_products = _preloaded_products(dataset, self._is_placeholder_product)
 
     def _row_price_myr_raw(self, row):
         v = row.get('Quoted Price (MYR)')
@@ -121,15 +141,13 @@ class QuotationResource(resources.ModelResource):
     def _resolve_product_from_row(self, row, product_name_required):
         """Match Product SKU first, then Product Name / Product; create by name if missing."""
         sku_raw = row.get('Product SKU')
-        sku = str(sku_raw).strip() if sku_raw is not None and str(sku_raw).strip() else ''
-        if sku:
-            product = Product.objects.filter(sku=sku).first()
-            if product:
-                return product
-        product = Product.objects.filter(name__iexact=product_name_required.strip()).first()
-        if product:
+        sku = str(sku_raw).strip() if sku_raw is not None else ''
+        product = getattr(self, '_row_products', {}).get((sku, product_name_required))
+        if product is not None:
             return product
-        return self._get_or_create_product(product_name_required)
+        if getattr(self, '_catalog', None) is None:
+            self._catalog = CatalogMatcher()
+        return self._catalog.product(sku, product_name_required, defaults={'description': 'Auto-imported'})
 
     def before_import_row(self, row, row_number=None, **kwargs):
         """ Process data and create/update parent objects before item import. """
@@ -324,21 +342,18 @@ class InvoiceImportResource(resources.ModelResource):
         supplier, _ = Supplier.objects.get_or_create(name=name)
         return supplier
 
+    def before_import(self, dataset, **kwargs):
+        self._catalog, self._row_products = _preloaded_products(dataset, self._is_placeholder_product)
+
     def _resolve_product_from_row(self, row, product_name_required):
         sku_raw = row.get('Product SKU')
-        sku = str(sku_raw).strip() if sku_raw is not None and str(sku_raw).strip() else ''
-        if sku:
-            product = Product.objects.filter(sku=sku).first()
-            if product:
-                return product
-        product = Product.objects.filter(name__iexact=product_name_required.strip()).first()
-        if product:
+        sku = str(sku_raw).strip() if sku_raw is not None else ''
+        product = getattr(self, '_row_products', {}).get((sku, product_name_required))
+        if product is not None:
             return product
-        product, _ = Product.objects.get_or_create(
-            name=product_name_required,
-            defaults={'description': 'Auto-imported'},
-        )
-        return product
+        if getattr(self, '_catalog', None) is None:
+            self._catalog = CatalogMatcher()
+        return self._catalog.product(sku, product_name_required, defaults={'description': 'Auto-imported'})
 
     def _row_unit_price_raw(self, row):
         for key in ('Unit Price (MYR)', 'Quoted Price (MYR)', 'Quoted Price (Unit)'):
@@ -1,12 +1,23 @@
 # Centralized supplier price matrix: parse uploads and resolve product costs.
 from __future__ import annotations
 
+import logging
+import multiprocessing
 import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from decimal import Decimal, InvalidOperation
+from itertools import repeat
 from typing import Any
 
 from tablib import Dataset
 
+logger = logging.getLogger(__name__)
+
+# Bump when parse output changes, so cached previews (inventory.parse_cache) are not reused.
+PRICE_MATRIX_PARSER_VERSION = 1
+
 MEDICATION_KEYS = (
     'medication', 'product', 'product name', 'drug', 'drug name', 'item', 'item name', 'name',
 )
@@ -951,19 +962,29 @@ def _extract_tables_for_page(page, settings: dict | None):
     return page.extract_tables(settings) or []
 
 
-def _parse_tables_from_page(page) -> list[dict]:
-    """Try multiple pdfplumber strategies; split two-column pages when needed."""
+def _parse_tables_from_page(page, *, time_budget: float | None = None) -> list[dict]:
+    """
+    Try pdfplumber strategies in order, stopping at the first that yields a price
+    table; split two-column pages when none does. Strategies are skipped once the
+    page has used its time budget (seconds).
+    """
     parsed: list[dict] = []
+    deadline = time.monotonic() + time_budget if time_budget else None
+    budget_used = False
 
     def try_page(scan_page) -> bool:
-        before = len(parsed)
+        nonlocal budget_used
         for settings in _PDF_TABLE_SETTINGS:
+            if deadline is not None and time.monotonic() > deadline:
+                budget_used = True
+                return False
+            found: list[dict] = []
             for table in _extract_tables_for_page(scan_page, settings):
-                rows = _clean_pdf_table(table)
-                segment_rows = _parse_pdf_table_segments(rows)
-                if segment_rows:
-                    parsed.extend(segment_rows)
-        return len(parsed) > before
+                found.extend(_parse_pdf_table_segments(_clean_pdf_table(table)))
+            if found:
+                parsed.extend(found)
+                return True
+        return False
 
     if try_page(page):
         return parsed
@@ -972,20 +993,52 @@ def _parse_tables_from_page(page) -> list[dict]:
     if mid > 0:
         try_page(page.crop((0, 0, mid, page.height)))
         try_page(page.crop((mid, 0, page.width, page.height)))
+    if budget_used:
+        # Once per page, not once per half-page crop.
+        logger.warning('PDF page %s: time budget of %ss used, skipped remaining strategies.',
+                       page.page_number, time_budget)
     return parsed
 
 
+# Starting worker processes costs about a second; short files are faster in-process.
+PDF_PARALLEL_MIN_PAGES = 4
+
+
+def _parse_pdf_page(path: str, page_index: int, time_budget: float | None) -> list[dict]:
+    """Pool worker: open the PDF from the shared temp file and parse one page."""
+    import pdfplumber
+
+    with pdfplumber.open(path, pages=[page_index + 1]) as pdf:
+        return _parse_tables_from_page(pdf.pages[0], time_budget=time_budget)
+
+
 def _extract_rows_from_pdf_tables(content: bytes) -> list[dict]:
+    """
+    Parse every page's tables. Multi-page files are split across a process pool
+    (PDF_PARSE_WORKERS); results are merged in page order, so row order matches a
+    sequential scan.
+    """
     import pdfplumber
     from io import BytesIO
 
-    all_rows: list[dict] = []
+    from django.conf import settings
+
+    workers = getattr(settings, 'PDF_PARSE_WORKERS', 1)
+    time_budget = getattr(settings, 'PDF_PAGE_TIME_BUDGET', None)
     with pdfplumber.open(BytesIO(content)) as pdf:
-        for page in pdf.pages:
-            page_rows = _parse_tables_from_page(page)
-            if page_rows:
-                all_rows.extend(page_rows)
-    return all_rows
+        page_count = len(pdf.pages)
+        if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+            return [row for page in pdf.pages for row in _parse_tables_from_page(page, time_budget=time_budget)]
+
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as handle:
+        handle.write(content)
+        handle.flush()
+        # spawn: forking a threaded app-server worker is not safe; this module imports no Django state.
+        with ProcessPoolExecutor(
+            max_workers=min(workers, page_count), mp_context=multiprocessing.get_context('spawn'),
+        ) as pool:
+            pages = pool.map(_parse_pdf_page, repeat(handle.name), range(page_count), repeat(time_budget))
+            return [row for page_rows in pages for row in page_rows]
 
 
 def _parse_pdf_price_matrix_file(content: bytes) -> tuple[list[dict] | None, str | None]:
@@ -1214,17 +1267,16 @@ def build_supplier_costs_from_quotations(product) -> list[dict]:
     supplier_costs: list[dict] = []
     seen_suppliers: set[int] = set()
 
-    if hasattr(product, 'latest_quotation_items') and product.latest_quotation_items:
-        quotation_items = product.latest_quotation_items
-    else:
-        quotation_items = (
-            QuotationItem.objects.filter(product=product)
-            .select_related('quotation', 'quotation__supplier')
-            .prefetch_related('quotation__items')
-            .order_by('-quotation__date_quoted')
-        )
+    quotation_items = (
+        QuotationItem.objects.filter(product=product)
+        .whole_quotations().with_landed_cost()
+        .select_related('quotation', 'quotation__supplier')
+        .order_by('-quotation__date_quoted')
+    )
 
     for item in quotation_items:
+        if item.product_id != product.pk:
+            continue
         sup_id = item.quotation.supplier_id
         if sup_id in seen_suppliers:
             continue
@@ -1242,9 +1294,14 @@ def build_supplier_costs_from_quotations(product) -> list[dict]:
 
 
 def invoice_item_landed_cost_per_unit(invoice_item, invoice_subtotal: Decimal | None = None) -> Decimal | None:
-    """Unit price in MYR plus pro-rata share of invoice transportation cost."""
+    """
+    Unit price in MYR plus pro-rata share of invoice transportation cost.
+    Lines from InvoiceItem.objects.with_landed_cost() already carry it.
+    """
     if invoice_item is None or not invoice_item.quantity or invoice_item.unit_price is None:
         return None
+    if invoice_subtotal is None and hasattr(invoice_item, 'annotated_landed_cost_per_unit'):
+        return invoice_item.annotated_landed_cost_per_unit
     inv = invoice_item.invoice
     subtotal = invoice_subtotal if invoice_subtotal is not None else (inv.subtotal or Decimal('0'))
     transport = inv.transportation_cost or Decimal('0')
@@ -1302,12 +1359,15 @@ def build_supplier_costs_from_invoices(product) -> list[dict]:
 
     items = (
         InvoiceItem.objects.filter(product=product, quantity__gt=0)
+        .whole_invoices().with_landed_cost()
         .select_related('invoice', 'invoice__supplier')
         .order_by('-invoice__date_issued', '-invoice__created_at', '-pk')
     )
     seen_suppliers: set[int] = set()
     supplier_costs: list[dict] = []
     for item in items:
+        if item.product_id != product.pk:
+            continue
         sup_id = item.invoice.supplier_id
         if not sup_id or sup_id in seen_suppliers:
             continue
@@ -1325,11 +1385,8 @@ def build_supplier_costs_from_invoices(product) -> list[dict]:
     return supplier_costs
 
 
-def get_product_supplier_costs(product) -> list[dict]:
-    """Matrix prices take precedence, then invoice landed cost, then legacy quotations."""
-    matrix_costs = build_supplier_costs_from_matrix(product)
+def _merge_supplier_costs(matrix_costs: list[dict], invoice_costs: list[dict], quotation_costs: list[dict]) -> list[dict]:
     matrix_by_supplier = {c['supplier_id']: c for c in matrix_costs}
-    invoice_costs = build_supplier_costs_from_invoices(product)
     invoice_by_supplier = {c['supplier_id']: c for c in invoice_costs}
     merged = list(matrix_costs)
 
@@ -1337,7 +1394,7 @@ def get_product_supplier_costs(product) -> list[dict]:
         if row['supplier_id'] not in matrix_by_supplier:
             merged.append(row)
 
-    for row in build_supplier_costs_from_quotations(product):
+    for row in quotation_costs:
         sid = row['supplier_id']
         if sid not in matrix_by_supplier and sid not in invoice_by_supplier:
             merged.append(row)
@@ -1345,6 +1402,237 @@ def get_product_supplier_costs(product) -> list[dict]:
     return sorted(merged, key=lambda x: x['supplier_name'])
 
 
+def get_product_supplier_costs(product) -> list[dict]:
+    """Matrix prices take precedence, then invoice landed cost, then legacy quotations."""
+    return get_supplier_costs_for_products([product.pk]).get(product.pk, [])
+
+
+def _bulk_matrix_costs(product_ids: list[int]) -> dict[int, list[dict]]:
+    from django.db.models import OuterRef, Subquery
+
+    from inventory.models import SupplierPriceMatrixEntry, SupplierPriceMatrixTier
+
+    default_tier_price = (
+        SupplierPriceMatrixTier.objects.filter(entry=OuterRef('pk'))
+        .order_by('min_quantity').values('unit_price')[:1]
+    )
+    # DISTINCT ON (product, supplier): newest priced entry per pair.
+    entries = (
+        SupplierPriceMatrixEntry.objects.filter(product_id__in=product_ids)
+        .annotate(default_unit_price=Subquery(default_tier_price))
+        .filter(default_unit_price__isnull=False)
+        .select_related('supplier')
+        .order_by('product_id', 'supplier_id', '-updated_at', '-pk')
+        .distinct('product_id', 'supplier_id')
+    )
+    costs: dict[int, list[dict]] = {}
+    for entry in entries:
+        costs.setdefault(entry.product_id, []).append({
+            'supplier_id': entry.supplier_id,
+            'supplier_name': entry.supplier.name or 'Unknown',
+            'cost': entry.default_unit_price,
+            'date': entry.effective_date or entry.updated_at.date(),
+            'updated_at': entry.updated_at,
+            'source': 'matrix',
+        })
+    return costs
+
+
+def _bulk_invoice_costs(product_ids: list[int]) -> dict[int, list[dict]]:
+    from sales.models import InvoiceItem
+
+    # Whole invoices feed the subtotal window; DISTINCT ON (product, supplier) then keeps
+    # the latest line per pair, and pairs of products we were not asked about are dropped.
+    wanted = set(product_ids)
+    items = (
+        InvoiceItem.objects.filter(product_id__in=product_ids)
+        .whole_invoices().with_landed_cost()
+        # Safe before the window: zero-quantity lines add nothing and supplier is per invoice.
+        .filter(quantity__gt=0, invoice__supplier__isnull=False)
+        .select_related('invoice', 'invoice__supplier')
+        .order_by('product_id', 'invoice__supplier_id', '-invoice__date_issued', '-invoice__created_at', '-pk')
+        .distinct('product_id', 'invoice__supplier_id')
+    )
+
+    costs: dict[int, list[dict]] = {}
+    for item in items:
+        if item.product_id not in wanted:
+            continue
+        landed = item.annotated_landed_cost_per_unit
+        if landed is None:
+            continue
+        costs.setdefault(item.product_id, []).append({
+            'supplier_id': item.invoice.supplier_id,
+            'supplier_name': item.invoice.supplier.name or 'Unknown',
+            'cost': landed,
+            'date': item.invoice.date_issued,
+            'source': 'invoice',
+        })
+    return costs
+
+
+def _bulk_quotation_costs(product_ids: list[int]) -> dict[int, list[dict]]:
+    from inventory.models import QuotationItem
+
+    # Whole quotations feed the total window; DISTINCT ON (product, supplier) keeps the latest line.
+    wanted = set(product_ids)
+    items = (
+        QuotationItem.objects.filter(product_id__in=product_ids)
+        .whole_quotations().with_landed_cost()
+        .select_related('quotation', 'quotation__supplier')
+        .order_by('product_id', 'quotation__supplier_id', '-quotation__date_quoted', '-pk')
+        .distinct('product_id', 'quotation__supplier_id')
+    )
+
+    costs: dict[int, list[dict]] = {}
+    for item in items:
+        if item.product_id not in wanted:
+            continue
+        cost = item.annotated_landed_cost_per_unit
+        if cost is None:
+            continue
+        costs.setdefault(item.product_id, []).append({
+            'supplier_id': item.quotation.supplier_id,
+            'supplier_name': item.quotation.supplier.name or 'Unknown',
+            'cost': cost,
+            'date': item.quotation.date_quoted,
+            'source': 'quotation',
+        })
+    return costs
+
+
+def compute_supplier_costs_for_products(product_ids) -> dict[int, list[dict]]:
+    """
+    Live matrix > invoice > quotation merge for many products in a constant number
+    of queries (three, regardless of len(product_ids)). Returns {product_id: costs};
+    every requested id is present, with an empty list when it has no supplier pricing.
+    Feeds ProductCostSnapshot; readers should use get_supplier_costs_for_products().
+    """
+    product_ids = list({int(pid) for pid in product_ids})
+    if not product_ids:
+        return {}
+    matrix = _bulk_matrix_costs(product_ids)
+    invoices = _bulk_invoice_costs(product_ids)
+    quotations = _bulk_quotation_costs(product_ids)
+    return {
+        pid: _merge_supplier_costs(matrix.get(pid, []), invoices.get(pid, []), quotations.get(pid, []))
+        for pid in product_ids
+    }
+
+
+def compute_base_costs_for_products(product_ids) -> dict[int, dict]:
+    """
+    Unpinned Product.base_cost fallback for many products: newest matrix entry's
+    default tier, else the latest invoice landed cost (rounded to 0.01), else the
+    latest quotation landed cost when that line has a quantity and a price.
+    Products without any cost are omitted.
+    """
+    from django.db.models import OuterRef, Subquery
+
+    from inventory.models import QuotationItem, SupplierPriceMatrixEntry, SupplierPriceMatrixTier
+    from sales.models import InvoiceItem
+
+    product_ids = list({int(pid) for pid in product_ids})
+    if not product_ids:
+        return {}
+    results: dict[int, dict] = {}
+
+    default_tier_price = (
+        SupplierPriceMatrixTier.objects.filter(entry=OuterRef('pk'))
+        .order_by('min_quantity').values('unit_price')[:1]
+    )
+    for entry in (
+        SupplierPriceMatrixEntry.objects.filter(product_id__in=product_ids)
+        .annotate(default_unit_price=Subquery(default_tier_price))
+        .order_by('product_id', '-updated_at', '-pk')
+        .distinct('product_id')
+    ):
+        if entry.default_unit_price is not None:
+            results[entry.product_id] = {
+                'cost': entry.default_unit_price,
+                'date': entry.effective_date or entry.updated_at.date(),
+                'source': 'matrix',
+            }
+
+    remaining = {pid for pid in product_ids if pid not in results}
+    if remaining:
+        items = (
+            InvoiceItem.objects.filter(product_id__in=remaining)
+            .whole_invoices().with_landed_cost()
+            .filter(quantity__gt=0)  # zero-quantity lines add nothing to the subtotal
+            .select_related('invoice')
+            .order_by('product_id', '-invoice__date_issued', '-invoice__created_at', '-pk')
+            .distinct('product_id')
+        )
+        for item in items:
+            if item.product_id not in remaining:
+                continue
+            landed = item.annotated_landed_cost_per_unit
+            if landed is not None:
+                results[item.product_id] = {
+                    # Rounded like the pricing UI's landed cost (latest_invoice_cost_detail_for_product).
+                    'cost': landed.quantize(Decimal('0.01')),
+                    'date': item.invoice.date_issued,
+                    'source': 'invoice',
+                }
+
+    remaining = {pid for pid in product_ids if pid not in results}
+    if remaining:
+        items = (
+            QuotationItem.objects.filter(product_id__in=remaining)
+            .whole_quotations().with_landed_cost()
+            .select_related('quotation')
+            .order_by('product_id', '-quotation__date_quoted', '-pk')
+            .distinct('product_id')
+        )
+        for item in items:
+            if item.product_id not in remaining:
+                continue
+            # A price-only line (quantity 0) of the latest quotation gives no base cost.
+            if not item.quantity or not item.quoted_price:
+                continue
+            landed = item.annotated_landed_cost_per_unit
+            if landed is not None:
+                results[item.product_id] = {
+                    'cost': landed,
+                    'date': item.quotation.date_quoted,
+                    'source': 'quotation',
+                }
+    return results
+
+
+def get_supplier_costs_for_products(product_ids) -> dict[int, list[dict]]:
+    """
+    Per-supplier costs for many products from ProductCostSnapshot in one query.
+    Returns {product_id: costs} sorted by supplier name, same shape as
+    compute_supplier_costs_for_products().
+    """
+    from product.models import ProductCostSnapshot
+
+    product_ids = list({int(pid) for pid in product_ids})
+    if not product_ids:
+        return {}
+    costs: dict[int, list[dict]] = {pid: [] for pid in product_ids}
+    snapshots = (
+        ProductCostSnapshot.objects.filter(product_id__in=product_ids, supplier__isnull=False)
+        .select_related('supplier')
+    )
+    for snapshot in snapshots:
+        row = {
+            'supplier_id': snapshot.supplier_id,
+            'supplier_name': snapshot.supplier.name or 'Unknown',
+            'cost': snapshot.cost,
+            'date': snapshot.cost_date,
+            'source': snapshot.source,
+        }
+        if snapshot.source == ProductCostSnapshot.Source.MATRIX:
+            row['updated_at'] = snapshot.source_updated_at
+        costs[snapshot.product_id].append(row)
+    for rows in costs.values():
+        rows.sort(key=lambda x: x['supplier_name'])
+    return costs
+
+
 def _matrix_search_tokens(search_query: str) -> list[str]:
     tokens = [part for part in search_query.split() if len(part) >= 2]
     if not tokens and search_query:
@@ -1474,13 +1762,69 @@ def latest_matrix_unit_price_for_product(product) -> Decimal | None:
     return default_matrix_unit_price(entry)
 
 
+def _normalize_matrix_tiers_for_json(tiers) -> list[dict]:
+    """Serialize tier rows (model instances or dicts) for JSON storage/comparison."""
+    normalized = []
+    for tier in tiers:
+        if hasattr(tier, 'min_quantity'):
+            min_qty = tier.min_quantity
+            max_qty = tier.max_quantity
+            unit_price = tier.unit_price
+        else:
+            min_qty = tier.get('min_quantity', 1)
+            max_qty = tier.get('max_quantity')
+            unit_price = tier.get('unit_price')
+        normalized.append({
+            'min_quantity': int(min_qty),
+            'max_quantity': int(max_qty) if max_qty not in (None, '') else None,
+            'unit_price': str(Decimal(str(unit_price)).quantize(Decimal('0.01'))),
+        })
+    normalized.sort(key=lambda t: t['min_quantity'])
+    return normalized
+
+
+def replace_matrix_tiers(tiers_by_entry: dict[int, list[tuple[int, int | None, Decimal]]]) -> None:
+    """
+    Make each entry's tiers exactly the given (min_quantity, max_quantity, unit_price)
+    rows, with one read and bulk writes for the whole batch. Tiers are matched on
+    min_quantity (unique per entry): changed ones are updated in place, new ones
+    inserted, and only tiers that disappeared are deleted. Bulk writes skip the cost
+    signals, so callers refresh the affected products' snapshots.
+    """
+    from inventory.models import SupplierPriceMatrixTier
+
+    current = {}
+    for tier in SupplierPriceMatrixTier.objects.filter(entry_id__in=list(tiers_by_entry)):
+        current.setdefault(tier.entry_id, {})[tier.min_quantity] = tier
+
+    to_create, to_update, ids_to_delete = [], [], []
+    for entry_id, tiers in tiers_by_entry.items():
+        existing = current.get(entry_id, {})
+        for min_quantity, max_quantity, unit_price in tiers:
+            tier = existing.pop(min_quantity, None)
+            if tier is None:
+                to_create.append(SupplierPriceMatrixTier(
+                    entry_id=entry_id,
+                    min_quantity=min_quantity,
+                    max_quantity=max_quantity,
+                    unit_price=unit_price,
+                ))
+            elif (tier.max_quantity, tier.unit_price) != (max_quantity, unit_price):
+                tier.max_quantity = max_quantity
+                tier.unit_price = unit_price
+                to_update.append(tier)
+        ids_to_delete.extend(tier.pk for tier in existing.values())
+
+    if ids_to_delete:
+        SupplierPriceMatrixTier.objects.filter(pk__in=ids_to_delete).delete()
+    SupplierPriceMatrixTier.objects.bulk_update(to_update, ['max_quantity', 'unit_price'], batch_size=1000)
+    SupplierPriceMatrixTier.objects.bulk_create(to_create, batch_size=1000)
+
+
 def sync_saved_base_costs_for_products(product_ids: list[int]) -> None:
-    from product.models import Product
-    from product.pricing_sync import reconcile_saved_base_cost_with_quotations
+    from product.cost_snapshot import refresh_cost_snapshots
+    from product.pricing_sync import reconcile_saved_base_costs_for_products
 
-    for pid in product_ids:
-        product = Product.objects.filter(pk=pid).first()
-        if not product:
-            continue
-        supplier_costs = get_product_supplier_costs(product)
-        reconcile_saved_base_cost_with_quotations(product, supplier_costs)
+    # Bulk imports bypass model signals, so bring the snapshots up to date first.
+    refresh_cost_snapshots(product_ids)
+    reconcile_saved_base_costs_for_products(product_ids)
@@ -0,0 +1,325 @@
+# distributorplatform/app/inventory/tasks.py
+# Background jobs (core.jobs) for payable-invoice and supplier price-matrix imports.
+from __future__ import annotations
+
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+
+from core.jobs import JobFailed, job_task
+from product.catalog import CatalogMatcher
+from product.cost_snapshot import deferred_cost_snapshot_refresh, request_cost_snapshot_refresh
+
+from .import_staging import (
+    IMPORT_SESSION_EXPIRED,
+    INVOICE_OVERRIDE_FIELDS,
+    MATRIX_OVERRIDE_FIELDS,
+    ImportSessionExpired,
+    apply_row_overrides,
+    load_staged_rows,
+)
+from .invoice_import import _normalize_import_action, confirm_payable_invoice_import
+from .supplier_pricing import (
+    _normalize_matrix_tiers_for_json,
+    replace_matrix_tiers,
+    sync_saved_base_costs_for_products,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _staged_rows(session_id, kind, user):
+    try:
+        return load_staged_rows(session_id, kind, user)
+    except ImportSessionExpired:
+        raise JobFailed(IMPORT_SESSION_EXPIRED) from None
+
+
+@job_task('inventory.payable_invoice_import')
+def payable_invoice_import(job, *, session_id=None, suppliers=None, source_filename=''):
+    """
+    Import a Payable Invoice Detail file: the rows staged by the preview with the user's
+    per-supplier mappings (suppliers = [{key, action, supplier_id, ...}]), or a legacy
+    payload carrying the full parsed suppliers.
+    """
+    from inventory.models import ImportSession, Supplier
+    from product.models import Product
+    from sales.models import Invoice, InvoiceItem
+
+    session = None
+    if session_id:
+        session, staged = _staged_rows(session_id, ImportSession.Kind.PAYABLE_INVOICES, job.created_by)
+        suppliers = apply_row_overrides(staged, suppliers, key='key', fields=INVOICE_OVERRIDE_FIELDS)
+        source_filename = session.source_filename
+    if not suppliers:
+        raise JobFailed('No supplier data to import.')
+    if all(_normalize_import_action(s.get('action')) == 'ignore' for s in suppliers):
+        raise JobFailed('All suppliers are ignored. Nothing to import.')
+
+    job.report_progress(0, 1, 'Importing invoices')
+    try:
+        with transaction.atomic(), deferred_cost_snapshot_refresh():
+            stats = confirm_payable_invoice_import(
+                {
+                    'source_filename': source_filename or '',
+                    'suppliers': suppliers,
+                },
+                product_model=Product,
+                supplier_model=Supplier,
+                invoice_model=Invoice,
+                invoice_item_model=InvoiceItem,
+            )
+    except ValueError as exc:
+        logger.warning('payable_invoice_import validation failed: %s', exc)
+        raise JobFailed(str(exc)) from exc
+    except IntegrityError as exc:
+        logger.warning('payable_invoice_import integrity error: %s', exc)
+        raise JobFailed(
+            'Database conflict during import. Check for duplicate invoice IDs or supplier codes.'
+        ) from exc
+
+    logger.info('payable_invoice_import phase timings: %s', stats['timings'])
+    if session is not None:
+        session.delete()
+    parts = []
+    if stats['invoices_created']:
+        parts.append(f"{stats['invoices_created']} invoice(s) created")
+    if stats['invoices_updated']:
+        parts.append(f"{stats['invoices_updated']} invoice(s) updated")
+    if stats['invoices_skipped']:
+        parts.append(f"{stats['invoices_skipped']} skipped (linked to PO)")
+    if stats['products_created']:
+        parts.append(f"{stats['products_created']} product(s) created")
+    if stats['products_matched']:
+        parts.append(f"{stats['products_matched']} existing product(s) used")
+    if stats.get('matrix_rows_updated'):
+        parts.append(f"{stats['matrix_rows_updated']} supplier price row(s) updated")
+    message = 'Import complete: ' + ', '.join(parts) if parts else 'Import complete.'
+    return {'success': True, 'message': message, 'stats': stats}
+
+
+def _matrix_conversion_rate(currency: str, rate_usd, rate_eur):
+    cur = (currency or 'MYR').upper()
+    if cur == 'USD':
+        return rate_usd
+    if cur == 'EUR':
+        return rate_eur
+    return None
+
+
+def _matrix_price_to_myr(amount, currency: str, rate_usd, rate_eur) -> Decimal:
+    cur = (currency or 'MYR').upper()
+    if cur == 'MYR':
+        return amount
+    if cur == 'USD':
+        return (amount * rate_usd).quantize(Decimal('0.01'))
+    if cur == 'EUR':
+        return (amount * rate_eur).quantize(Decimal('0.01'))
+    return amount
+
+
+def _import_price_matrix_rows(supplier, rows, *, source_filename, currency, rate_usd, rate_eur):
+    """
+    Upsert centralized supplier price matrix entries and tier prices (stored in MYR)
+    for validated rows. Returns (row errors, ids of products whose costs changed);
+    rows with errors are skipped, the others are written.
+    """
+    from inventory.models import SupplierPriceMatrixEntry, SupplierPriceMatrixUploadRecord
+    from product.models import Product
+
+    conversion_rate = _matrix_conversion_rate(currency, rate_usd, rate_eur)
+
+    errors = []
+    affected_product_ids = set()
+
+    with transaction.atomic(), deferred_cost_snapshot_refresh():
+        # Rows without a chosen product_id are matched by exact name only (or created,
+        # with their SKU when it is free) in memory against one catalog snapshot. A SKU
+        # owned by another product never redirects the row to that product.
+        matcher = CatalogMatcher()
+        new_rows = {
+            i: row for i, row in enumerate(rows)
+            if not row.get('product_id') and (row.get('new_product_name') or '').strip()
+            and (row.get('medication') or row.get('line_medication') or '').strip() and row.get('tiers')
+        }
+        new_row_products = dict(zip(new_rows, matcher.resolve_all(
+            [(row.get('new_product_sku'), row.get('new_product_name')) for row in new_rows.values()],
+            defaults={'description': ''},
+            assign_sku=True,
+            name_only=True,
+        )))
+        chosen_ids = {str(row.get('product_id')) for row in rows if row.get('product_id')}
+        chosen_products = {
+            str(pk): product
+            for pk, product in Product.objects.in_bulk([pk for pk in chosen_ids if pk.isdigit()]).items()
+        }
+        # Validate every row first, then write entries, tiers, upload records and supplier
+        # links with a fixed number of statements. A key repeated in the file keeps its
+        # last row, as sequential update_or_create calls did; every row still gets its record.
+        entries_by_key = {}
+        tiers_by_key = {}
+        record_rows = []
+        for i, row in enumerate(rows):
+            medication = (row.get('medication') or row.get('line_medication') or '').strip()
+            if not medication:
+                errors.append(f"Row {i + 1}: medication name is required.")
+                continue
+            strength = (row.get('strength') or '').strip()
+            size = (row.get('size') or '').strip()
+            form = (row.get('form') or '').strip()
+            notes = (row.get('notes') or '').strip()
+            tiers = row.get('tiers') or []
+            if not tiers:
+                errors.append(f"Row {i + 1}: at least one price tier is required.")
+                continue
+
+            product = None
+            product_id = row.get('product_id')
+            new_name = (row.get('new_product_name') or '').strip()
+            new_sku = (row.get('new_product_sku') or '').strip() or None
+            if product_id:
+                product = chosen_products.get(str(product_id))
+                if product is None:
+                    errors.append(f"Row {i + 1}: product not found.")
+                    continue
+            elif new_name:
+                product = new_row_products[i]
+                if new_sku and not product.sku and not matcher.sku_taken(new_sku):
+                    product.sku = new_sku
+                    product.save(update_fields=['sku'])
+                    matcher.remember(product)
+
+            row_tiers = []
+            for tier in tiers:
+                try:
+                    min_qty = int(tier.get('min_quantity', 1))
+                    max_qty = tier.get('max_quantity')
+                    max_qty = int(max_qty) if max_qty not in (None, '') else None
+                    raw_price = Decimal(str(tier.get('unit_price')))
+                    unit_price = _matrix_price_to_myr(raw_price, currency, rate_usd, rate_eur)
+                except (ValueError, TypeError, InvalidOperation):
+                    errors.append(f"Row {i + 1}: invalid tier data.")
+                    continue
+                if min_qty < 1 or unit_price < 0:
+                    errors.append(f"Row {i + 1}: tier min quantity must be ≥ 1 and price ≥ 0.")
+                    continue
+                row_tiers.append((min_qty, max_qty, unit_price))
+
+            key = (medication, strength, size)
+            entries_by_key[key] = SupplierPriceMatrixEntry(
+                supplier=supplier,
+                line_medication=medication,
+                strength=strength,
+                size=size,
+                form=form,
+                notes=notes,
+                product=product,
+                price_currency=currency,
+                conversion_rate=conversion_rate,
+                source_filename=source_filename,
+            )
+            tiers_by_key[key] = row_tiers
+            record_rows.append((key, _normalize_matrix_tiers_for_json(
+                {'min_quantity': min_qty, 'max_quantity': max_qty, 'unit_price': unit_price}
+                for min_qty, max_qty, unit_price in row_tiers
+            )))
+            if product:
+                affected_product_ids.add(product.id)
+
+        def _entry_keys():
+            return SupplierPriceMatrixEntry.objects.filter(
+                supplier=supplier,
+                line_medication__in={medication for medication, _, _ in entries_by_key},
+            ).values_list('line_medication', 'strength', 'size', 'pk', 'product_id')
+
+        # Products the upload re-maps entries away from lose a cost source.
+        affected_product_ids.update(
+            product_id for medication, strength, size, _, product_id in _entry_keys()
+            if (medication, strength, size) in entries_by_key and product_id
+        )
+        SupplierPriceMatrixEntry.objects.bulk_create(
+            list(entries_by_key.values()),
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['supplier', 'line_medication', 'strength', 'size'],
+            update_fields=[
+                'form', 'notes', 'product', 'price_currency', 'conversion_rate', 'source_filename', 'updated_at',
+            ],
+        )
+        # Upserted rows come back without primary keys: map natural keys to ids in one query.
+        entry_ids = {
+            (medication, strength, size): pk
+            for medication, strength, size, pk, _ in _entry_keys()
+            if (medication, strength, size) in entries_by_key
+        }
+        replace_matrix_tiers({entry_ids[key]: tiers for key, tiers in tiers_by_key.items()})
+        SupplierPriceMatrixUploadRecord.objects.bulk_create(
+            [
+                SupplierPriceMatrixUploadRecord(
+                    entry_id=entry_ids[key],
+                    source_filename=source_filename,
+                    price_currency=currency,
+                    conversion_rate=conversion_rate,
+                    tiers=snapshot_tiers,
+                )
+                for key, snapshot_tiers in record_rows
+            ],
+            batch_size=1000,
+        )
+        supplier_link = Product.suppliers.through
+        supplier_link.objects.bulk_create(
+            [
+                supplier_link(product_id=product.pk, supplier_id=supplier.pk)
+                for product in {entry.product for entry in entries_by_key.values() if entry.product}
+            ],
+            ignore_conflicts=True,
+        )
+        # Bulk writes skip the cost signals.
+        request_cost_snapshot_refresh(affected_product_ids)
+
+    return errors, affected_product_ids
+
+
+@job_task('inventory.supplier_price_matrix_import')
+def supplier_price_matrix_import(
+    job, *, supplier_id, currency, rate_usd, rate_eur,
+    session_id=None, overrides=None, rows=None, source_filename='',
+):
+    """
+    Import supplier price-matrix rows: the rows staged by the preview with the user's
+    product overrides ({row_index, product_id, new_product_name, new_product_sku}),
+    or rows sent directly (manual entry).
+    """
+    from inventory.models import ImportSession, Supplier
+
+    supplier = Supplier.objects.get(pk=supplier_id)
+    session = None
+    if session_id:
+        session, staged = _staged_rows(session_id, ImportSession.Kind.PRICE_MATRIX, job.created_by)
+        rows = apply_row_overrides(staged, overrides, key='row_index', fields=MATRIX_OVERRIDE_FIELDS)
+        source_filename = session.source_filename
+    if not rows:
+        raise JobFailed('No rows provided.')
+
+    job.report_progress(0, 2, 'Updating the price matrix')
+    errors, affected_product_ids = _import_price_matrix_rows(
+        supplier,
+        rows,
+        source_filename=(source_filename or '')[:255],
+        currency=currency,
+        rate_usd=Decimal(str(rate_usd)),
+        rate_eur=Decimal(str(rate_eur)),
+    )
+    if errors:
+        raise JobFailed('Some rows could not be imported.', detail={'errors': errors})
+
+    job.report_progress(1, 2, 'Syncing product base costs')
+    sync_saved_base_costs_for_products(list(affected_product_ids))
+    if session is not None:
+        session.delete()
+    return {
+        'success': True,
+        'message': f"Updated {len(rows)} price row(s) for {supplier.name}.",
+        'updated_rows': len(rows),
+    }
@@ -1,7 +1,11 @@
+import json
 from decimal import Decimal
 from io import BytesIO
+from unittest import mock
 
-from django.test import SimpleTestCase, TestCase
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
 from tablib import Dataset
 
 from inventory.invoice_import import (
@@ -9,7 +13,14 @@ from inventory.invoice_import import (
     parse_payable_invoice_detail_file,
     suggest_supplier_code,
 )
-from inventory.models import Supplier
+from inventory.parse_cache import cached_parse, parse_cache_stats
+from inventory.models import (
+    Quotation,
+    QuotationItem,
+    Supplier,
+    SupplierPriceMatrixEntry,
+    SupplierPriceMatrixTier,
+)
 from product.models import Product
 from sales.models import Invoice, InvoiceItem
 from inventory.supplier_pricing import (
@@ -18,6 +29,12 @@ from inventory.supplier_pricing import (
     _load_pdf_as_dataset,
     _parse_dataset_rows,
     _parse_pdf_table_segments,
+    _parse_tables_from_page,
+    compute_base_costs_for_products,
+    compute_supplier_costs_for_products,
+    get_product_supplier_costs,
+    get_supplier_costs_for_products,
+    invoice_item_landed_cost_per_unit,
     parse_supplier_price_matrix_file,
 )
 
@@ -352,6 +369,172 @@ class SupplierPriceMatrixParserTests(SimpleTestCase):
             return
         self.assertTrue(True)
 
+    def test_pdf_page_stops_at_first_strategy_with_a_price_table(self):
+        table = [['Medication', 'Strength', 'Price'], ['Tirzepatide', '10mg', '80.00']]
+
+        class Page:
+            page_number = 1
+            width = 600
+            height = 800
+
+            def __init__(self):
+                self.calls = []
+
+            def extract_tables(self, settings=None):
+                self.calls.append(settings)
+                return [table]
+
+        page = Page()
+        rows = _parse_tables_from_page(page, time_budget=30)
+        self.assertEqual([row['medication'] for row in rows], ['Tirzepatide'])
+        self.assertEqual(page.calls, [None])
+
+    def test_spent_page_budget_is_logged_once_per_page(self):
+        class Page:
+            page_number = 3
+            width = 600
+            height = 800
+
+            def extract_tables(self, settings=None):
+                return []
+
+            def crop(self, bbox):
+                return self
+
+        with self.assertLogs('inventory.supplier_pricing', level='WARNING') as logs:
+            self.assertEqual(_parse_tables_from_page(Page(), time_budget=1e-9), [])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('PDF page 3', logs.output[0])
+
+    def _pdf_bytes(self, pages):
+        """A minimal PDF: each page draws its rows as a ruled table (Helvetica, 120pt columns)."""
+        objects = ['<< /Type /Catalog /Pages 2 0 R >>', None, '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+        kids = []
+        for rows in pages:
+            ops = []
+            for r, row in enumerate(rows):
+                y = 750 - 20 * r
+                for c, text in enumerate(row):
+                    x = 50 + 120 * c
+                    ops.append(f'{x} {y - 20} 120 20 re S')
+                    ops.append(f'BT /F1 9 Tf {x + 3} {y - 14} Td ({text}) Tj ET')
+            stream = '\n'.join(ops)
+            objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+            objects.append(
+                '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>'
+            )
+            kids.append(f'{len(objects)} 0 R')
+        objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'
+        out = b'%PDF-1.4\n'
+        offsets = []
+        for n, body in enumerate(objects, 1):
+            offsets.append(len(out))
+            out += f'{n} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+        xref = len(out)
+        out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+        out += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode()
+        out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+        return out
+
+    _PDF_MEDICATIONS = ['Tirzepatide', 'Semaglutide', 'Retatrutide', 'Cagrilintide', 'Tesamorelin']
+
+    def _price_list_pdf(self, page_count):
+        return self._pdf_bytes([
+            [['Medication', 'Strength', 'Price'], [medication, '10mg', '80.00']]
+            for medication in self._PDF_MEDICATIONS[:page_count]
+        ])
+
+    def test_multi_page_pdf_is_parsed_in_a_spawned_process_pool_in_page_order(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        from inventory.supplier_pricing import PDF_PARALLEL_MIN_PAGES, _extract_rows_from_pdf_tables
+
+        content = self._price_list_pdf(PDF_PARALLEL_MIN_PAGES)
+        with override_settings(PDF_PARSE_WORKERS=1, PDF_PAGE_TIME_BUDGET=30):
+            sequential = _extract_rows_from_pdf_tables(content)
+        with override_settings(PDF_PARSE_WORKERS=2, PDF_PAGE_TIME_BUDGET=30), \
+                mock.patch('inventory.supplier_pricing.ProcessPoolExecutor', wraps=ProcessPoolExecutor) as pool:
+            pooled = _extract_rows_from_pdf_tables(content)
+
+        pool.assert_called_once()
+        self.assertEqual(pool.call_args.kwargs['mp_context'].get_start_method(), 'spawn')
+        self.assertEqual([row['medication'] for row in pooled], self._PDF_MEDICATIONS[:PDF_PARALLEL_MIN_PAGES])
+        self.assertEqual(pooled, sequential)
+
+    def test_pool_workers_skip_strategies_once_the_page_time_budget_is_used(self):
+        from inventory.supplier_pricing import PDF_PARALLEL_MIN_PAGES, _extract_rows_from_pdf_tables
+
+        # A budget that is spent before the first strategy: every page, and its half-page
+        # crops, is skipped in the worker and the pooled parse still returns cleanly.
+        content = self._price_list_pdf(PDF_PARALLEL_MIN_PAGES)
+        with override_settings(PDF_PARSE_WORKERS=2, PDF_PAGE_TIME_BUDGET=1e-9):
+            rows = _extract_rows_from_pdf_tables(content)
+        self.assertEqual(rows, [])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class UploadParseCacheTests(SimpleTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+
+    def _upload(self, content):
+        file_obj = BytesIO(content.encode('utf-8'))
+        file_obj.name = 'prices.csv'
+        return file_obj
+
+    def test_repeat_upload_is_served_from_cache(self):
+        content = 'Medication,Price\nTirzepatide,80.00\n'
+        first, error = cached_parse(self._upload(content), parse_supplier_price_matrix_file, version=1)
+        self.assertIsNone(error)
+        second, _ = cached_parse(self._upload(content), parse_supplier_price_matrix_file, version=1)
+        self.assertEqual(second, first)
+        cached_parse(self._upload(content), parse_supplier_price_matrix_file, version=2)
+        cached_parse(self._upload(content + 'Botox,9.00\n'), parse_supplier_price_matrix_file, version=1)
+
+        stats = parse_cache_stats([parse_supplier_price_matrix_file])
+        self.assertEqual(list(stats.values()), [{'hits': 1, 'misses': 3}])
+
+    def test_failed_parses_are_not_cached_and_old_entries_are_evicted(self):
+        from inventory import parse_cache
+
+        bad = BytesIO(b'x')
+        bad.name = 'prices.txt'
+        for _ in range(2):
+            self.assertIsNotNone(cached_parse(bad, parse_supplier_price_matrix_file, version=1)[1])
+        self.assertEqual(
+            list(parse_cache_stats([parse_supplier_price_matrix_file]).values()), [{'hits': 0, 'misses': 2}],
+        )
+
+        with mock.patch.object(parse_cache, 'PARSE_CACHE_MAX_ENTRIES', 2):
+            for price in ('1.00', '2.00', '3.00', '1.00'):
+                cached_parse(self._upload(f'Medication,Price\nA,{price}\n'), parse_supplier_price_matrix_file, version=1)
+        self.assertEqual(
+            list(parse_cache_stats([parse_supplier_price_matrix_file]).values()), [{'hits': 0, 'misses': 6}],
+        )
+
+    def test_redis_index_is_a_sorted_set_trimmed_in_one_transaction(self):
+        from django.core.cache import cache
+
+        from inventory import parse_cache
+
+        redis = mock.Mock()
+        pipe = redis.pipeline.return_value
+        pipe.execute.return_value = [1, [b'parse_cache:old'], 1, True]
+        cache.set('parse_cache:old', 'stale')
+        with mock.patch.object(parse_cache, 'redis_connection', return_value=redis), \
+                mock.patch.object(parse_cache, 'PARSE_CACHE_MAX_ENTRIES', 2):
+            parse_cache._touch_index('parse_cache:new', added=True)
+
+        self.assertEqual(
+            [call[0] for call in pipe.method_calls],
+            ['zadd', 'zrange', 'zremrangebyrank', 'expire', 'execute'],
+        )
+        pipe.zremrangebyrank.assert_called_once_with('parse_cache:index', 0, -3)
+        self.assertIsNone(cache.get('parse_cache:old'))
+
 
 class PayableInvoiceImportParserTests(SimpleTestCase):
     def _xlsx_bytes(self, rows):
@@ -446,6 +629,24 @@ class PayableInvoiceImportParserTests(SimpleTestCase):
         self.assertIsNone(error)
         self.assertEqual(parsed['suppliers'][0]['invoices'][0]['lines'][0]['quantity'], 60)
 
+    def test_data_row_read_error_is_reported_and_closes_workbook(self):
+        rows = [
+            [
+                'Invoice Date', 'Source', 'Reference', 'Item Code', 'Description', 'Quantity',
+                'Original Currency', 'Unit Price (ex) (Source)', 'Gross (Source)',
+                'Unit Price (ex) (MYR)', 'Gross (MYR)', 'Invoice Total (MYR)',
+            ],
+            ['Test Supplier'],
+            ['22 Aug 2023', 'Payable Invoice', 'INV001', '', 'Product A', 1, 'USD', 10, 10, 10, 10, 10],
+        ]
+        file_obj = self._xlsx_bytes(rows)
+        with mock.patch('inventory.invoice_import._is_line_row', side_effect=ValueError('bad cell')), \
+                mock.patch('openpyxl.workbook.workbook.Workbook.close', autospec=True) as close:
+            parsed, error = parse_payable_invoice_detail_file(file_obj)
+        self.assertIsNone(parsed)
+        self.assertEqual(error, 'Could not read Excel file: bad cell')
+        close.assert_called_once()
+
     def test_rejects_non_xlsx(self):
         from io import BytesIO
         f = BytesIO(b'a,b\n1,2')
@@ -580,3 +781,279 @@ class InvoiceImportConfirmTests(TestCase):
         self.assertEqual(item.quantity, 5)
         self.assertEqual(item.original_currency, 'USD')
 
+    def test_import_matches_lines_in_memory_and_creates_new_names_once(self):
+        existing = Product.objects.create(name='Existing Product', sku='EX-1')
+        lines = [
+            {'item_code': 'ex-1', 'description': 'Renamed in file', 'quantity': 1, 'unit_price_myr': 5.0},
+            {'description': 'Fresh Product', 'quantity': 1, 'unit_price_myr': 6.0},
+            {'description': 'FRESH PRODUCT', 'quantity': 2, 'unit_price_myr': 6.0},
+        ]
+        payload = {
+            'suppliers': [{
+                'action': 'create',
+                'file_supplier_name': 'Memory Supplier',
+                'new_supplier_name': 'Memory Supplier',
+                'new_supplier_code': 'MEM',
+                'invoices': [{'reference': 'MEM001', 'invoice_date': '2023-08-22', 'lines': lines}],
+            }],
+        }
+        stats = confirm_payable_invoice_import(
+            payload,
+            product_model=Product,
+            supplier_model=Supplier,
+            invoice_model=Invoice,
+            invoice_item_model=InvoiceItem,
+        )
+        fresh = Product.objects.get(name='Fresh Product')
+        self.assertEqual((stats['products_created'], stats['products_matched']), (1, 2))
+        self.assertEqual(
+            list(InvoiceItem.objects.order_by('pk').values_list('product_id', flat=True)),
+            [existing.pk, fresh.pk, fresh.pk],
+        )
+        self.assertEqual(
+            set(Supplier.objects.get(name='Memory Supplier').products.values_list('pk', flat=True)),
+            {existing.pk, fresh.pk},
+        )
+
+    def test_repeated_reference_processes_every_occurrence(self):
+        def block(name, code, lines):
+            return {
+                'action': 'create',
+                'file_supplier_name': name,
+                'new_supplier_name': name,
+                'new_supplier_code': code,
+                'invoices': [{'reference': 'DUP001', 'invoice_date': '2023-08-22', 'lines': lines}],
+            }
+
+        payload = {'suppliers': [
+            block('First Supplier', 'FST', [{'description': 'Early Line', 'quantity': 1, 'unit_price_myr': 4.0}]),
+            block('Second Supplier', 'SND', [{'description': 'Late Line', 'quantity': 2, 'unit_price_myr': 8.0}]),
+        ]}
+        stats = confirm_payable_invoice_import(
+            payload,
+            product_model=Product,
+            supplier_model=Supplier,
+            invoice_model=Invoice,
+            invoice_item_model=InvoiceItem,
+        )
+        self.assertEqual(
+            (stats['invoices_created'], stats['invoices_updated'], stats['products_created'], stats['matrix_rows_updated']),
+            (1, 1, 2, 2),
+        )
+        invoice = Invoice.objects.get(invoice_id='DUP001')
+        self.assertEqual(invoice.supplier.name, 'Second Supplier')
+        self.assertEqual(list(invoice.items.values_list('description', flat=True)), ['Late Line'])
+        early = Product.objects.get(name='Early Line')
+        self.assertTrue(Supplier.objects.get(name='First Supplier').products.filter(pk=early.pk).exists())
+        self.assertTrue(SupplierPriceMatrixEntry.objects.filter(line_medication='Early Line').exists())
+
+    def test_reimport_updates_invoices_in_bulk_and_reports_phase_timings(self):
+        def payload(price, source_filename):
+            return {
+                'source_filename': source_filename,
+                'suppliers': [{
+                    'action': 'create',
+                    'file_supplier_name': 'Bulk Supplier',
+                    'new_supplier_name': 'Bulk Supplier',
+                    'new_supplier_code': 'BLK',
+                    'invoices': [
+                        {'reference': 'BLK001', 'invoice_date': '2023-08-22', 'lines': [
+                            {'description': 'Bulk Line A', 'quantity': 1, 'unit_price_myr': price},
+                            {'description': 'Bulk Line B', 'quantity': 2, 'unit_price_myr': price},
+                        ]},
+                        {'reference': 'BLK002', 'invoice_date': '2023-08-23', 'lines': [
+                            {'description': 'Bulk Line A', 'quantity': 3, 'unit_price_myr': price},
+                        ]},
+                    ],
+                }],
+            }
+
+        kwargs = dict(product_model=Product, supplier_model=Supplier, invoice_model=Invoice, invoice_item_model=InvoiceItem)
+        first = confirm_payable_invoice_import(payload(5.0, 'detail.xlsx'), **kwargs)
+        self.assertEqual((first['invoices_created'], first['invoices_updated']), (2, 0))
+        self.assertEqual(
+            set(first['timings']), {'suppliers', 'invoices', 'products', 'items', 'matrix'},
+        )
+
+        second = confirm_payable_invoice_import(payload(7.0, 'detail-v2.xlsx'), **kwargs)
+        self.assertEqual((second['invoices_created'], second['invoices_updated']), (0, 2))
+        self.assertEqual(second['matrix_rows_updated'], 3)
+        self.assertEqual(InvoiceItem.objects.filter(invoice__invoice_id='BLK001').count(), 2)
+        self.assertEqual(set(InvoiceItem.objects.values_list('unit_price', flat=True)), {Decimal('7.00')})
+        invoice = Invoice.objects.get(invoice_id='BLK001')
+        self.assertEqual(invoice.status, Invoice.InvoiceStatus.PAID)
+        self.assertIsNotNone(invoice.payment_date)
+
+        entry = SupplierPriceMatrixEntry.objects.get(line_medication='Bulk Line A')
+        self.assertEqual(entry.effective_date.isoformat(), '2023-08-23')
+        self.assertEqual(list(entry.tiers.values_list('unit_price', flat=True)), [Decimal('7.00')])
+
+
+class BulkSupplierCostTests(TestCase):
+    def setUp(self):
+        self.matrix_supplier = Supplier.objects.create(name='Matrix Co')
+        self.invoice_supplier = Supplier.objects.create(name='Invoice Co')
+        self.quote_supplier = Supplier.objects.create(name='Quote Co')
+        self.products = [Product.objects.create(name=f'Bulk Product {i}') for i in range(3)]
+        for product in self.products:
+            entry = SupplierPriceMatrixEntry.objects.create(
+                supplier=self.matrix_supplier, product=product, line_medication=product.name,
+            )
+            SupplierPriceMatrixTier.objects.create(entry=entry, min_quantity=10, unit_price=Decimal('8.00'))
+            SupplierPriceMatrixTier.objects.create(entry=entry, min_quantity=1, unit_price=Decimal('9.00'))
+
+            invoice = Invoice.objects.create(
+                supplier=self.invoice_supplier, transportation_cost=Decimal('10.00'),
+            )
+            InvoiceItem.objects.create(invoice=invoice, product=product, quantity=2, unit_price=Decimal('20.00'))
+            InvoiceItem.objects.create(invoice=invoice, product=product, quantity=1, unit_price=Decimal('60.00'))
+
+            quotation = Quotation.objects.create(
+                supplier=self.quote_supplier, date_quoted='2024-01-01', transportation_cost=Decimal('5.00'),
+            )
+            QuotationItem.objects.create(quotation=quotation, product=product, quantity=4, quoted_price=Decimal('3.00'))
+            # Same supplier as the matrix: the matrix price must win.
+            old_quote = Quotation.objects.create(supplier=self.matrix_supplier, date_quoted='2023-01-01')
+            QuotationItem.objects.create(quotation=old_quote, product=product, quantity=1, quoted_price=Decimal('1.00'))
+
+    def test_snapshot_matches_live_costs(self):
+        ids = [product.pk for product in self.products]
+        live = compute_supplier_costs_for_products(ids)
+        snapshot = get_supplier_costs_for_products(ids)
+        self.assertEqual(snapshot, live)
+        self.assertEqual(get_product_supplier_costs(self.products[0]), live[self.products[0].pk])
+        self.assertEqual(
+            [(row['source'], row['cost']) for row in snapshot[self.products[0].pk]],
+            [('invoice', Decimal('66.00')), ('matrix', Decimal('9.00')), ('quotation', Decimal('4.25'))],
+        )
+
+    def test_query_count_is_independent_of_product_count(self):
+        ids = [product.pk for product in self.products]
+        with self.assertNumQueries(3):
+            compute_supplier_costs_for_products(ids)
+        with self.assertNumQueries(1):
+            get_supplier_costs_for_products(ids)
+
+    def test_window_landed_cost_matches_python_properties(self):
+        quotation = QuotationItem.objects.filter(product=self.products[0], quantity=4).get().quotation
+        QuotationItem.objects.create(quotation=quotation, product=self.products[1], quantity=3, quoted_price=Decimal('7.00'))
+        QuotationItem.objects.create(quotation=quotation, product=self.products[2], quantity=0, quoted_price=Decimal('2.00'))
+        annotated = {item.pk: item for item in QuotationItem.objects.filter(quotation=quotation).with_landed_cost()}
+        for item in QuotationItem.objects.filter(quotation=quotation):
+            self.assertAlmostEqual(annotated[item.pk].landed_cost_per_unit, item.landed_cost_per_unit, places=10)
+            self.assertAlmostEqual(annotated[item.pk].transport_cost_per_unit, item.transport_cost_per_unit, places=10)
+
+        # Filtering by product before whole_invoices() still sums every line of the invoice.
+        line = InvoiceItem.objects.filter(product=self.products[0], unit_price=Decimal('60.00')).get()
+        annotated = {
+            item.pk: item for item in InvoiceItem.objects.filter(pk=line.pk).whole_invoices().with_landed_cost()
+        }[line.pk]
+        self.assertEqual(invoice_item_landed_cost_per_unit(annotated), Decimal('66.00'))
+        self.assertEqual(annotated.invoice_total, Decimal('100.00'))
+
+    def test_base_cost_snapshot_follows_source_changes(self):
+        product = Product.objects.get(pk=self.products[0].pk)
+        self.assertEqual(product.base_cost, Decimal('9.00'))
+        SupplierPriceMatrixEntry.objects.filter(product=product).delete()
+        product = Product.objects.get(pk=product.pk)
+        self.assertEqual(product.base_cost, Decimal('66.00'))
+        invoice = InvoiceItem.objects.filter(product=product).first().invoice
+        invoice.transportation_cost = Decimal('0.00')
+        invoice.save()
+        product = Product.objects.get(pk=product.pk)
+        self.assertEqual(product.base_cost, Decimal('60.00'))
+
+
+    def test_base_cost_rounds_invoice_cost_and_skips_price_only_quotes(self):
+        invoiced = Product.objects.create(name='Rounded Product')
+        invoice = Invoice.objects.create(supplier=self.invoice_supplier, transportation_cost=Decimal('10.00'))
+        InvoiceItem.objects.create(invoice=invoice, product=invoiced, quantity=3, unit_price=Decimal('10.00'))
+        quoted = Product.objects.create(name='Price Only Product')
+        quotation = Quotation.objects.create(supplier=self.quote_supplier, date_quoted='2024-02-01')
+        QuotationItem.objects.create(quotation=quotation, product=quoted, quantity=0, quoted_price=Decimal('5.00'))
+
+        base_costs = compute_base_costs_for_products([invoiced.pk, quoted.pk])
+        self.assertEqual(base_costs[invoiced.pk]['cost'], Decimal('13.33'))
+        self.assertNotIn(quoted.pk, base_costs)
+
+@override_settings(JOB_BACKEND='sync')
+class SupplierPriceMatrixConfirmTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='matrixstaff', password='testpass123', is_staff=True)
+        self.client.force_login(user)
+        self.supplier = Supplier.objects.create(name='Matrix Upload Co')
+        self.old_product = Product.objects.create(name='Old Mapping')
+        self.product = Product.objects.create(name='New Mapping')
+        entry = SupplierPriceMatrixEntry.objects.create(
+            supplier=self.supplier, product=self.old_product, line_medication='Botox', strength='100u',
+        )
+        SupplierPriceMatrixTier.objects.create(entry=entry, min_quantity=1, unit_price=Decimal('9.00'))
+        SupplierPriceMatrixTier.objects.create(entry=entry, min_quantity=50, unit_price=Decimal('8.00'))
+
+    def _confirm(self, rows):
+        return self.client.post(
+            reverse('inventory:upload_supplier_price_matrix_confirm'),
+            data=json.dumps({'supplier_id': self.supplier.pk, 'source_filename': 'list.xlsx', 'rows': rows}),
+            content_type='application/json',
+        )
+
+    def test_upserts_entries_tiers_records_and_supplier_links_in_bulk(self):
+        response = self._confirm([
+            {'medication': 'Botox', 'strength': '100u', 'product_id': self.product.pk, 'tiers': [
+                {'min_quantity': 1, 'max_quantity': 9, 'unit_price': '7.50'},
+                {'min_quantity': 10, 'unit_price': '7.00'},
+            ]},
+            {'medication': 'Sculptra', 'new_product_name': 'Sculptra Vial', 'tiers': [{'unit_price': '100'}]},
+        ])
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.json()['job']['status'], 'succeeded', response.content)
+
+        entry = SupplierPriceMatrixEntry.objects.get(supplier=self.supplier, line_medication='Botox')
+        self.assertEqual(entry.product, self.product)
+        self.assertEqual(
+            list(entry.tiers.values_list('min_quantity', 'max_quantity', 'unit_price')),
+            [(1, 9, Decimal('7.50')), (10, None, Decimal('7.00'))],
+        )
+        self.assertEqual(
+            entry.upload_records.get().tiers,
+            [
+                {'min_quantity': 1, 'max_quantity': 9, 'unit_price': '7.50'},
+                {'min_quantity': 10, 'max_quantity': None, 'unit_price': '7.00'},
+            ],
+        )
+        sculptra = SupplierPriceMatrixEntry.objects.get(supplier=self.supplier, line_medication='Sculptra')
+        self.assertEqual(sculptra.product.name, 'Sculptra Vial')
+        self.assertEqual(
+            set(self.supplier.products.values_list('pk', flat=True)), {self.product.pk, sculptra.product_id},
+        )
+        self.assertEqual(SupplierPriceMatrixEntry.objects.filter(supplier=self.supplier).count(), 2)
+
+    def test_confirm_uses_rows_staged_by_the_preview(self):
+        upload = BytesIO(b'Medication,Strength,Price\nBotox,100u,6.00\nProfhilo,,90.00\n')
+        upload.name = 'staged.csv'
+        preview = self.client.post(reverse('inventory:upload_supplier_price_matrix_preview'), {'file': upload}).json()
+        self.assertTrue(preview['ok'], preview)
+        overrides = [
+            {'row_index': row['row_index'], 'new_product_name': f"{row['medication']} Staged", 'tiers': []}
+            for row in preview['rows']
+        ]
+        overrides[0] = {'row_index': preview['rows'][0]['row_index'], 'product_id': self.product.pk}
+
+        def confirm():
+            return self.client.post(
+                reverse('inventory:upload_supplier_price_matrix_confirm'),
+                data=json.dumps({'supplier_id': self.supplier.pk, 'session_id': preview['session_id'], 'overrides': overrides}),
+                content_type='application/json',
+            )
+
+        response = confirm()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['job']['status'], 'succeeded', response.content)
+        botox = SupplierPriceMatrixEntry.objects.get(supplier=self.supplier, line_medication='Botox')
+        self.assertEqual((botox.product, botox.source_filename), (self.product, 'staged.csv'))
+        # Staged tiers win over anything the client sends outside the override fields.
+        self.assertEqual(list(botox.tiers.values_list('unit_price', flat=True)), [Decimal('6.00')])
+        profhilo = SupplierPriceMatrixEntry.objects.get(supplier=self.supplier, line_medication='Profhilo')
+        self.assertEqual(profhilo.product.name, 'Profhilo Staged')
+        # The session is consumed by a successful confirm.
+        self.assertEqual(confirm().status_code, 400)
@@ -22,36 +22,39 @@ import logging
 from decimal import Decimal, InvalidOperation
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 import json
-import re
 
 from .forms import (
     InventoryBatchForm, QuotationUploadForm, InvoiceUploadForm,
     QuotationCreateForm, InventoryBatchUploadForm
 )
+from .import_staging import IMPORT_SESSION_EXPIRED, ImportSessionExpired, get_import_session, stage_import
 from .invoice_import import (
+    PAYABLE_INVOICE_PARSER_VERSION,
     parse_payable_invoice_detail_file,
     suggest_supplier_match,
     suggest_supplier_code,
-    confirm_payable_invoice_import,
-    _normalize_import_action,
 )
 from .resources import QuotationResource, InventoryBatchResource
 from product.models import Product, Category, CategoryGroup
+from product.cost_snapshot import base_cost_snapshot_prefetch
+from product.matching import resolve_products
 from product.pricing_sync import sync_saved_base_costs_for_quotation
 from .models import (
-    Quotation, InventoryBatch, QuotationItem, Supplier,
-    SupplierPriceMatrixEntry, SupplierPriceMatrixTier,
-    SupplierPriceMatrixUploadRecord,
+    ImportSession, Quotation, InventoryBatch, QuotationItem, Supplier,
+    SupplierPriceMatrixEntry,
 )
+from .parse_cache import cached_parse
 from .supplier_pricing import (
+    PRICE_MATRIX_PARSER_VERSION,
     parse_supplier_price_matrix_file,
-    sync_saved_base_costs_for_products,
     list_quotation_matrix_rows,
     serialize_quotation_matrix_item,
     default_matrix_unit_price,
     invoice_item_landed_cost_per_unit,
     _matrix_search_tokens as matrix_search_tokens,
+    _normalize_matrix_tiers_for_json,
 )
+from core.jobs import enqueue, job_accepted_response
 from sales.models import Invoice, InvoiceItem
 from blog.models import Post
 from images.models import MediaImage, ImageCategory
@@ -137,12 +140,7 @@ def api_manage_inventory(request):
         # --- END REMOVAL ---
     ).select_related('featured_image').prefetch_related(
         Prefetch('categories', queryset=Category.objects.select_related('group')),
-        Prefetch(
-            'quotationitem_set',
-            queryset=QuotationItem.objects.select_related('quotation')
-                                          .order_by('-quotation__date_quoted'),
-            to_attr='latest_quotation_items'
-        )
+        base_cost_snapshot_prefetch(),
     ).order_by('name')
 
     # --- 4. Apply Filters ---
@@ -1305,105 +1303,6 @@ def _resolve_category(category_str):
     return None, raw
 
 
-def _normalize_product_name_for_match(value):
-    """
-    Prepare a product name for fuzzy matching:
-    - Use only the part before '|' (English name)
-    - Normalise common unit patterns like '100u', '100U', '100 Unit', '100Units'
-      so they all compare the same.
-    - Strip special characters
-    - Lowercase and collapse whitespace
-    """
-    if not value:
-        return "", []
-
-    base = str(value).split("|", 1)[0]
-
-    # Normalise common unit notations so that e.g.
-    # "Wondertox 100u" and "WONDERTOX 100Unit" are treated as the same tokens.
-    # Examples handled:
-    #   100u, 100U, 100 u, 100 U, 100unit, 100 units, 100 Units  ->  "100unit"
-    base = re.sub(
-        r"(\d+)\s*(u|unit|units)\b",
-        r"\1unit",
-        base,
-        flags=re.IGNORECASE,
-    )
-
-    cleaned = re.sub(r"[^a-zA-Z0-9\s]", " ", base).lower()
-    tokens = [t for t in cleaned.split() if t]
-    return " ".join(tokens), tokens
-
-
-def _name_similarity(tokens_a, tokens_b):
-    """
-    Very simple token overlap similarity between two token lists.
-    Returns a float between 0 and 1.
-    """
-    if not tokens_a or not tokens_b:
-        return 0.0
-    set_a = set(tokens_a)
-    set_b = set(tokens_b)
-    overlap = len(set_a & set_b)
-    return (2.0 * overlap) / (len(set_a) + len(set_b))
-
-
-def _resolve_product_by_sku_or_name(sku, name, *, allow_fuzzy=True):
-    """
-    Resolve product by SKU (exact) or by name using a fuzzy, token-based match.
-    Returns (product, match_type) or (None, 'new').
-    """
-    # 1) Strong signal: exact SKU match
-    if sku:
-        try:
-            p = Product.objects.get(sku__iexact=sku)
-            return p, "matched_sku"
-        except Product.DoesNotExist:
-            pass
-
-    if not name:
-        return None, "new"
-
-    # 2) Exact name match (case-insensitive)
-    exact = Product.objects.filter(name__iexact=name).first()
-    if exact:
-        return exact, "matched_name_exact"
-
-    if not allow_fuzzy:
-        return None, "new"
-
-    # 3) Fuzzy name match: token overlap on a small candidate set
-    normalized, tokens = _normalize_product_name_for_match(name)
-    if not tokens:
-        return None, "new"
-
-    # Use the first significant token to narrow the queryset
-    first_token = tokens[0]
-    candidates_qs = Product.objects.filter(
-        Q(name__icontains=first_token) | Q(sku__icontains=first_token)
-    ).only("id", "name", "sku")[:30]
-
-    best_product = None
-    best_score = 0.0
-    for candidate in candidates_qs:
-        cand_norm, cand_tokens = _normalize_product_name_for_match(candidate.name)
-        score = _name_similarity(tokens, cand_tokens)
-        # Light boost if the candidate SKU contains any of the tokens
-        if candidate.sku:
-            sku_lower = candidate.sku.lower()
-            if any(t in sku_lower for t in tokens):
-                score += 0.15
-        if score > best_score:
-            best_score = score
-            best_product = candidate
-
-    # Require a minimum similarity so obviously different products don't get auto-mapped
-    if best_product and best_score >= 0.55:
-        return best_product, "matched_name_fuzzy"
-
-    return None, "new"
-
-
 @staff_required
 def import_quotation_items_preview(request, quotation_id):
     """
@@ -1421,7 +1320,9 @@ def import_quotation_items_preview(request, quotation_id):
         return JsonResponse({'ok': False, 'error': parse_error}, status=400)
     preview_rows = []
     errors = []
-    for r in rows:
+    # Resolve every row's product in one batch instead of one lookup per row.
+    matches = resolve_products([(r.get('product_sku'), r.get('product_name')) for r in rows])
+    for r, (product, match_type) in zip(rows, matches):
         qty_str = r.get('quantity') or ''
         price_str = r.get('quoted_price') or ''
         try:
@@ -1440,7 +1341,6 @@ def import_quotation_items_preview(request, quotation_id):
         if price < 0:
             errors.append(f"Row {r['row_index']}: Quoted price cannot be negative.")
             continue
-        product, match_type = _resolve_product_by_sku_or_name(r.get('product_sku'), r.get('product_name'))
         name_for_new = (r.get('product_name') or '').strip() or (r.get('product_sku') or '').strip() or f"Imported item {r['row_index']}"
         imported_category = (r.get('category') or '').strip()
         category_obj, category_display = _resolve_category(imported_category) if imported_category else (None, '')
@@ -1759,7 +1659,9 @@ def upload_invoice_preview(request):
         return JsonResponse({'ok': False, 'error': 'No file provided'}, status=400)
 
     try:
-        parsed, parse_error = parse_payable_invoice_detail_file(file)
+        parsed, parse_error = cached_parse(
+            file, parse_payable_invoice_detail_file, version=PAYABLE_INVOICE_PARSER_VERSION,
+        )
         if parse_error:
             return JsonResponse({'ok': False, 'error': parse_error}, status=400)
 
@@ -1778,10 +1680,18 @@ def upload_invoice_preview(request):
                 invoice_refs=invoice_refs,
             )
 
+        # Invoice lines stay on the server; the browser only needs the groups and counts.
+        session = stage_import(
+            ImportSession.Kind.PAYABLE_INVOICES, request.user, parsed['suppliers'], source_filename=file.name,
+        )
+        parsed['suppliers'] = [
+            {key: value for key, value in sup.items() if key != 'invoices'} for sup in parsed['suppliers']
+        ]
         return JsonResponse({
             'ok': True,
             'parsed': parsed,
             'source_filename': file.name,
+            'session_id': str(session.pk),
         }, encoder=DjangoJSONEncoder)
     except Exception as exc:
         logger.exception('upload_invoice_preview failed')
@@ -1790,7 +1700,13 @@ def upload_invoice_preview(request):
 
 @staff_required
 def upload_invoice_confirm(request):
-    """POST JSON: supplier mappings + parsed invoice data → import."""
+    """
+    POST JSON: session_id from the preview + per-supplier mappings
+    ({key, action, supplier_id, new_supplier_name, new_supplier_code}) → import.
+    Legacy bodies carrying the full parsed suppliers (with invoices) are still accepted.
+    The import runs as a background job (inventory.tasks.payable_invoice_import);
+    responds 202 with the job to poll.
+    """
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
     try:
@@ -1798,55 +1714,20 @@ def upload_invoice_confirm(request):
     except Exception:
         return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
 
-    suppliers = data.get('suppliers')
-    if not suppliers:
+    if data.get('session_id'):
+        try:
+            get_import_session(data['session_id'], ImportSession.Kind.PAYABLE_INVOICES, request.user)
+        except ImportSessionExpired:
+            return JsonResponse({'success': False, 'error': IMPORT_SESSION_EXPIRED}, status=400)
+    elif not data.get('suppliers'):
         return JsonResponse({'success': False, 'error': 'No supplier data to import.'}, status=400)
 
-    active = [s for s in suppliers if _normalize_import_action(s.get('action')) != 'ignore']
-    if not active:
-        return JsonResponse({'success': False, 'error': 'All suppliers are ignored. Nothing to import.'}, status=400)
-
-    try:
-        with transaction.atomic():
-            stats = confirm_payable_invoice_import(
-                {
-                    'source_filename': data.get('source_filename') or '',
-                    'suppliers': suppliers,
-                },
-                product_model=Product,
-                supplier_model=Supplier,
-                invoice_model=Invoice,
-                invoice_item_model=InvoiceItem,
-            )
-    except ValueError as exc:
-        logger.warning('upload_invoice_confirm validation failed: %s', exc)
-        return JsonResponse({'success': False, 'error': str(exc)}, status=400)
-    except IntegrityError as exc:
-        logger.warning('upload_invoice_confirm integrity error: %s', exc)
-        return JsonResponse(
-            {'success': False, 'error': 'Database conflict during import. Check for duplicate invoice IDs or supplier codes.'},
-            status=400,
-        )
-    except Exception as exc:
-        logger.exception('upload_invoice_confirm failed')
-        return JsonResponse({'success': False, 'error': str(exc)}, status=500)
-
-    parts = []
-    if stats['invoices_created']:
-        parts.append(f"{stats['invoices_created']} invoice(s) created")
-    if stats['invoices_updated']:
-        parts.append(f"{stats['invoices_updated']} invoice(s) updated")
-    if stats['invoices_skipped']:
-        parts.append(f"{stats['invoices_skipped']} skipped (linked to PO)")
-    if stats['products_created']:
-        parts.append(f"{stats['products_created']} product(s) created")
-    if stats['products_matched']:
-        parts.append(f"{stats['products_matched']} existing product(s) used")
-    if stats.get('matrix_rows_updated'):
-        parts.append(f"{stats['matrix_rows_updated']} supplier price row(s) updated")
-    message = 'Import complete: ' + ', '.join(parts) if parts else 'Import complete.'
-
-    return JsonResponse({'success': True, 'message': message, 'stats': stats})
+    job = enqueue('inventory.payable_invoice_import', user=request.user, payload={
+        'session_id': data.get('session_id'),
+        'suppliers': data.get('suppliers'),
+        'source_filename': data.get('source_filename') or '',
+    })
+    return job_accepted_response(job)
 
 
 @staff_required
@@ -1890,7 +1771,9 @@ def export_quotations_xlsx(request):
     ]
     ws.append(headers)
 
-    quotations = Quotation.objects.select_related('supplier').prefetch_related('items__product')
+    quotations = Quotation.objects.select_related('supplier').prefetch_related(
+        Prefetch('items', queryset=QuotationItem.objects.with_landed_cost().select_related('product'))
+    )
     for quotation in quotations:
         if quotation.items.exists():
             for item in quotation.items.all():
@@ -2108,7 +1991,6 @@ def _matrix_rows_for_export_from_dicts(combined_rows: list[dict]) -> list[dict]:
         items = (
             QuotationItem.objects.filter(pk__in=quotation_ids)
             .select_related('product', 'quotation', 'quotation__supplier')
-            .prefetch_related('quotation__items')
         )
         item_map = {item.pk: item for item in items}
 
@@ -2138,10 +2020,10 @@ def _matrix_export_rows_by_keys(matrix_ids: list[int], quotation_ids: list[int])
                 export_rows.append(_serialize_matrix_entry(entry))
 
     if quotation_ids:
+        # Whole quotations so the landed-cost window sees every sibling line.
         items = (
-            QuotationItem.objects.filter(pk__in=quotation_ids)
+            QuotationItem.objects.filter(pk__in=quotation_ids).whole_quotations().with_landed_cost()
             .select_related('product', 'quotation', 'quotation__supplier')
-            .prefetch_related('quotation__items')
         )
         item_map = {item.pk: item for item in items}
         for item_id in quotation_ids:
@@ -2298,48 +2180,21 @@ def api_get_product_batches(request, product_id):
             .order_by('-received_date')
         )
 
-        # Batch-fetch quotation totals for landed cost (legacy PO path)
+        # Landed costs come from one windowed query per source; the window needs every
+        # line of the quotation / invoice, so load whole documents and keep ours.
         quotation_ids = {b.quotation_id for b in batches if b.quotation_id}
-        from django.db.models import DecimalField, ExpressionWrapper, F as Ff, Sum
-        quotation_totals = {}
-        if quotation_ids:
-            for row in (
-                QuotationItem.objects.filter(quotation_id__in=quotation_ids)
-                .values('quotation_id')
-                .annotate(total=Sum(ExpressionWrapper(Ff('quantity') * Ff('quoted_price'), output_field=DecimalField(max_digits=20, decimal_places=4))))
-            ):
-                if row['total'] is not None:
-                    quotation_totals[row['quotation_id']] = Decimal(str(row['total']))
-
         relevant_quotation_items = {
             item.quotation_id: item
-            for item in QuotationItem.objects.filter(
-                product_id=product_id, quotation_id__in=quotation_ids
-            ).select_related('quotation')
-        }
+            for item in QuotationItem.objects.filter(quotation_id__in=quotation_ids).with_landed_cost()
+            if item.product_id == int(product_id)
+        } if quotation_ids else {}
 
-        # Batch-fetch invoice subtotals for landed cost (direct invoice receive path)
-        invoice_ids = {
-            b.invoice_item.invoice_id
-            for b in batches
-            if b.invoice_item_id and b.invoice_item
-        }
-        invoice_subtotals = {}
-        if invoice_ids:
-            for row in (
-                InvoiceItem.objects.filter(invoice_id__in=invoice_ids)
-                .values('invoice_id')
-                .annotate(
-                    total=Sum(
-                        ExpressionWrapper(
-                            Ff('quantity') * Ff('unit_price'),
-                            output_field=DecimalField(max_digits=20, decimal_places=4),
-                        )
-                    )
-                )
-            ):
-                if row['total'] is not None:
-                    invoice_subtotals[row['invoice_id']] = Decimal(str(row['total']))
+        invoice_item_ids = {b.invoice_item_id for b in batches if b.invoice_item_id}
+        landed_invoice_items = {
+            item.pk: item
+            for item in InvoiceItem.objects.filter(pk__in=invoice_item_ids).whole_invoices().with_landed_cost()
+            if item.pk in invoice_item_ids
+        } if invoice_item_ids else {}
 
         serialized_batches = []
         for batch in batches:
@@ -2348,22 +2203,11 @@ def api_get_product_batches(request, product_id):
             # Prefer invoice line cost when batch came from Receive Stock
             inv_item = batch.invoice_item
             if inv_item and inv_item.quantity and inv_item.unit_price is not None:
-                batch_landed_cost = invoice_item_landed_cost_per_unit(
-                    inv_item,
-                    invoice_subtotals.get(inv_item.invoice_id),
-                )
+                batch_landed_cost = invoice_item_landed_cost_per_unit(landed_invoice_items.get(inv_item.pk, inv_item))
             elif batch.quotation_id:
                 qi = relevant_quotation_items.get(batch.quotation_id)
                 if qi and qi.quantity and qi.quoted_price:
-                    qty = Decimal(str(qi.quantity))
-                    price = qi.quoted_price
-                    transport = qi.quotation.transportation_cost or Decimal('0')
-                    qtotal = quotation_totals.get(batch.quotation_id, Decimal('0'))
-                    if qtotal > 0 and transport > 0:
-                        item_total = qty * price
-                        batch_landed_cost = (item_total + transport * (item_total / qtotal)) / qty
-                    else:
-                        batch_landed_cost = price
+                    batch_landed_cost = qi.landed_cost_per_unit
 
             # Resolve invoice number: prefer the linked invoice item's invoice, else quotation id
             invoice_number = None
@@ -2606,27 +2450,6 @@ def _matrix_tier_key(min_qty, max_qty):
     return (int(min_qty), int(max_qty) if max_qty is not None else None)
 
 
-def _normalize_matrix_tiers_for_json(tiers) -> list[dict]:
-    """Serialize tier rows (model instances or dicts) for JSON storage/comparison."""
-    normalized = []
-    for tier in tiers:
-        if hasattr(tier, 'min_quantity'):
-            min_qty = tier.min_quantity
-            max_qty = tier.max_quantity
-            unit_price = tier.unit_price
-        else:
-            min_qty = tier.get('min_quantity', 1)
-            max_qty = tier.get('max_quantity')
-            unit_price = tier.get('unit_price')
-        normalized.append({
-            'min_quantity': int(min_qty),
-            'max_quantity': int(max_qty) if max_qty not in (None, '') else None,
-            'unit_price': str(Decimal(str(unit_price)).quantize(Decimal('0.01'))),
-        })
-    normalized.sort(key=lambda t: t['min_quantity'])
-    return normalized
-
-
 def _format_matrix_tier_label(min_qty, max_qty) -> str:
     upper = str(max_qty) if max_qty is not None else '+'
     return f"{min_qty}–{upper}"
@@ -2815,8 +2638,7 @@ def api_quotation_matrix_row_detail(request, item_id):
         return JsonResponse({'error': 'Invalid request'}, status=400)
 
     item = get_object_or_404(
-        QuotationItem.objects.select_related('product', 'quotation', 'quotation__supplier')
-        .prefetch_related('quotation__items'),
+        QuotationItem.objects.select_related('product', 'quotation', 'quotation__supplier'),
         pk=item_id,
     )
     product = item.product
@@ -2825,12 +2647,15 @@ def api_quotation_matrix_row_detail(request, item_id):
     if SupplierPriceMatrixEntry.objects.filter(supplier=supplier, product=product).exists():
         return JsonResponse({'error': 'This product uses the price matrix for this supplier.'}, status=404)
 
-    history_items = list(
-        QuotationItem.objects.filter(product=product, quotation__supplier=supplier)
-        .select_related('quotation')
-        .prefetch_related('quotation__items')
-        .order_by('-quotation__date_quoted', '-pk')
-    )
+    history_items = [
+        qi for qi in (
+            QuotationItem.objects.filter(product=product, quotation__supplier=supplier)
+            .whole_quotations().with_landed_cost()
+            .select_related('quotation')
+            .order_by('-quotation__date_quoted', '-pk')
+        )
+        if qi.product_id == product.pk
+    ]
 
     history = []
     for i, qi in enumerate(history_items):
@@ -2915,26 +2740,18 @@ def upload_supplier_price_matrix_preview(request):
         return JsonResponse({'ok': False, 'error': 'No file provided'}, status=400)
 
     try:
-        rows, parse_error = parse_supplier_price_matrix_file(file)
+        rows, parse_error = cached_parse(file, parse_supplier_price_matrix_file, version=PRICE_MATRIX_PARSER_VERSION)
         if parse_error is not None:
             return JsonResponse({'ok': False, 'error': parse_error}, status=400)
         if not rows:
             return JsonResponse({'ok': False, 'error': 'No price rows found in file.'}, status=400)
 
         is_pdf = (file.name or '').lower().endswith('.pdf')
-        match_cache: dict[tuple[str, str], tuple] = {}
+        match_names = [r.get('match_name') or r.get('medication') or '' for r in rows]
+        skus = [(r.get('sku') or '').strip() for r in rows]
+        matches = resolve_products(zip(skus, match_names), allow_fuzzy=not is_pdf)
         preview_rows = []
-        for r in rows:
-            match_name = r.get('match_name') or r.get('medication') or ''
-            sku = (r.get('sku') or '').strip()
-            cache_key = (sku.lower(), match_name.strip().lower())
-            if cache_key not in match_cache:
-                match_cache[cache_key] = _resolve_product_by_sku_or_name(
-                    sku or None,
-                    match_name,
-                    allow_fuzzy=not is_pdf,
-                )
-            product, match_type = match_cache[cache_key]
+        for r, match_name, sku, (product, match_type) in zip(rows, match_names, skus, matches):
             preview_rows.append({
                 **r,
                 'product_id': product.id if product else None,
@@ -2945,10 +2762,12 @@ def upload_supplier_price_matrix_preview(request):
                 'new_product_sku': sku or None if match_type == 'new' else None,
             })
 
+        session = stage_import(ImportSession.Kind.PRICE_MATRIX, request.user, rows, source_filename=file.name)
         return JsonResponse({
             'ok': True,
             'rows': preview_rows,
             'source_filename': file.name,
+            'session_id': str(session.pk),
         }, encoder=DjangoJSONEncoder)
     except Exception as exc:
         logger.exception('upload_supplier_price_matrix_preview failed')
@@ -3075,31 +2894,15 @@ def _matrix_myr_to_original(myr_price, currency: str, conversion_rate) -> Decima
         return None
 
 
-def _matrix_conversion_rate(currency: str, rate_usd, rate_eur):
-    cur = (currency or 'MYR').upper()
-    if cur == 'USD':
-        return rate_usd
-    if cur == 'EUR':
-        return rate_eur
-    return None
-
-
-def _matrix_price_to_myr(amount, currency: str, rate_usd, rate_eur) -> Decimal:
-    cur = (currency or 'MYR').upper()
-    if cur == 'MYR':
-        return amount
-    if cur == 'USD':
-        return (amount * rate_usd).quantize(Decimal('0.01'))
-    if cur == 'EUR':
-        return (amount * rate_eur).quantize(Decimal('0.01'))
-    return amount
-
-
 @staff_required
 def upload_supplier_price_matrix_confirm(request):
     """
-    POST JSON: supplier_id, currency?, rate_usd?, rate_eur?, source_filename?, rows[].
-    Upserts centralized supplier price matrix entries and tier prices (stored in MYR).
+    POST JSON: supplier_id, currency?, rate_usd?, rate_eur?, and either
+    session_id + overrides[{row_index, product_id, new_product_name, new_product_sku}]
+    for an uploaded file staged by the preview, or source_filename? + rows[] (manual entry).
+    Upserts centralized supplier price matrix entries and tier prices (stored in MYR)
+    in a background job (inventory.tasks.supplier_price_matrix_import); responds 202
+    with the job to poll.
     """
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
@@ -3109,14 +2912,18 @@ def upload_supplier_price_matrix_confirm(request):
         return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
 
     supplier_id = data.get('supplier_id')
-    rows = data.get('rows') or []
+    session_id = data.get('session_id')
+    if session_id:
+        try:
+            get_import_session(session_id, ImportSession.Kind.PRICE_MATRIX, request.user)
+        except ImportSessionExpired:
+            return JsonResponse({'success': False, 'error': IMPORT_SESSION_EXPIRED}, status=400)
     if not supplier_id:
         return JsonResponse({'success': False, 'error': 'supplier_id is required.'}, status=400)
-    if not rows:
+    if not session_id and not data.get('rows'):
         return JsonResponse({'success': False, 'error': 'No rows provided.'}, status=400)
 
     supplier = get_object_or_404(Supplier, pk=supplier_id)
-    source_filename = (data.get('source_filename') or '')[:255]
     currency = (data.get('currency') or 'MYR').upper()
     if currency not in ('MYR', 'USD', 'EUR'):
         return JsonResponse({'success': False, 'error': 'Invalid currency.'}, status=400)
@@ -3130,105 +2937,14 @@ def upload_supplier_price_matrix_confirm(request):
     if currency == 'EUR' and rate_eur <= 0:
         return JsonResponse({'success': False, 'error': 'EUR rate must be greater than zero.'}, status=400)
 
-    conversion_rate = _matrix_conversion_rate(currency, rate_usd, rate_eur)
-
-    errors = []
-    affected_product_ids = set()
-
-    try:
-        with transaction.atomic():
-            for i, row in enumerate(rows):
-                medication = (row.get('medication') or row.get('line_medication') or '').strip()
-                if not medication:
-                    errors.append(f"Row {i + 1}: medication name is required.")
-                    continue
-                strength = (row.get('strength') or '').strip()
-                size = (row.get('size') or '').strip()
-                form = (row.get('form') or '').strip()
-                notes = (row.get('notes') or '').strip()
-                tiers = row.get('tiers') or []
-                if not tiers:
-                    errors.append(f"Row {i + 1}: at least one price tier is required.")
-                    continue
-
-                product = None
-                product_id = row.get('product_id')
-                new_name = (row.get('new_product_name') or '').strip()
-                new_sku = (row.get('new_product_sku') or '').strip() or None
-                if product_id:
-                    try:
-                        product = Product.objects.get(pk=product_id)
-                    except Product.DoesNotExist:
-                        errors.append(f"Row {i + 1}: product not found.")
-                        continue
-                elif new_name:
-                    product = Product.objects.filter(name__iexact=new_name).first()
-                    if not product:
-                        sku_to_use = new_sku if new_sku and not Product.objects.filter(sku=new_sku).exists() else None
-                        product = Product.objects.create(name=new_name, description='', sku=sku_to_use)
-                    elif new_sku and not product.sku and not Product.objects.filter(sku=new_sku).exclude(pk=product.pk).exists():
-                        product.sku = new_sku
-                        product.save(update_fields=['sku'])
-
-                entry, _created = SupplierPriceMatrixEntry.objects.update_or_create(
-                    supplier=supplier,
-                    line_medication=medication,
-                    strength=strength,
-                    size=size,
-                    defaults={
-                        'form': form,
-                        'notes': notes,
-                        'product': product,
-                        'price_currency': currency,
-                        'conversion_rate': conversion_rate,
-                        'source_filename': source_filename,
-                    },
-                )
-                entry.tiers.all().delete()
-                for tier in tiers:
-                    try:
-                        min_qty = int(tier.get('min_quantity', 1))
-                        max_qty = tier.get('max_quantity')
-                        max_qty = int(max_qty) if max_qty not in (None, '') else None
-                        raw_price = Decimal(str(tier.get('unit_price')))
-                        unit_price = _matrix_price_to_myr(raw_price, currency, rate_usd, rate_eur)
-                    except (ValueError, TypeError, InvalidOperation):
-                        errors.append(f"Row {i + 1}: invalid tier data.")
-                        continue
-                    if min_qty < 1 or unit_price < 0:
-                        errors.append(f"Row {i + 1}: tier min quantity must be ≥ 1 and price ≥ 0.")
-                        continue
-                    SupplierPriceMatrixTier.objects.create(
-                        entry=entry,
-                        min_quantity=min_qty,
-                        max_quantity=max_qty,
-                        unit_price=unit_price,
-                    )
-
-                snapshot_tiers = _normalize_matrix_tiers_for_json(entry.tiers.all())
-                SupplierPriceMatrixUploadRecord.objects.create(
-                    entry=entry,
-                    source_filename=source_filename,
-                    price_currency=currency,
-                    conversion_rate=conversion_rate,
-                    tiers=snapshot_tiers,
-                )
-
-                if product:
-                    if not product.suppliers.filter(pk=supplier.pk).exists():
-                        product.suppliers.add(supplier)
-                    affected_product_ids.add(product.id)
-
-    except Exception as exc:
-        logger.exception("upload_supplier_price_matrix_confirm failed")
-        return JsonResponse({'success': False, 'error': str(exc)}, status=500)
-
-    if errors:
-        return JsonResponse({'success': False, 'errors': errors}, status=400)
-
-    sync_saved_base_costs_for_products(list(affected_product_ids))
-    return JsonResponse({
-        'success': True,
-        'message': f"Updated {len(rows)} price row(s) for {supplier.name}.",
-        'updated_rows': len(rows),
+    job = enqueue('inventory.supplier_price_matrix_import', user=request.user, payload={
+        'supplier_id': supplier.pk,
+        'session_id': session_id,
+        'overrides': data.get('overrides') if session_id else None,
+        'rows': None if session_id else data.get('rows'),
+        'source_filename': data.get('source_filename') or '',
+        'currency': currency,
+        'rate_usd': str(rate_usd),
+        'rate_eur': str(rate_eur),
     })
+    return job_accepted_response(job)
@@ -4,9 +4,10 @@ from __future__ import annotations
 from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
 from io import BytesIO
-from typing import Any
+from typing import IO, Any, Callable, Iterable, Iterator
 
 from openpyxl import Workbook, load_workbook
+from openpyxl.utils import get_column_letter
 
 
 def _normalize_header(cell: Any) -> str:
@@ -104,20 +105,48 @@ def _workbook_bytes_from_rows(headers: list[str], data_rows: list[list[Any]]) ->
     return output.getvalue()
 
 
-def _load_rows(file_bytes: bytes) -> list[tuple]:
-    wb = load_workbook(filename=BytesIO(file_bytes), read_only=True, data_only=True)
-    ws = wb.active
-    return [tuple(row) for row in ws.iter_rows(values_only=True)]
+def _write_workbook_from_rows(
+    headers: list[str], rows_factory: Callable[[], Iterable[list[Any]]], output: str | IO[bytes],
+) -> None:
+    """
+    Write-only _workbook_bytes_from_rows for large exports, saved to `output` (a path or
+    binary file). rows_factory() is iterated twice, widths first (a write-only sheet
+    needs them before its first row) and then the rows, so no row list is built.
+    """
+    max_lens = [len(str(header or '')) for header in headers]
+    for row in rows_factory():
+        for idx, value in enumerate(row):
+            max_lens[idx] = max(max_lens[idx], len(str(value or '')))
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Upload')
+    for col, max_len in enumerate(max_lens, start=1):
+        ws.column_dimensions[get_column_letter(col)].width = min(max(max_len + 2, 12), 40)
+    ws.append(headers)
+    for row in rows_factory():
+        ws.append(row)
+    wb.save(output)
+
+
+def _iter_rows(upload: bytes | IO[bytes]) -> Iterator[tuple]:
+    """Stream the active sheet's rows (read-only openpyxl); only the current row is held in memory."""
+    source = BytesIO(upload) if isinstance(upload, (bytes, bytearray)) else upload
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    wb = load_workbook(filename=source, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
 
 
 def _parse_rows(
-    file_bytes: bytes,
+    upload: bytes | IO[bytes],
     *,
     required_fields: set[str],
     aliases: dict[str, str],
     row_parser,
 ) -> tuple[list[dict], list[str]]:
-    rows = _load_rows(file_bytes)
+    rows = _iter_rows(upload)
     header_map: dict[str, int] | None = None
     header_row_num = 0
     parsed: list[dict] = []
@@ -231,9 +260,9 @@ def _parse_cash_bank_row(row, header_map, row_num):
     }
 
 
-def parse_cash_bank_receipt_upload(file_bytes: bytes) -> tuple[list[dict], list[str]]:
+def parse_cash_bank_receipt_upload(upload: bytes | IO[bytes]) -> tuple[list[dict], list[str]]:
     return _parse_rows(
-        file_bytes,
+        upload,
         required_fields={'payment_type', 'received_from', 'collected_by', 'transaction_date', 'amount'},
         aliases=CASH_BANK_ALIASES,
         row_parser=_parse_cash_bank_row,
@@ -247,8 +276,10 @@ def cash_bank_receipt_template_bytes() -> bytes:
     )
 
 
-def cash_received_transactions_export_bytes(rows: list[list[Any]]) -> bytes:
-    return _workbook_bytes_from_rows(CASH_BANK_EXPORT_HEADERS, rows)
+def write_cash_received_transactions_export(
+    rows_factory: Callable[[], Iterable[list[Any]]], output: str | IO[bytes],
+) -> None:
+    _write_workbook_from_rows(CASH_BANK_EXPORT_HEADERS, rows_factory, output)
 
 
 COMMISSION_ALIASES = {
@@ -284,9 +315,9 @@ def _parse_commission_row(row, header_map, row_num):
     }
 
 
-def parse_commission_payment_upload(file_bytes: bytes) -> tuple[list[dict], list[str]]:
+def parse_commission_payment_upload(upload: bytes | IO[bytes]) -> tuple[list[dict], list[str]]:
     return _parse_rows(
-        file_bytes,
+        upload,
         required_fields={'paid_to', 'payment_date', 'amount'},
         aliases=COMMISSION_ALIASES,
         row_parser=_parse_commission_row,
@@ -347,9 +378,9 @@ def _parse_revenue_adjustment_row(row, header_map, row_num):
     }
 
 
-def parse_revenue_adjustment_upload(file_bytes: bytes) -> tuple[list[dict], list[str]]:
+def parse_revenue_adjustment_upload(upload: bytes | IO[bytes]) -> tuple[list[dict], list[str]]:
     return _parse_rows(
-        file_bytes,
+        upload,
         required_fields={'adjustment_type', 'reference', 'transaction_date', 'amount'},
         aliases=REVENUE_ADJUSTMENT_ALIASES,
         row_parser=_parse_revenue_adjustment_row,
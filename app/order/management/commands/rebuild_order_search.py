@@ -0,0 +1,13 @@
+# distributorplatform/app/order/management/commands/rebuild_order_search.py
+
+from django.core.management.base import BaseCommand
+
+from order.search import rebuild_all_order_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds Order.search_text for every order.'
+
+    def handle(self, *args, **options):
+        order_count = rebuild_all_order_search_documents()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search documents for {order_count} orders.'))
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:06
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def populate_search_documents(apps, schema_editor):
+    # Same document builder as the order signals, so existing rows index identically.
+    from order.search import rebuild_all_order_search_documents
+
+    rebuild_all_order_search_documents()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0018_remove_other_channel_add_item_discount'),
+        # pg_trgm is enabled there.
+        ('product', '0018_product_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='order_search_text_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
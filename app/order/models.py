@@ -1,5 +1,6 @@
 import string
 import random
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.conf import settings
 from django.db.models import Sum, F
@@ -212,6 +213,15 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Denormalized search document (ID, customer, agent, line products), maintained by
+    # order.signals through order.search so searches need no joins.
+    search_text = models.TextField(blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_text'], opclasses=['gin_trgm_ops'], name='order_search_text_trgm_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.agent.username}"
 
@@ -0,0 +1,86 @@
+# distributorplatform/app/order/search.py
+# Maintain and query the denormalized Order.search_text document.
+from __future__ import annotations
+
+BATCH_SIZE = 500
+
+# Fields whose change alters the documents of related orders (see order.signals);
+# update_fields may name a foreign key by field name or attname.
+ORDER_FIELDS = frozenset({
+    'customer_name', 'company_name', 'customer_phone', 'customer', 'customer_id', 'agent', 'agent_id',
+})
+PRODUCT_FIELDS = ('name', 'alias_name', 'sku')
+AGENT_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def order_search_text(order, customer_phone, agent_names, product_names) -> str:
+    """Lower-cased document: '#id id', customer, company, phones, agent names and line products."""
+    parts = [f'#{order.pk}', order.pk, order.customer_name, order.company_name, order.customer_phone, customer_phone]
+    parts.extend(agent_names)
+    parts.extend(product_names)
+    return ' '.join(str(part).strip() for part in parts if part).lower()
+
+
+def refresh_order_search_documents(order_ids) -> None:
+    """Rebuild search_text for the given orders (a few queries per batch)."""
+    from order.models import Order, OrderItem
+
+    order_ids = list({str(oid) for oid in order_ids if oid})
+    for start in range(0, len(order_ids), BATCH_SIZE):
+        orders = list(
+            Order.objects.filter(pk__in=order_ids[start:start + BATCH_SIZE])
+            .select_related('customer', 'agent')
+            .only(
+                'pk', 'customer_name', 'company_name', 'customer_phone',
+                'customer__phone', *(f'agent__{field}' for field in AGENT_FIELDS),
+            )
+        )
+        if not orders:
+            continue
+        product_names: dict[str, list[str]] = {}
+        for order_id, *names in (
+            OrderItem.objects.filter(order__in=orders)
+            .order_by('pk')
+            .values_list('order_id', *(f'product__{field}' for field in PRODUCT_FIELDS))
+        ):
+            product_names.setdefault(order_id, []).extend(names)
+        for order in orders:
+            text = order_search_text(
+                order,
+                order.customer.phone if order.customer else None,
+                [getattr(order.agent, field) for field in AGENT_FIELDS],
+                product_names.get(order.pk, []),
+            )
+            order.search_text = text
+        Order.objects.bulk_update(orders, ['search_text'])
+
+
+def rebuild_all_order_search_documents() -> int:
+    """Full rebuild (initial population / repair). Returns the number of orders processed."""
+    from order.models import Order
+
+    order_ids = list(Order.objects.order_by('pk').values_list('pk', flat=True))
+    refresh_order_search_documents(order_ids)
+    return len(order_ids)
+
+
+def search_orders(queryset, text: str):
+    """
+    Substring search (order ID, customer name/phone, company, agent, line products)
+    as one LIKE on the trigram-indexed search_text; no joins, so no DISTINCT.
+    """
+    text = (text or '').strip().lower()
+    if not text:
+        return queryset
+    return queryset.filter(search_text__contains=text)
+
+
+def search_orders_by_words(queryset, text: str):
+    """
+    Every whitespace-separated word must occur somewhere in search_text (a substring,
+    so trailing phone digits or the middle of a SKU match); one trigram-indexed LIKE
+    per word, still without joins.
+    """
+    for word in (text or '').lower().split():
+        queryset = queryset.filter(search_text__contains=word)
+    return queryset
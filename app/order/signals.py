@@ -1,10 +1,13 @@
 # distributorplatform/app/order/signals.py
 import logging
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import OrderItem
+from .models import Customer, Order, OrderItem
+from .search import AGENT_FIELDS, ORDER_FIELDS, PRODUCT_FIELDS, refresh_order_search_documents
 from commission.models import CommissionLedger
 from decimal import Decimal
+from product.models import Product
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -85,3 +88,75 @@ def create_commission_on_sale(sender, instance, created, **kwargs):
             logger.error(f"[Commission Signal] FAILED to create ledger entry: {e}")
     else:
         logger.info(f"[Commission Signal] Commission amount is 0 or negative. Skipped.")
+
+
+# --- Order search document maintenance ---
+
+@receiver(post_save, sender=Order)
+def refresh_search_document_on_order_save(sender, instance, update_fields=None, **kwargs):
+    """Status/pricing-only saves leave the document alone."""
+    if update_fields is not None and not ORDER_FIELDS.intersection(update_fields):
+        return
+    refresh_order_search_documents([instance.pk])
+
+
+@receiver(post_save, sender=OrderItem)
+def refresh_search_document_on_item_save(sender, instance, **kwargs):
+    refresh_order_search_documents([instance.order_id])
+
+
+@receiver(post_delete, sender=OrderItem)
+def refresh_search_document_on_item_delete(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Order):
+        return  # The order itself is being deleted.
+    refresh_order_search_documents([instance.order_id])
+
+
+@receiver(post_save, sender=Customer)
+def refresh_search_documents_on_customer_save(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'phone' not in update_fields):
+        return
+    refresh_order_search_documents(instance.orders.values_list('pk', flat=True))
+
+
+def _remember_changed_fields(instance, fields):
+    """pre_save helper: flag whether any of `fields` differs from the stored row."""
+    if instance.pk is None:
+        instance._search_fields_changed = False
+        return
+    stored = type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+    instance._search_fields_changed = stored is not None and any(
+        stored[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_search_fields(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(PRODUCT_FIELDS).intersection(update_fields):
+        instance._search_fields_changed = False
+        return
+    _remember_changed_fields(instance, PRODUCT_FIELDS)
+
+
+@receiver(post_save, sender=Product)
+def refresh_search_documents_on_product_rename(sender, instance, **kwargs):
+    if getattr(instance, '_search_fields_changed', False):
+        refresh_order_search_documents(
+            OrderItem.objects.filter(product=instance).values_list('order_id', flat=True).distinct()
+        )
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_agent_search_fields(sender, instance, update_fields=None, **kwargs):
+    # Logins save only last_login; skip the lookup for those.
+    if update_fields is not None and not set(AGENT_FIELDS).intersection(update_fields):
+        instance._search_fields_changed = False
+        return
+    _remember_changed_fields(instance, AGENT_FIELDS)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_search_documents_on_agent_rename(sender, instance, **kwargs):
+    if getattr(instance, '_search_fields_changed', False):
+        refresh_order_search_documents(instance.orders.values_list('pk', flat=True))
+
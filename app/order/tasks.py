@@ -0,0 +1,26 @@
+# distributorplatform/app/order/tasks.py
+# Background jobs (core.jobs) for order spreadsheet exports.
+from __future__ import annotations
+
+import tempfile
+from datetime import datetime
+
+from core.jobs import job_task
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+@job_task('order.export_orders_range')
+def export_orders_range(job, *, start_date='', end_date='', status='', agent=''):
+    """Orders (and finance entries) in a date range as .xlsx; see order.views._orders_range_export."""
+    from order.views import _orders_range_export, _write_order_rows_workbook
+
+    filename, rows_factory = _orders_range_export(_parse_date(start_date), _parse_date(end_date), status, agent)
+    job.report_progress(0, 1, 'Writing rows')
+    with tempfile.TemporaryFile() as output:
+        row_count = _write_order_rows_workbook(rows_factory, output)
+        output.seek(0)
+        job.save_result_file(filename, output)
+    return {'success': True, 'filename': filename, 'rows': row_count}
@@ -1,3 +1,125 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from openpyxl import Workbook, load_workbook
+
+from order.finance_entry_import import parse_commission_payment_upload
+from order.models import Customer, Order, OrderItem
+from order.search import search_orders, search_orders_by_words
+from order.views import _merge_sorted_export_rows, _write_order_rows_workbook
+from product.models import Product
+
+
+class OrderSearchDocumentTests(TestCase):
+    def setUp(self):
+        self.agent = get_user_model().objects.create_user(
+            username='agentsmith', password='testpass123', first_name='Sam',
+        )
+        self.customer = Customer.objects.create(name='Clinic One', phone='0123456789')
+        self.product = Product.objects.create(name='Hand Cream | 护手霜', sku='HC-01')
+        self.order = Order.objects.create(
+            agent=self.agent, created_by=self.agent, customer=self.customer,
+            customer_name='Alice Tan', company_name='Tan Trading',
+        )
+        OrderItem.objects.create(
+            order=self.order, product=self.product, quantity=1,
+            selling_price=Decimal('10.00'), landed_cost=Decimal('5.00'),
+        )
+        self.other = Order.objects.create(agent=self.agent, created_by=self.agent, customer_name='Bob Lee')
+
+    def _search(self, text):
+        return list(search_orders(Order.objects.all(), text))
+
+    def test_document_covers_order_customer_agent_and_items(self):
+        self.assertEqual(self._search(f'#{self.order.pk}'), [self.order])
+        self.assertEqual(self._search('456789'), [self.order])
+        self.assertEqual(self._search('TAN TRAD'), [self.order])
+        self.assertEqual(self._search('hand cream'), [self.order])
+        self.assertEqual(set(self._search('agentsmith')), {self.order, self.other})
+        self.assertEqual(
+            list(search_orders_by_words(Order.objects.all(), 'alice 护手')), [self.order],
+        )
+        # Words are substrings: trailing phone digits and the middle of a SKU match.
+        self.assertEqual(
+            list(search_orders_by_words(Order.objects.all(), '6789 C-0')), [self.order],
+        )
+
+    def test_document_follows_related_changes(self):
+        self.product.name = 'Body Lotion'
+        self.product.save()
+        self.customer.phone = '0199999999'
+        self.customer.save()
+        self.assertEqual(self._search('body lotion'), [self.order])
+        self.assertEqual(self._search('456789'), [])
+        self.assertEqual(self._search('0199999999'), [self.order])
+
+        self.order.items.all().delete()
+        self.assertEqual(self._search('body lotion'), [])
+
+    def test_foreign_key_attname_update_fields_refresh_the_document(self):
+        other_customer = Customer.objects.create(name='Clinic Two', phone='0188888888')
+        self.order.customer_id = other_customer.pk
+        self.order.save(update_fields=['customer_id'])
+        self.assertEqual(self._search('0188888888'), [self.order])
+
+        other_agent = get_user_model().objects.create_user(
+            username='agentjones', email='agentjones@example.com', password='testpass123',
+        )
+        self.order.agent_id = other_agent.pk
+        self.order.save(update_fields=['agent_id'])
+        self.assertEqual(self._search('agentjones'), [self.order])
+
+
+class FinanceEntryUploadTests(SimpleTestCase):
+    def _upload(self, rows):
+        wb = Workbook()
+        for row in rows:
+            wb.active.append(row)
+        buf = BytesIO()
+        wb.save(buf)
+        return buf
+
+    def test_parses_streamed_upload_below_blank_rows(self):
+        upload = self._upload([
+            [],
+            ['Paid To', 'Payment Date', 'Amount', 'Notes'],
+            ['Agent A', '2026-06-26', 500, 'June'],
+            ['Agent B', '2026-06-27', 0],
+        ])
+        rows, errors = parse_commission_payment_upload(upload)
+        self.assertEqual([row['paid_to'] for row in rows], ['Agent A'])
+        self.assertEqual(errors, ['Row 4: amount must be greater than zero.'])
+        self.assertEqual(parse_commission_payment_upload(upload.getvalue())[0], rows)
+
+
+class OrderRowsWorkbookTests(SimpleTestCase):
+    def test_write_only_workbook_keeps_totals_month_bands_and_widths(self):
+        rows = [
+            {'month_key': '2026-01', 'values': ['A1', '01/01/2026', 'sam', 'Clinic', 'Botox', 5.0, '', 9.0, 2, 18.0, 8.0]},
+            {'month_key': '2026-01', 'values': ['A2', '02/01/2026', 'sam', 'Clinic', 'Botox', 5.0, '', 9.0, 1, 9.0, 4.0]},
+            {'month_key': '2026-02', 'values': ['A3', '01/02/2026', 'sam', 'A' * 80, 'Botox', 5.0, '', 9.0, 1, -9.0, -4.0]},
+        ]
+        buf = BytesIO()
+        self.assertEqual(_write_order_rows_workbook(lambda: iter(rows), buf), 3)
+        ws = load_workbook(buf).active
+
+        values = [[cell.value for cell in row] for row in ws.iter_rows(min_row=2)]
+        self.assertEqual([row[-2:] for row in values], [[18.0, 8.0], [27.0, 12.0], [18.0, 8.0]])
+        self.assertEqual([ws.cell(row=r, column=1).fill.fgColor.rgb[-6:] for r in (2, 3, 4)], ['E6F2FF', 'E6F2FF', 'FFFFFF'])
+        self.assertTrue(ws['A1'].font.b)
+        self.assertEqual((ws.column_dimensions['A'].width, ws.column_dimensions['D'].width), (10, 48))
+
+    def test_merge_streams_date_ordered_sources_by_day(self):
+        def row(day, row_id, line_revenue):
+            return {'date': date(2026, *day), 'values': [row_id, '', '', '', '', '', '', '', '', line_revenue, 0.0]}
+
+        orders = iter([row((1, 2), 'A1', 5.0), row((2, 1), 'A2', -1.0), row((2, 1), 'A3', 2.0)])
+        receipts = iter([row((1, 31), 'CB-1', -3.0), row((2, 1), 'CB-2', -4.0)])
+        merged = _merge_sorted_export_rows(orders, receipts)
+
+        self.assertEqual(next(merged)['values'][0], 'A1')
+        # Chronological across months; within a day, negative line revenue sorts last.
+        self.assertEqual([r['values'][0] for r in merged], ['CB-1', 'A3', 'A2', 'CB-2'])
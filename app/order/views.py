@@ -1,10 +1,14 @@
 # distributorplatform/app/order/views.py
 import csv
-import io
+import heapq
+import tempfile
+from itertools import groupby
 from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle, PatternFill, Font
+from openpyxl.utils import get_column_letter
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import Http404
+from django.http import FileResponse, Http404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction, IntegrityError
@@ -17,15 +21,17 @@ from django.views.decorators.http import require_http_methods
 
 from django.core.paginator import Paginator
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Q, Prefetch, Max, Sum, F, DecimalField, Count
+from django.db.models import Q, Max, Min, Sum, F, DecimalField, Count
 from django.db.models.functions import Coalesce, TruncDate
 from datetime import datetime
 import json
 import hashlib
 import urllib.parse
 
-from inventory.models import QuotationItem
-from product.models import Product, Category
+from product.cost_snapshot import base_cost_snapshot_prefetch
+from product.models import Product
+from product.search import search_products
+from product.visibility import visible_category_ids, visible_products
 from commission.models import CommissionLedger
 from .invoice_amount_words import ringgit_amount_in_words
 from .models import (
@@ -40,16 +46,18 @@ from .models import (
     finance_entry_transaction_id,
 )
 from .forms import ManualOrderForm
+from .search import search_orders
 from .finance_entry_import import (
     CASH_BANK_TYPE_EXPORT_LABELS,
     cash_bank_receipt_template_bytes,
-    cash_received_transactions_export_bytes,
     commission_payment_template_bytes,
     parse_cash_bank_receipt_upload,
     parse_commission_payment_upload,
     parse_revenue_adjustment_upload,
     revenue_adjustment_template_bytes,
+    write_cash_received_transactions_export,
 )
+from core.jobs import enqueue, job_accepted_response
 from core.models import SiteSetting, PaymentOption
 from core.dates import format_display_date, format_display_datetime
 
@@ -65,6 +73,13 @@ MONTH_FILL_BLUE = PatternFill(fill_type='solid', fgColor='E6F2FF')
 MONTH_FILL_WHITE = PatternFill(fill_type='solid', fgColor='FFFFFF')
 HEADER_FILL_GRAY = PatternFill(fill_type='solid', fgColor='F2F2F2')
 HEADER_FONT_BOLD = Font(bold=True)
+ORDER_EXPORT_HEADER_STYLE = 'order_export_header'
+ORDER_EXPORT_MONTH_BLUE_STYLE = 'order_export_month_blue'
+ORDER_EXPORT_MONTH_WHITE_STYLE = 'order_export_month_white'
+# Finance-ledger rows fetched per database round trip by the streamed exports.
+FINANCE_EXPORT_CHUNK_SIZE = 2000
+# Orders (with their prefetched items) fetched per round trip by the orders workbook exports.
+ORDER_EXPORT_CHUNK_SIZE = 500
 
 
 def _line_discount_from_prices(platform_price, actual_unit_price, quantity):
@@ -137,14 +152,14 @@ def _order_customer_display(order):
 
 
 def _cash_bank_receipt_export_rows(receipts_qs):
-    """Build export row dicts for CashBankReceiptEntry (same columns as order item rows)."""
+    """Yield export row dicts for CashBankReceiptEntry (same columns as order item rows), oldest first."""
     type_labels = {
         CashBankReceiptEntry.PaymentType.CASH: 'Cash received',
         CashBankReceiptEntry.PaymentType.BANK: 'Bank transfer',
         CashBankReceiptEntry.PaymentType.LOAN: 'Loan repayment',
     }
-    rows = []
-    for rec in receipts_qs.select_related('recorded_by', 'collected_by'):
+    receipts_qs = receipts_qs.select_related('recorded_by', 'collected_by').order_by('transaction_date', 'pk')
+    for rec in receipts_qs.iterator(chunk_size=FINANCE_EXPORT_CHUNK_SIZE):
         product_label = type_labels.get(rec.payment_type, rec.get_payment_type_display())
         if rec.collected_by_id:
             salesteam = rec.collected_by.username
@@ -155,7 +170,8 @@ def _cash_bank_receipt_export_rows(receipts_qs):
         d = rec.transaction_date
         month_key = d.strftime('%Y-%m')
         amt = rec.amount
-        rows.append({
+        yield {
+            'date': d,
             'month_key': month_key,
             'values': [
                 rec.transaction_id or finance_entry_transaction_id('CB', rec.pk),
@@ -170,24 +186,24 @@ def _cash_bank_receipt_export_rows(receipts_qs):
                 -float(amt),
                 0.0,
             ],
-        })
-    return rows
+        }
 
 
 def _revenue_adjustment_export_rows(adjustments_qs):
-    """Build export row dicts for RevenueAdjustmentEntry (positive Line Revenue)."""
+    """Yield export row dicts for RevenueAdjustmentEntry (positive Line Revenue), oldest first."""
     type_labels = {
         RevenueAdjustmentEntry.AdjustmentType.COMMISSION_RELEASED: 'Commission released',
         RevenueAdjustmentEntry.AdjustmentType.LOAN_INTEREST: 'Interest of loan',
     }
-    rows = []
-    for adj in adjustments_qs.select_related('recorded_by'):
+    adjustments_qs = adjustments_qs.select_related('recorded_by').order_by('transaction_date', 'pk')
+    for adj in adjustments_qs.iterator(chunk_size=FINANCE_EXPORT_CHUNK_SIZE):
         product_label = type_labels.get(adj.adjustment_type, adj.get_adjustment_type_display())
         salesteam = adj.recorded_by.username if adj.recorded_by_id else ''
         d = adj.transaction_date
         month_key = d.strftime('%Y-%m')
         amt = adj.amount
-        rows.append({
+        yield {
+            'date': d,
             'month_key': month_key,
             'values': [
                 adj.transaction_id or finance_entry_transaction_id('RA', adj.pk),
@@ -202,19 +218,19 @@ def _revenue_adjustment_export_rows(adjustments_qs):
                 float(amt),
                 0.0,
             ],
-        })
-    return rows
+        }
 
 
 def _agent_commission_payment_export_rows(payments_qs):
-    """Build export row dicts for AgentCommissionPaymentEntry (negative profit)."""
-    rows = []
-    for pay in payments_qs.select_related('recorded_by'):
+    """Yield export row dicts for AgentCommissionPaymentEntry (negative profit), oldest first."""
+    payments_qs = payments_qs.select_related('recorded_by').order_by('payment_date', 'pk')
+    for pay in payments_qs.iterator(chunk_size=FINANCE_EXPORT_CHUNK_SIZE):
         salesteam = pay.recorded_by.username if pay.recorded_by_id else ''
         d = pay.payment_date
         month_key = d.strftime('%Y-%m')
         amt = pay.amount
-        rows.append({
+        yield {
+            'date': d,
             'month_key': month_key,
             'values': [
                 pay.transaction_id or finance_entry_transaction_id('CP', pay.pk),
@@ -229,8 +245,57 @@ def _agent_commission_payment_export_rows(payments_qs):
                 -float(amt),
                 -float(amt),
             ],
-        })
-    return rows
+        }
+
+
+def _order_item_export_rows(orders_qs):
+    """
+    Yield export row dicts for every item of the given orders, oldest logical order date
+    (transaction_date, else created_at) first. Orders are read in chunks with their items
+    and products prefetched per chunk.
+    """
+    orders_qs = (
+        orders_qs.select_related('agent', 'created_by')
+        .prefetch_related('items__product')
+        .annotate(logical_date=Coalesce('transaction_date', TruncDate('created_at')))
+        .order_by('logical_date', 'created_at', 'id')
+    )
+    for order in orders_qs.iterator(chunk_size=ORDER_EXPORT_CHUNK_SIZE):
+        salesteam_username = order.created_by.username if order.created_by_id else ''
+        customer_name = (
+            (order.customer_name and order.customer_name.strip())
+            or (order.agent.get_full_name() and order.agent.get_full_name().strip())
+            or order.agent.username
+        )
+        order_date_obj = _logical_order_date(order)
+        order_date_str = format_display_date(order_date_obj) if order_date_obj else ''
+        month_key = order_date_obj.strftime('%Y-%m') if order_date_obj else ''
+
+        for item in order.items.all():
+            product = item.product
+            base_cost = getattr(product, 'saved_base_cost', None)
+            if base_cost is None:
+                base_cost = item.landed_cost
+            platform_price = item.platform_price if item.platform_price is not None else ''
+            actual_received = item.actual_unit_price if item.actual_unit_price is not None else item.selling_price
+            line_revenue = actual_received * item.quantity
+            yield {
+                'date': order_date_obj,
+                'month_key': month_key,
+                'values': [
+                    order.id,
+                    order_date_str,
+                    salesteam_username,
+                    customer_name or '',
+                    product.name or '',
+                    float(base_cost) if base_cost is not None else '',
+                    float(platform_price) if platform_price != '' else '',
+                    float(actual_received),
+                    item.quantity,
+                    float(line_revenue),
+                    float(item.profit),
+                ],
+            }
 
 
 def _export_row_line_revenue_sign_bucket(row):
@@ -244,29 +309,31 @@ def _export_row_line_revenue_sign_bucket(row):
     return 0
 
 
+def _export_row_date(row):
+    return row.get('date') or datetime.min.date()
+
+
 def _export_row_sort_key(row):
     v = row['values']
-    return (v[1] or '', _export_row_line_revenue_sign_bucket(row), str(v[0]))
-
+    return (_export_row_date(row), _export_row_line_revenue_sign_bucket(row), str(v[0]))
 
-def _merge_sorted_export_rows(*row_lists):
-    combined = []
-    for rows in row_lists:
-        combined.extend(rows)
-    combined.sort(key=_export_row_sort_key)
-    return combined
 
+def _merge_sorted_export_rows(*row_sources):
+    """
+    Merge export row iterables that are each ordered by date into one stream ordered by
+    _export_row_sort_key. Only one day's rows are held (and sorted) at a time; on equal
+    keys, rows keep the order of the sources.
+    """
+    merged = heapq.merge(*row_sources, key=_export_row_date)
+    for _day, day_rows in groupby(merged, key=_export_row_date):
+        yield from sorted(day_rows, key=_export_row_sort_key)
 
-def _excel_response_for_order_rows(filename, rows):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Orders'
-    ws.append(ORDER_EXPORT_HEADERS)
-    for col in range(1, len(ORDER_EXPORT_HEADERS) + 1):
-        header_cell = ws.cell(row=1, column=col)
-        header_cell.fill = HEADER_FILL_GRAY
-        header_cell.font = HEADER_FONT_BOLD
 
+def _order_export_output_rows(rows):
+    """
+    Yield (month band style name, cell values) for each export row: its values plus the
+    running line-revenue and profit totals. The band alternates whenever the month changes.
+    """
     prev_month = None
     use_blue = True
     acc_line_revenue = Decimal('0')
@@ -275,7 +342,6 @@ def _excel_response_for_order_rows(filename, rows):
         month_key = row.get('month_key')
         if prev_month is not None and month_key != prev_month:
             use_blue = not use_blue
-        fill = MONTH_FILL_BLUE if use_blue else MONTH_FILL_WHITE
 
         values = list(row['values'])
         line_rev_raw = values[ORDER_EXPORT_LINE_REVENUE_IDX]
@@ -285,34 +351,58 @@ def _excel_response_for_order_rows(filename, rows):
         if profit_raw != '' and profit_raw is not None:
             acc_profit += Decimal(str(profit_raw))
 
-        output_values = values + [float(acc_line_revenue), float(acc_profit)]
-        ws.append(output_values)
-        current_row = ws.max_row
-        for col in range(1, len(ORDER_EXPORT_HEADERS) + 1):
-            ws.cell(row=current_row, column=col).fill = fill
-
+        style = ORDER_EXPORT_MONTH_BLUE_STYLE if use_blue else ORDER_EXPORT_MONTH_WHITE_STYLE
+        yield style, values + [float(acc_line_revenue), float(acc_profit)]
         prev_month = month_key
 
-    # Auto-fit column widths based on max content length (with a small cap).
-    for col in ws.columns:
-        max_len = 0
-        col_letter = col[0].column_letter
-        for cell in col:
-            value = '' if cell.value is None else str(cell.value)
-            if len(value) > max_len:
-                max_len = len(value)
-        ws.column_dimensions[col_letter].width = min(max(max_len + 2, 10), 48)
-
-    output = io.BytesIO()
+
+def _order_export_column_widths(rows):
+    """Auto-fit widths (longest value + 2, between 10 and 48) from the row dicts, header included."""
+    max_lens = [len(header) for header in ORDER_EXPORT_HEADERS]
+    for _style, values in _order_export_output_rows(rows):
+        for idx, value in enumerate(values):
+            length = len('' if value is None else str(value))
+            if length > max_lens[idx]:
+                max_lens[idx] = length
+    return [min(max(max_len + 2, 10), 48) for max_len in max_lens]
+
+
+def _write_order_rows_workbook(rows_factory, output):
+    """
+    Write the orders workbook to `output` (a path or binary file) and return the number
+    of data rows written. Like finance_entry_import._write_workbook_from_rows,
+    rows_factory() is iterated twice, widths first (a write-only sheet needs them before
+    its first row) and then the rows, so no row list is built. Write-only: rows go
+    straight to disk as they are appended and the header and month-band fills are
+    shared named styles, so memory does not grow with the rows.
+    """
+    wb = Workbook(write_only=True)
+    wb.add_named_style(NamedStyle(name=ORDER_EXPORT_HEADER_STYLE, fill=HEADER_FILL_GRAY, font=HEADER_FONT_BOLD))
+    wb.add_named_style(NamedStyle(name=ORDER_EXPORT_MONTH_BLUE_STYLE, fill=MONTH_FILL_BLUE))
+    wb.add_named_style(NamedStyle(name=ORDER_EXPORT_MONTH_WHITE_STYLE, fill=MONTH_FILL_WHITE))
+    ws = wb.create_sheet('Orders')
+    for col, width in enumerate(_order_export_column_widths(rows_factory()), start=1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+
+    def styled_row(values, style):
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            cells.append(cell)
+        return cells
+
+    ws.append(styled_row(ORDER_EXPORT_HEADERS, ORDER_EXPORT_HEADER_STYLE))
+    count = 0
+    for style, values in _order_export_output_rows(rows_factory()):
+        ws.append(styled_row(values, style))
+        count += 1
     wb.save(output)
-    output.seek(0)
+    return count
 
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+
+def _excel_response_for_order_rows(filename, rows_factory):
+    return _streamed_excel_response(filename, lambda output: _write_order_rows_workbook(rows_factory, output))
 
 
 def _excel_attachment_response(content_bytes, filename):
@@ -324,6 +414,22 @@ def _excel_attachment_response(content_bytes, filename):
     return response
 
 
+def _streamed_excel_response(filename, write_workbook):
+    """
+    Stream the .xlsx that write_workbook(output) saves into a temp file, in chunks,
+    rather than as bytes held in memory; the response closes the file when sent.
+    """
+    output = tempfile.TemporaryFile()
+    write_workbook(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
 def _read_uploaded_xlsx(request):
     upload = request.FILES.get('file')
     if not upload:
@@ -331,10 +437,8 @@ def _read_uploaded_xlsx(request):
     name = (upload.name or '').lower()
     if not name.endswith('.xlsx'):
         return None, JsonResponse({'success': False, 'error': 'Upload an .xlsx Excel file.'}, status=400)
-    try:
-        return upload.read(), None
-    except Exception:
-        return None, JsonResponse({'success': False, 'error': 'Could not read uploaded file.'}, status=400)
+    # Parsers stream rows from the upload itself rather than a full in-memory copy.
+    return upload, None
 
 
 def salesperson_required(view_func):
@@ -409,22 +513,10 @@ def place_order_view(request):
     Displays the main "Place Order" interface.
     Accessible by any logged-in user (Customer or Agent).
     """
-    allowed_categories = Category.objects.filter(
-        user_groups__users=request.user
-    )
-
-    products_query = Product.objects.filter(
-        categories__in=allowed_categories
-    ).select_related('featured_image').prefetch_related(
-        Prefetch(
-            'quotationitem_set',
-            queryset=QuotationItem.objects.select_related('quotation')
-                                          .prefetch_related('quotation__items')
-                                          .order_by('-quotation__date_quoted'),
-            to_attr='latest_quotation_items'
-        ),
+    products_query = visible_products(request.user).select_related('featured_image').prefetch_related(
+        base_cost_snapshot_prefetch(),
         'price_tiers',
-    ).distinct().order_by('name')
+    ).order_by('name')
 
     # --- 1. Determine Agent Status ---
     # User is an 'Agent' ONLY if they belong to a group with > 0% commission.
@@ -501,13 +593,7 @@ def api_submit_order(request):
 
         # 2. Re-fetch products to get current prices (Security)
         products_in_cart = Product.objects.filter(id__in=product_ids).prefetch_related(
-             Prefetch(
-                'quotationitem_set',
-                queryset=QuotationItem.objects.select_related('quotation')
-                                              .prefetch_related('quotation__items')
-                                              .order_by('-quotation__date_quoted'),
-                to_attr='latest_quotation_items'
-            ),
+             base_cost_snapshot_prefetch(),
              'price_tiers',
         )
 
@@ -573,15 +659,22 @@ def create_manual_order_view(request):
 
 @salesperson_required
 def api_manual_order_products(request):
-    """GET: list products for manual order (id, name, sku, default selling_price, base_cost)."""
+    """
+    GET: list products for manual order (id, name, sku, default selling_price, base_cost).
+    Optional ?q= narrows the list with the product full-text search, best match first.
+    """
     if request.method != 'GET':
         return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-    allowed_categories = Category.objects.filter(user_groups__users=request.user)
-    if request.user.is_superuser or not allowed_categories.exists():
+    if request.user.is_superuser or not visible_category_ids(request.user).exists():
         products_query = Product.objects.all()
     else:
-        products_query = Product.objects.filter(categories__in=allowed_categories)
-    products_query = products_query.distinct().order_by('name')
+        products_query = visible_products(request.user)
+    products_query = products_query.prefetch_related(base_cost_snapshot_prefetch())
+    search_query = request.GET.get('q', '').strip()
+    if search_query:
+        products_query = search_products(products_query, search_query)
+    else:
+        products_query = products_query.order_by('name')
     product_list = []
     for p in products_query:
         product_list.append({
@@ -1625,27 +1718,6 @@ def _user_can_manual_order(user):
     ).exists()
 
 
-def _manage_orders_search_q(search_query: str) -> Q:
-    """Q object for Order Management search: ID, customer (name/phone), agent, line items (product name/alias)."""
-    normalized_id_term = search_query.lstrip('#').strip()
-    search_q = (
-        Q(id__icontains=search_query) |
-        Q(customer_name__icontains=search_query) |
-        Q(customer_phone__icontains=search_query) |
-        Q(customer__phone__icontains=search_query) |
-        Q(agent__username__icontains=search_query) |
-        Q(agent__first_name__icontains=search_query) |
-        Q(agent__last_name__icontains=search_query) |
-        Q(items__product__name__icontains=search_query) |
-        Q(items__product__alias_name__icontains=search_query)
-    )
-    if normalized_id_term and normalized_id_term != search_query:
-        search_q |= Q(id__icontains=normalized_id_term)
-    if normalized_id_term.isdigit():
-        search_q |= Q(id=int(normalized_id_term))
-    return search_q
-
-
 def _apply_order_status_agent_filters(qs, status_filter='', agent_filter=''):
     if status_filter:
         qs = qs.filter(status=status_filter)
@@ -1915,7 +1987,7 @@ def api_manage_orders(request):
 
     # 3. Apply Search Filter: ID, customer (name/phone), agent, product name on any line item
     if search_query:
-        orders = orders.filter(_manage_orders_search_q(search_query)).distinct()
+        orders = search_orders(orders, search_query)
 
     # --- Statistics Calculation (Scoped to current Month/Search filters) ---
     # We create a separate queryset for stats to respect Date/Search filters
@@ -1942,7 +2014,7 @@ def api_manage_orders(request):
         )
 
     if search_query:
-        stats_qs = stats_qs.filter(_manage_orders_search_q(search_query)).distinct()
+        stats_qs = search_orders(stats_qs, search_query)
 
     if agent_filter:
         try:
@@ -2087,7 +2159,7 @@ def api_revenue_breakdown(request):
             Q(transaction_date__isnull=True, created_at__year=year, created_at__month=month)
         )
     if search_query:
-        stats_qs = stats_qs.filter(_manage_orders_search_q(search_query)).distinct()
+        stats_qs = search_orders(stats_qs, search_query)
 
     rev_rows = (
         OrderItem.objects
@@ -2177,7 +2249,7 @@ def api_orders_breakdown(request):
             Q(transaction_date__isnull=True, created_at__year=year, created_at__month=month)
         )
     if search_query:
-        stats_qs = stats_qs.filter(_manage_orders_search_q(search_query)).distinct()
+        stats_qs = search_orders(stats_qs, search_query)
 
     item_rows = (
         OrderItem.objects
@@ -2573,11 +2645,11 @@ def api_cash_bank_receipt_bulk_template(request):
 @require_http_methods(['POST'])
 @transaction.atomic
 def api_cash_bank_receipt_bulk_upload(request):
-    file_bytes, error_response = _read_uploaded_xlsx(request)
+    upload, error_response = _read_uploaded_xlsx(request)
     if error_response:
         return error_response
 
-    rows, errors = parse_cash_bank_receipt_upload(file_bytes)
+    rows, errors = parse_cash_bank_receipt_upload(upload)
     if errors:
         return JsonResponse({'success': False, 'errors': errors}, status=400)
 
@@ -2771,28 +2843,35 @@ def api_cash_received_transactions(request):
     })
 
 
+def _cash_received_export_rows():
+    """Export rows for every cash/bank receipt, from a values_list projection streamed in chunks."""
+    type_labels = {**dict(CashBankReceiptEntry.PaymentType.choices), **CASH_BANK_TYPE_EXPORT_LABELS}
+    entries = CashBankReceiptEntry.objects.order_by('-transaction_date', '-id').values_list(
+        'pk', 'transaction_id', 'payment_type', 'received_from', 'collected_by__username', 'transaction_date', 'amount',
+    )
+    for pk, transaction_id, payment_type, received_from, collected_by, transaction_date, amount in entries.iterator(
+        chunk_size=FINANCE_EXPORT_CHUNK_SIZE,
+    ):
+        yield [
+            transaction_id or finance_entry_transaction_id('CB', pk),
+            type_labels.get(payment_type, payment_type),
+            received_from,
+            collected_by or '',
+            transaction_date.isoformat(),
+            float(amount),
+        ]
+
+
 @staff_member_required
 def export_cash_received_transactions(request):
     """Export all cash/bank receipt entries for bulk edit (e.g. update collected by). Superuser only."""
     if not request.user.is_superuser:
         return JsonResponse({'error': 'Forbidden'}, status=403)
 
-    entries = CashBankReceiptEntry.objects.select_related('collected_by').order_by('-transaction_date', '-id')
-    data_rows = []
-    for entry in entries:
-        data_rows.append([
-            entry.transaction_id or finance_entry_transaction_id('CB', entry.pk),
-            CASH_BANK_TYPE_EXPORT_LABELS.get(entry.payment_type, entry.get_payment_type_display()),
-            entry.received_from,
-            entry.collected_by.username if entry.collected_by_id else '',
-            entry.transaction_date.isoformat(),
-            float(entry.amount),
-        ])
-
     filename = f'cash_received_transactions_{timezone.now().strftime("%Y%m%d")}.xlsx'
-    return _excel_attachment_response(
-        cash_received_transactions_export_bytes(data_rows),
+    return _streamed_excel_response(
         filename,
+        lambda output: write_cash_received_transactions_export(_cash_received_export_rows, output),
     )
 
 
@@ -3058,11 +3137,11 @@ def api_agent_commission_payment_bulk_upload(request):
     if not request.user.is_superuser:
         return JsonResponse({'success': False, 'error': 'Forbidden'}, status=403)
 
-    file_bytes, error_response = _read_uploaded_xlsx(request)
+    upload, error_response = _read_uploaded_xlsx(request)
     if error_response:
         return error_response
 
-    rows, errors = parse_commission_payment_upload(file_bytes)
+    rows, errors = parse_commission_payment_upload(upload)
     if errors:
         return JsonResponse({'success': False, 'errors': errors}, status=400)
 
@@ -3103,11 +3182,11 @@ def api_revenue_adjustment_bulk_upload(request):
     if not request.user.is_superuser:
         return JsonResponse({'success': False, 'error': 'Forbidden'}, status=403)
 
-    file_bytes, error_response = _read_uploaded_xlsx(request)
+    upload, error_response = _read_uploaded_xlsx(request)
     if error_response:
         return error_response
 
-    rows, errors = parse_revenue_adjustment_upload(file_bytes)
+    rows, errors = parse_revenue_adjustment_upload(upload)
     if errors:
         return JsonResponse({'success': False, 'errors': errors}, status=400)
 
@@ -3150,51 +3229,13 @@ def export_selected_orders(request):
     # Limit to avoid huge exports
     order_ids = list(set(str(oid).strip() for oid in order_ids if oid))[:500]
 
-    orders = list(
-        Order.objects.filter(id__in=order_ids)
-        .select_related('agent', 'created_by')
-        .prefetch_related('items__product')
+    orders = Order.objects.filter(id__in=order_ids)
+    bounds = orders.aggregate(
+        d_min=Min(Coalesce('transaction_date', TruncDate('created_at'))),
+        d_max=Max(Coalesce('transaction_date', TruncDate('created_at'))),
     )
-    orders.sort(key=lambda o: (_logical_order_date(o) or datetime.min.date(), o.created_at))
-
-    rows = []
-    for order in orders:
-        salesteam_username = order.created_by.username if order.created_by_id else ''
-        customer_name = (
-            (order.customer_name and order.customer_name.strip())
-            or (order.agent.get_full_name() and order.agent.get_full_name().strip())
-            or order.agent.username
-        )
-        order_date_obj = _logical_order_date(order)
-        order_date = format_display_date(order_date_obj) if order_date_obj else ''
-        month_key = order_date_obj.strftime('%Y-%m') if order_date_obj else ''
-
-        for item in order.items.all():
-            product = item.product
-            base_cost = product.saved_base_cost if (product.saved_base_cost is not None) else item.landed_cost
-            platform_price = item.platform_price if item.platform_price is not None else ''
-            actual_received = item.actual_unit_price if item.actual_unit_price is not None else item.selling_price
-            line_revenue = actual_received * item.quantity
-            rows.append({
-                'month_key': month_key,
-                'values': [
-                    order.id,
-                    order_date,
-                    salesteam_username,
-                    customer_name or '',
-                    product.name or '',
-                    float(base_cost) if base_cost is not None else '',
-                    float(platform_price) if platform_price != '' else '',
-                    float(actual_received),
-                    item.quantity,
-                    float(line_revenue),
-                    float(item.profit),
-                ],
-            })
-
-    dates = [d for d in (_logical_order_date(o) for o in orders) if d is not None]
-    if dates:
-        d_min, d_max = min(dates), max(dates)
+    if bounds['d_min'] is not None:
+        d_min, d_max = bounds['d_min'], bounds['d_max']
         receipts = CashBankReceiptEntry.objects.filter(
             transaction_date__gte=d_min,
             transaction_date__lte=d_max,
@@ -3212,44 +3253,25 @@ def export_selected_orders(request):
         receipts = CashBankReceiptEntry.objects.none()
         adjustments = RevenueAdjustmentEntry.objects.none()
         commission_payments = AgentCommissionPaymentEntry.objects.none()
-    rows = _merge_sorted_export_rows(
-        rows,
-        _cash_bank_receipt_export_rows(receipts),
-        _revenue_adjustment_export_rows(adjustments),
-        _agent_commission_payment_export_rows(commission_payments),
-    )
+    def rows_factory():
+        return _merge_sorted_export_rows(
+            _order_item_export_rows(orders),
+            _cash_bank_receipt_export_rows(receipts),
+            _revenue_adjustment_export_rows(adjustments),
+            _agent_commission_payment_export_rows(commission_payments),
+        )
 
-    return _excel_response_for_order_rows('orders_export.xlsx', rows)
+    return _excel_response_for_order_rows('orders_export.xlsx', rows_factory)
 
 
-@staff_member_required
-def export_orders_range(request):
+def _orders_range_export(start_date, end_date, status_filter, agent_filter):
     """
-    Export all order items whose logical order date (transaction_date or created_at)
-    falls within the given date range.
-    GET params:
-        start_date, end_date in YYYY-MM-DD format (at least one required).
-        status, agent — optional; same as Order Management list filters.
+    (filename, rows factory) for order items whose logical order date (transaction_date
+    or created_at) falls within the range, plus cash receipts, revenue adjustments and
+    commission payments dated in it. Either bound may be None. Each call of the factory
+    returns a fresh lazy stream, read from the database in chunks.
     """
-    start_str = request.GET.get('start_date') or ''
-    end_str = request.GET.get('end_date') or ''
-    status_filter = (request.GET.get('status') or '').strip()
-    agent_filter = (request.GET.get('agent') or '').strip()
-
-    if not start_str and not end_str:
-        return HttpResponse("start_date or end_date is required.", status=400)
-
-    start_date = None
-    end_date = None
-    try:
-        if start_str:
-            start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
-        if end_str:
-            end_date = datetime.strptime(end_str, '%Y-%m-%d').date()
-    except ValueError:
-        return HttpResponse("Invalid date format. Use YYYY-MM-DD.", status=400)
-
-    orders = Order.objects.select_related('agent', 'created_by').prefetch_related('items__product')
+    orders = Order.objects.all()
 
     if start_date:
         orders = orders.filter(
@@ -3266,13 +3288,6 @@ def export_orders_range(request):
 
     orders = _apply_order_status_agent_filters(orders, status_filter, agent_filter)
 
-    # Sort by logical order date oldest -> newest
-    # (transaction_date when present, otherwise created_at)
-    orders = sorted(
-        list(orders),
-        key=lambda o: (o.transaction_date or (o.created_at.date() if o.created_at else datetime.min.date()), o.created_at)
-    )
-
     filename_parts = ["orders_range"]
     if start_date:
         filename_parts.append(start_date.strftime('%Y%m%d'))
@@ -3280,43 +3295,6 @@ def export_orders_range(request):
         filename_parts.append(end_date.strftime('%Y%m%d'))
     filename = f'{"_".join(filename_parts)}.xlsx'
 
-    rows = []
-    for order in orders:
-        salesteam_username = order.created_by.username if order.created_by_id else ''
-        customer_name = (
-            (order.customer_name and order.customer_name.strip())
-            or (order.agent.get_full_name() and order.agent.get_full_name().strip())
-            or order.agent.username
-        )
-        order_date_obj = _logical_order_date(order)
-        order_date_str = format_display_date(order_date_obj) if order_date_obj else ''
-        month_key = order_date_obj.strftime('%Y-%m') if order_date_obj else ''
-
-        for item in order.items.all():
-            product = item.product
-            base_cost = getattr(product, 'saved_base_cost', None)
-            if base_cost is None:
-                base_cost = item.landed_cost
-            platform_price = item.platform_price if item.platform_price is not None else ''
-            actual_received = item.actual_unit_price if item.actual_unit_price is not None else item.selling_price
-            line_revenue = actual_received * item.quantity
-            rows.append({
-                'month_key': month_key,
-                'values': [
-                    order.id,
-                    order_date_str,
-                    salesteam_username,
-                    customer_name or '',
-                    product.name or '',
-                    float(base_cost) if base_cost is not None else '',
-                    float(platform_price) if platform_price != '' else '',
-                    float(actual_received),
-                    item.quantity,
-                    float(line_revenue),
-                    float(item.profit),
-                ],
-            })
-
     receipts = CashBankReceiptEntry.objects.all()
     if start_date:
         receipts = receipts.filter(transaction_date__gte=start_date)
@@ -3336,14 +3314,48 @@ def export_orders_range(request):
     if end_date:
         commission_payments = commission_payments.filter(payment_date__lte=end_date)
 
-    rows = _merge_sorted_export_rows(
-        rows,
-        _cash_bank_receipt_export_rows(receipts),
-        _revenue_adjustment_export_rows(adjustments),
-        _agent_commission_payment_export_rows(commission_payments),
-    )
+    def rows_factory():
+        return _merge_sorted_export_rows(
+            _order_item_export_rows(orders),
+            _cash_bank_receipt_export_rows(receipts),
+            _revenue_adjustment_export_rows(adjustments),
+            _agent_commission_payment_export_rows(commission_payments),
+        )
+
+    return filename, rows_factory
+
+
+@staff_member_required
+def export_orders_range(request):
+    """
+    Queue an export of all order items whose logical order date falls within the given
+    date range (see _orders_range_export); the browser polls the job and downloads the file.
+    GET params:
+        start_date, end_date in YYYY-MM-DD format (at least one required).
+        status, agent — optional; same as Order Management list filters.
+    """
+    start_str = request.GET.get('start_date') or ''
+    end_str = request.GET.get('end_date') or ''
+    status_filter = (request.GET.get('status') or '').strip()
+    agent_filter = (request.GET.get('agent') or '').strip()
 
-    return _excel_response_for_order_rows(filename, rows)
+    if not start_str and not end_str:
+        return JsonResponse({'success': False, 'error': 'start_date or end_date is required.'}, status=400)
+
+    try:
+        if start_str:
+            datetime.strptime(start_str, '%Y-%m-%d')
+        if end_str:
+            datetime.strptime(end_str, '%Y-%m-%d')
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=400)
+
+    job = enqueue(
+        'order.export_orders_range',
+        user=request.user,
+        payload={'start_date': start_str, 'end_date': end_str, 'status': status_filter, 'agent': agent_filter},
+    )
+    return job_accepted_response(job)
 
 
 @login_required
@@ -3666,49 +3678,8 @@ def export_order_statement(request):
             Q(transaction_date__year=year, transaction_date__month=month)
             |
             Q(transaction_date__isnull=True, created_at__year=year, created_at__month=month)
-        ).select_related('agent', 'created_by').prefetch_related('items__product')
-
+        )
         orders = _apply_order_status_agent_filters(orders, status_filter, agent_filter)
-        orders = orders.order_by('transaction_date', 'created_at', 'id')
-
-        rows = []
-
-        for order in orders:
-            items = list(order.items.all())
-            salesteam_username = order.created_by.username if order.created_by_id else ''
-            customer_name = (
-                (order.customer_name and order.customer_name.strip())
-                or (order.agent.get_full_name() and order.agent.get_full_name().strip())
-                or order.agent.username
-            )
-            order_date = order.transaction_date or (order.created_at.date() if order.created_at else None)
-            order_date_str = format_display_date(order_date) if hasattr(order_date, 'strftime') else ''
-            month_key = order_date.strftime('%Y-%m') if hasattr(order_date, 'strftime') else ''
-
-            for item in items:
-                product = item.product
-                base_cost = getattr(product, 'saved_base_cost', None)
-                if base_cost is None:
-                    base_cost = item.landed_cost
-                platform_price = item.platform_price if item.platform_price is not None else ''
-                actual_received = item.actual_unit_price if item.actual_unit_price is not None else item.selling_price
-                line_revenue = actual_received * item.quantity
-                rows.append({
-                    'month_key': month_key,
-                    'values': [
-                        order.id,
-                        order_date_str,
-                        salesteam_username,
-                        customer_name or '',
-                        product.name or '',
-                        float(base_cost) if base_cost is not None else '',
-                        float(platform_price) if platform_price != '' else '',
-                        float(actual_received),
-                        item.quantity,
-                        float(line_revenue),
-                        float(item.profit),
-                    ],
-                })
 
         receipts = CashBankReceiptEntry.objects.filter(
             transaction_date__year=year,
@@ -3723,15 +3694,16 @@ def export_order_statement(request):
             payment_date__year=year,
             payment_date__month=month,
         )
-        rows = _merge_sorted_export_rows(
-            rows,
-            _cash_bank_receipt_export_rows(receipts),
-            _revenue_adjustment_export_rows(adjustments),
-            _agent_commission_payment_export_rows(commission_payments),
-        )
+        def rows_factory():
+            return _merge_sorted_export_rows(
+                _order_item_export_rows(orders),
+                _cash_bank_receipt_export_rows(receipts),
+                _revenue_adjustment_export_rows(adjustments),
+                _agent_commission_payment_export_rows(commission_payments),
+            )
 
         filename = f"order_statement_{year}_{month:02d}.xlsx"
-        return _excel_response_for_order_rows(filename, rows)
+        return _excel_response_for_order_rows(filename, rows_factory)
 
     except Exception as e:
         return HttpResponse(f"Error exporting Excel: {str(e)}", status=500)
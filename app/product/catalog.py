@@ -0,0 +1,165 @@
+# distributorplatform/app/product/catalog.py
+# In-memory catalog lookups for imports: resolve every row of an upload, create missing products in bulk.
+from __future__ import annotations
+
+from .duplicates import name_similarity
+from .matching import FUZZY_MATCH_THRESHOLD, MATCH_NAME_EXACT, MATCH_NAME_FUZZY, MATCH_NEW, MATCH_SKU
+from .normalize import normalize_name
+
+
+class CatalogMatcher:
+    """
+    Snapshot of (id, sku, name, alias_name) for the whole catalog, loaded with one
+    query, with case-insensitive SKU / name / alias maps and a token index for
+    fuzzy lookups. Build one per import batch, resolve every row in memory, and let
+    resolve_all() create the missing products with a single bulk_create.
+    Not safe to share across requests: it does not see products created elsewhere.
+    """
+
+    def __init__(self):
+        from product.models import Product
+
+        self._by_sku: dict[str, int] = {}
+        self._by_name: dict[str, int] = {}
+        self._by_alias: dict[str, int] = {}
+        self._tokens: dict[int, tuple] = {}
+        self._token_index: dict[str, set[int]] = {}
+        self._products: dict[int, object] = {}
+        # Products this matcher created, so callers can report created vs matched.
+        self.created_ids: set[int] = set()
+        rows = Product.objects.order_by('pk').values_list('pk', 'sku', 'name', 'alias_name')
+        for pk, sku, name, alias_name in rows.iterator():
+            self._add(pk, sku, name, alias_name)
+
+    def _add(self, pk, sku, name, alias_name=None) -> None:
+        # Lowest pk wins on duplicates, like .filter(...).first() on the default ordering.
+        if sku:
+            self._by_sku.setdefault(sku.strip().lower(), pk)
+        if name:
+            self._by_name.setdefault(name.strip().lower(), pk)
+        if alias_name:
+            self._by_alias.setdefault(alias_name.strip().lower(), pk)
+        tokens = normalize_name(name).tokens
+        self._tokens[pk] = tokens
+        for token in tokens:
+            self._token_index.setdefault(token, set()).add(pk)
+
+    def match(self, sku='', name='', *, fuzzy=False, name_only=False) -> tuple[int | None, str]:
+        """
+        (product id, match type) by SKU, then exact name, then alias; optionally closest
+        name by tokens. name_only matches the exact name alone (no SKU, alias or fuzzy).
+        """
+        sku = str(sku or '').strip().lower()
+        name = str(name or '').strip()
+        if name_only:
+            product_id = self._by_name.get(name.lower()) if name else None
+            return product_id, MATCH_NAME_EXACT if product_id is not None else MATCH_NEW
+        if sku and sku in self._by_sku:
+            return self._by_sku[sku], MATCH_SKU
+        if not name:
+            return None, MATCH_NEW
+        key = name.lower()
+        if key in self._by_name:
+            return self._by_name[key], MATCH_NAME_EXACT
+        if key in self._by_alias:
+            return self._by_alias[key], MATCH_NAME_EXACT
+        if fuzzy:
+            product_id = self._closest(name)
+            if product_id is not None:
+                return product_id, MATCH_NAME_FUZZY
+        return None, MATCH_NEW
+
+    def _closest(self, name) -> int | None:
+        tokens = normalize_name(name).tokens
+        candidates = set()
+        for token in tokens:
+            candidates |= self._token_index.get(token, set())
+        best_id, best_score = None, 0.0
+        for pk in sorted(candidates):
+            score = name_similarity(tokens, self._tokens[pk])
+            if score > best_score:
+                best_id, best_score = pk, score
+        return best_id if best_score >= FUZZY_MATCH_THRESHOLD else None
+
+    def remember(self, product) -> None:
+        """Register a product saved outside the matcher (e.g. a SKU assigned mid-import)."""
+        self._add(product.pk, product.sku, product.name, product.alias_name)
+
+    def sku_taken(self, sku) -> bool:
+        return bool(sku) and sku.strip().lower() in self._by_sku
+
+    def resolve_all(self, rows, *, create_missing=True, defaults=None, assign_sku=False, fuzzy=False,
+                    name_only=False) -> list:
+        """
+        One Product (or None) per (sku, name) row, in input order. Rows that match
+        nothing are created by name when create_missing is set: one bulk_create for
+        the batch, one product per distinct name, with `defaults` as extra field
+        values. assign_sku gives a new product its row's SKU unless that SKU is
+        already taken. name_only matches rows by exact name alone, never attaching a
+        row to whichever product owns its SKU. Matched products are loaded with one query.
+        """
+        from product.models import Product
+
+        rows = [(str(sku or '').strip(), str(name or '').strip()[:200].strip()) for sku, name in rows]
+        ids = [self.match(sku, name, fuzzy=fuzzy, name_only=name_only)[0] for sku, name in rows]
+
+        if create_missing:
+            new_products = {}
+            reserved_skus = set()
+            for (sku, name), product_id in zip(rows, ids):
+                key = name.lower()
+                if product_id is not None or not name or key in new_products:
+                    continue
+                product = Product(name=name, **(defaults or {}))
+                if assign_sku and sku and not self.sku_taken(sku) and sku.lower() not in reserved_skus:
+                    product.sku = sku
+                    reserved_skus.add(sku.lower())
+                new_products[key] = product
+            if new_products:
+                created = Product.objects.bulk_create(list(new_products.values()))
+                for product in created:
+                    self._add(product.pk, product.sku, product.name)
+                    self._products[product.pk] = product
+                    self.created_ids.add(product.pk)
+                finish_bulk_created_products(created)
+                ids = [
+                    product_id if product_id is not None or not name else self._by_name[name.lower()]
+                    for (sku, name), product_id in zip(rows, ids)
+                ]
+
+        wanted = {pk for pk in ids if pk is not None and pk not in self._products}
+        if wanted:
+            self._products.update(Product.objects.in_bulk(wanted))
+        return [self._products.get(pk) if pk is not None else None for pk in ids]
+
+    def product(self, sku='', name='', *, create=True, defaults=None, assign_sku=False, fuzzy=False):
+        """Single-row form of resolve_all(); reuses products already loaded by this matcher."""
+        return self.resolve_all(
+            [(sku, name)], create_missing=create, defaults=defaults, assign_sku=assign_sku, fuzzy=fuzzy,
+        )[0]
+
+
+def finish_bulk_created_products(products) -> None:
+    """
+    bulk_create skips the Product post_save handlers; run the same maintenance
+    for the new rows in bulk (visibility, search vectors, duplicate index, caches, SEO).
+    """
+    from product.context_processors import category_nav_cache
+    from product.duplicates import refresh_duplicate_index
+    from product.home_catalog import home_catalog_cache
+    from product.search import refresh_search_vectors
+    from product.signals import create_or_update_seo_for_product
+    from product.visibility import rebuild_product_visibility
+
+    products = list(products)
+    if not products:
+        return
+    product_ids = [product.pk for product in products]
+    for product in products:
+        if product.sku:
+            create_or_update_seo_for_product(type(product), product, created=True)
+    rebuild_product_visibility(product_ids)
+    refresh_search_vectors(product_ids)
+    refresh_duplicate_index(product_ids)
+    category_nav_cache.invalidate()
+    home_catalog_cache.invalidate()
@@ -1,5 +1,27 @@
 # distributorplatform/app/product/context_processors.py
-from .models import Product, Category
+from core.cache import VersionedCache
+from user.utils import user_group_fingerprint
+
+from .models import Category
+from .visibility import visible_category_ids
+
+# Ordered nav categories per visitor group-set fingerprint ('anonymous' for guests).
+# Invalidated by product.signals when categories, group access or product visibility change.
+category_nav_cache = VersionedCache('category_nav')
+
+
+def build_allowed_categories(user):
+    """
+    Categories shown in the navigation: those assigned to the user's groups,
+    or for guests every category that holds at least one public product.
+    Depends only on the user's group set, so the result is shared per fingerprint.
+    """
+    # FIX: Order by 'display_order' first, then 'name'
+    return list(
+        Category.objects.filter(pk__in=visible_category_ids(user))
+        .select_related('group').order_by('display_order', 'name')
+    )
+
 
 def category_nav_context(request):
     """
@@ -7,22 +29,10 @@ def category_nav_context(request):
     data available on all pages.
     """
     selected_category_code = request.GET.get('category')
-    allowed_categories_list = None
-
-    if request.user.is_authenticated and not request.user.is_anonymous:
-        # Get all categories assigned to the user's groups
-        # FIX: Order by 'display_order' first, then 'name'
-        allowed_categories_list = Category.objects.filter(
-            user_groups__users=request.user
-        ).select_related('group').distinct().order_by('display_order', 'name')
-    else:
-        # For anonymous users, get products first
-        products_query = Product.objects.filter(members_only=False)
-        # Find all categories that contain at least one of these products
-        # FIX: Order by 'display_order' first, then 'name'
-        allowed_categories_list = Category.objects.filter(
-            products__in=products_query
-        ).select_related('group').distinct().order_by('display_order', 'name')
+    allowed_categories_list = category_nav_cache.get_or_build(
+        user_group_fingerprint(request.user),
+        lambda: build_allowed_categories(request.user),
+    )
 
     return {
         'allowed_categories_list': allowed_categories_list,
@@ -0,0 +1,118 @@
+# distributorplatform/app/product/cost_snapshot.py
+# Maintain and query the materialized ProductCostSnapshot table (landed costs).
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Prefetch
+
+BATCH_SIZE = 500
+
+_deferred = threading.local()
+
+
+def refresh_cost_snapshots(product_ids) -> None:
+    """
+    Recompute the base row and every per-supplier row for the given products
+    from the live matrix / invoice / quotation data. Runs in the caller's
+    transaction so the snapshot commits (or rolls back) with the cost change,
+    and queues the products for saved_base_cost reconciliation after commit.
+    """
+    from inventory.supplier_pricing import compute_base_costs_for_products, compute_supplier_costs_for_products
+    from product.models import Product, ProductCostSnapshot
+    from product.pricing_sync import mark_saved_base_cost_dirty
+
+    product_ids = list({int(pid) for pid in product_ids if pid is not None})
+    if not product_ids:
+        return
+    # Skip ids deleted in this transaction (e.g. cascades) so inserts do not violate the FK.
+    product_ids = list(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+
+    supplier_costs = compute_supplier_costs_for_products(product_ids)
+    base_costs = compute_base_costs_for_products(product_ids)
+    rows = []
+    for pid in product_ids:
+        for sc in supplier_costs.get(pid, []):
+            rows.append(ProductCostSnapshot(
+                product_id=pid,
+                supplier_id=sc['supplier_id'],
+                cost=sc['cost'],
+                source=sc['source'],
+                cost_date=sc['date'],
+                source_updated_at=sc.get('updated_at'),
+            ))
+        base = base_costs.get(pid)
+        if base is not None:
+            rows.append(ProductCostSnapshot(
+                product_id=pid,
+                supplier=None,
+                cost=base['cost'],
+                source=base['source'],
+                cost_date=base['date'],
+            ))
+
+    with transaction.atomic():
+        ProductCostSnapshot.objects.filter(product_id__in=product_ids).delete()
+        ProductCostSnapshot.objects.bulk_create(rows, batch_size=1000)
+    mark_saved_base_cost_dirty(product_ids)
+
+
+def request_cost_snapshot_refresh(product_ids) -> None:
+    """Refresh now, or at the end of the enclosing deferred_cost_snapshot_refresh() block."""
+    pending = getattr(_deferred, 'product_ids', None)
+    if pending is None:
+        refresh_cost_snapshots(product_ids)
+        return
+    pending.update(int(pid) for pid in product_ids if pid is not None)
+
+
+def refresh_cost_snapshots_for_bulk_items(items) -> None:
+    """
+    Refresh the products of invoice/quotation lines saved with bulk_create(), which
+    skips the post_save handlers in product.signals that normally request it.
+    """
+    request_cost_snapshot_refresh({item.product_id for item in items})
+
+
+@contextmanager
+def deferred_cost_snapshot_refresh():
+    """
+    Collect refreshes requested by the cost signal handlers and run them once, for all
+    touched products, when the block exits. Use inside the writer's transaction.atomic()
+    around row-by-row imports so each product is recomputed once instead of per row.
+    """
+    if getattr(_deferred, 'product_ids', None) is not None:
+        yield
+        return
+    _deferred.product_ids = set()
+    try:
+        yield
+        product_ids = _deferred.product_ids
+    finally:
+        _deferred.product_ids = None
+    refresh_cost_snapshots(product_ids)
+
+
+def rebuild_all_cost_snapshots() -> int:
+    """Full rebuild (initial population / repair). Returns the number of products processed."""
+    from product.models import Product, ProductCostSnapshot
+
+    product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+    with transaction.atomic():
+        ProductCostSnapshot.objects.all().delete()
+        for start in range(0, len(product_ids), BATCH_SIZE):
+            refresh_cost_snapshots(product_ids[start:start + BATCH_SIZE])
+    return len(product_ids)
+
+
+def base_cost_snapshot_prefetch() -> Prefetch:
+    """Prefetch for list views: Product.base_cost then reads the prefetched row instead of querying."""
+    from product.models import ProductCostSnapshot
+
+    return Prefetch(
+        'cost_snapshots',
+        queryset=ProductCostSnapshot.objects.filter(supplier__isnull=True),
+        to_attr='base_cost_snapshots',
+    )
@@ -0,0 +1,275 @@
+# distributorplatform/app/product/duplicates.py
+# Maintain the persisted duplicate-product index (name keys, MinHash/LSH bands, candidate pairs).
+from __future__ import annotations
+
+import hashlib
+import random
+from typing import NamedTuple
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .normalize import normalize_name
+
+BATCH_SIZE = 500
+DEFAULT_MIN_SCORE = 0.7
+
+# 12 bands of 2 MinHash rows: a pair at the default 0.7 token-overlap score
+# (Jaccard ~0.54) collides in at least one band ~98% of the time. Pairs that share
+# an exact base key are always compared, so LSH only adds recall across buckets.
+NUM_BANDS = 12
+ROWS_PER_BAND = 2
+_MERSENNE_PRIME = (1 << 61) - 1
+# Fixed seed: band keys are persisted, so the permutations must be stable across processes.
+_rng = random.Random(20240601)
+_PERMUTATIONS = tuple(
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_BANDS * ROWS_PER_BAND)
+)
+
+
+def extract_variant_tokens(name) -> frozenset:
+    """Strength/dose/pack-size tokens that distinguish product variants (e.g. 10mg vs 15mg)."""
+    return normalize_name(name).variant_tokens
+
+
+def product_base_key(name) -> tuple:
+    """Bucket key: normalized name with strength/dose tokens removed."""
+    return normalize_name(name).base_key
+
+
+def name_similarity(tokens_a, tokens_b) -> float:
+    """Simple token-overlap (Dice) similarity between two token lists."""
+    if not tokens_a or not tokens_b:
+        return 0.0
+    set_a = set(tokens_a)
+    set_b = set(tokens_b)
+    return (2.0 * len(set_a & set_b)) / (len(set_a) + len(set_b))
+
+
+def products_are_merge_candidates(name_a, name_b, *, min_score=DEFAULT_MIN_SCORE) -> bool:
+    """True when two product names look like duplicates, not merely same brand/dose line."""
+    name_a, name_b = normalize_name(name_a), normalize_name(name_b)
+    if not name_a.tokens or not name_b.tokens:
+        return False
+    # Duplicates must share the same strength/dose signature (or both lack one).
+    if name_a.variant_tokens != name_b.variant_tokens:
+        return False
+    return name_similarity(name_a.tokens, name_b.tokens) >= min_score
+
+
+def _stable_hash(value: str, *, signed=False) -> int:
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=signed)
+
+
+def lsh_band_keys(tokens) -> list[int]:
+    """MinHash the token set and hash each band of the signature to one (bigint) bucket key."""
+    hashes = [_stable_hash(token) for token in set(tokens)]
+    signature = [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+    keys = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        keys.append(_stable_hash(f"{band}:{','.join(map(str, rows))}", signed=True))
+    return keys
+
+
+def duplicate_key_for(product):
+    """Unsaved ProductDuplicateKey for a product, or None when its name has no comparable tokens."""
+    from product.models import ProductDuplicateKey
+
+    name = normalize_name(product.name)
+    if not name.tokens:
+        return None
+    return ProductDuplicateKey(
+        product_id=product.pk,
+        tokens=list(name.tokens),
+        variant_key=" ".join(sorted(name.variant_tokens)),
+        base_key=" ".join(name.base_key),
+        lsh_bands=lsh_band_keys(name.tokens),
+    )
+
+
+def refresh_duplicate_index(product_ids) -> None:
+    """
+    Recompute the keys of the given products and their candidate pairs. Candidates
+    are every indexed product with the same variant key that shares the exact base
+    key or any LSH band, found with one query per batch; each pair is stored with its
+    token-overlap score so suggestions can filter by any min_score in SQL.
+    """
+    from product.models import Product, ProductDuplicateCandidate, ProductDuplicateKey
+
+    product_ids = list({int(pid) for pid in product_ids if pid is not None})
+    for start in range(0, len(product_ids), BATCH_SIZE):
+        batch_ids = product_ids[start:start + BATCH_SIZE]
+        keys = [
+            key for key in (
+                duplicate_key_for(product)
+                for product in Product.objects.filter(pk__in=batch_ids).only("pk", "name")
+            )
+            if key is not None
+        ]
+        with transaction.atomic():
+            ProductDuplicateCandidate.objects.filter(
+                Q(product_low_id__in=batch_ids) | Q(product_high_id__in=batch_ids)
+            ).delete()
+            ProductDuplicateKey.objects.filter(product_id__in=batch_ids).delete()
+            ProductDuplicateKey.objects.bulk_create(keys)
+            if keys:
+                ProductDuplicateCandidate.objects.bulk_create(
+                    _candidate_pairs(keys), batch_size=1000, ignore_conflicts=True,
+                )
+
+
+def _candidate_pairs(keys):
+    from product.models import ProductDuplicateCandidate, ProductDuplicateKey
+
+    others = ProductDuplicateKey.objects.filter(
+        variant_key__in={key.variant_key for key in keys},
+    ).filter(
+        Q(base_key__in={key.base_key for key in keys})
+        | Q(lsh_bands__overlap=sorted({band for key in keys for band in key.lsh_bands}))
+    ).values_list("product_id", "tokens", "variant_key", "base_key", "lsh_bands")
+
+    by_base = {}
+    by_band = {}
+    tokens_by_id = {}
+    for product_id, tokens, variant_key, base_key, lsh_bands in others:
+        tokens_by_id[product_id] = tokens
+        by_base.setdefault((variant_key, base_key), set()).add(product_id)
+        for band in lsh_bands:
+            by_band.setdefault((variant_key, band), set()).add(product_id)
+
+    pairs = {}
+    for key in keys:
+        matches = set(by_base.get((key.variant_key, key.base_key), ()))
+        for band in key.lsh_bands:
+            matches |= by_band.get((key.variant_key, band), set())
+        matches.discard(key.product_id)
+        for other_id in matches:
+            score = name_similarity(key.tokens, tokens_by_id[other_id])
+            if score > 0:
+                pairs[tuple(sorted((key.product_id, other_id)))] = score
+    return [
+        ProductDuplicateCandidate(product_low_id=low, product_high_id=high, score=score)
+        for (low, high), score in pairs.items()
+    ]
+
+
+def rebuild_all_duplicate_index() -> int:
+    """Full rebuild (initial population / repair). Returns the number of products processed."""
+    from product.models import Product, ProductDuplicateCandidate, ProductDuplicateKey
+
+    product_ids = list(Product.objects.order_by("pk").values_list("pk", flat=True))
+    with transaction.atomic():
+        ProductDuplicateCandidate.objects.all().delete()
+        ProductDuplicateKey.objects.all().delete()
+        refresh_duplicate_index(product_ids)
+    return len(product_ids)
+
+
+class MergeCandidatePage(NamedTuple):
+    # Groups before dismissed combinations are dropped (drives the selection fallback).
+    found: int
+    # Groups left after dropping dismissed combinations, across all pages.
+    total: int
+    # This page's groups as sorted product-id lists, ordered by their first name.
+    groups: list[list[int]]
+
+
+def _merge_groups_sql(pairs_sql: str, product_table: str, ignored_table: str) -> str:
+    # Connected components of the candidate pairs: every node is labelled with the
+    # smallest id it reaches (UNION stops the recursion once no new label appears).
+    # Groups are named by their sorted-id signature so IgnoredMergeSuggestion is
+    # matched in SQL, and only the requested page is returned.
+    return f"""
+        WITH RECURSIVE pairs (low, high) AS ({pairs_sql}),
+        edges (node, other) AS (
+            SELECT low, high FROM pairs UNION ALL SELECT high, low FROM pairs
+        ),
+        reach (node, root) AS (
+            SELECT node, node FROM edges
+            UNION
+            SELECT edges.other, reach.root FROM reach JOIN edges ON edges.node = reach.node
+        ),
+        components AS (
+            SELECT node, MIN(root) AS root FROM reach GROUP BY node
+        ),
+        merge_groups AS (
+            SELECT components.root,
+                   array_agg(components.node ORDER BY components.node) AS ids,
+                   string_agg(components.node::text, ',' ORDER BY components.node) AS signature,
+                   MIN(LOWER(p.name)) AS sort_name
+            FROM components JOIN {product_table} p ON p.id = components.node
+            GROUP BY components.root
+            HAVING COUNT(*) >= 2
+        ),
+        labelled AS (
+            SELECT merge_groups.*, EXISTS (
+                SELECT 1 FROM {ignored_table} ignored
+                WHERE ignored.product_ids_signature = merge_groups.signature
+            ) AS dismissed
+            FROM merge_groups
+        )
+        SELECT totals.found, totals.total, page.ids
+        FROM (
+            SELECT COUNT(*) AS found, COUNT(*) FILTER (WHERE NOT dismissed) AS total FROM labelled
+        ) totals
+        LEFT JOIN LATERAL (
+            SELECT ids, sort_name, root FROM labelled
+            WHERE NOT dismissed
+            ORDER BY sort_name, root
+            LIMIT %s OFFSET %s
+        ) page ON TRUE
+        ORDER BY page.sort_name, page.root
+    """
+
+
+def merge_candidate_page(*, min_score=DEFAULT_MIN_SCORE, within=None, offset=0, limit=None) -> MergeCandidatePage:
+    """
+    One page of merge suggestions in a single statement: connected components of
+    the stored candidate pairs scoring at least min_score, minus the combinations
+    dismissed as "Not duplicates", ordered by each group's first name (lowercased).
+    `within` (ids or a pk subquery) restricts both ends of every pair, for
+    selection and search scans.
+    """
+    from product.models import IgnoredMergeSuggestion, Product, ProductDuplicateCandidate
+
+    pairs = ProductDuplicateCandidate.objects.filter(score__gte=min_score)
+    if within is not None:
+        pairs = pairs.filter(product_low_id__in=within, product_high_id__in=within)
+    pairs_sql, pairs_params = pairs.values_list("product_low_id", "product_high_id").query.sql_with_params()
+
+    sql = _merge_groups_sql(
+        pairs_sql,
+        connection.ops.quote_name(Product._meta.db_table),
+        connection.ops.quote_name(IgnoredMergeSuggestion._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*pairs_params, limit, offset])
+        rows = cursor.fetchall()
+    found, total = rows[0][0], rows[0][1]
+    return MergeCandidatePage(found, total, [list(ids) for _, _, ids in rows if ids is not None])
+
+
+def merge_candidate_groups(*, min_score=DEFAULT_MIN_SCORE, within=None) -> list[list[int]]:
+    """Every merge suggestion group (sorted product-id lists); see merge_candidate_page()."""
+    return merge_candidate_page(min_score=min_score, within=within).groups
+
+
+def group_signature(product_ids) -> str:
+    """Sorted comma-separated ids, as stored in IgnoredMergeSuggestion.product_ids_signature."""
+    return ",".join(str(pid) for pid in sorted(product_ids))
+
+
+def dismissed_signatures(groups) -> set[str]:
+    """Signatures among `groups` that the user marked as "Not duplicates" (one indexed lookup)."""
+    from product.models import IgnoredMergeSuggestion
+
+    signatures = [group_signature(ids) for ids in groups]
+    if not signatures:
+        return set()
+    return set(
+        IgnoredMergeSuggestion.objects.filter(product_ids_signature__in=signatures)
+        .values_list("product_ids_signature", flat=True)
+    )
@@ -0,0 +1,59 @@
+# distributorplatform/app/product/home_catalog.py
+# Cached home-page catalog data (featured products + bounded category carousels).
+from __future__ import annotations
+
+from django.db.models import Prefetch
+
+from core.cache import VersionedCache
+
+from .visibility import visible_category_ids, visible_products
+
+FEATURED_PRODUCT_LIMIT = 6
+DEFAULT_CATEGORY_PRODUCT_LIMIT = 4
+
+# Keyed by user_group_fingerprint(); invalidated by product.signals on catalog changes
+# and on SiteSetting saves (the per-category limit lives there).
+home_catalog_cache = VersionedCache('home_catalog')
+
+
+def category_product_limit() -> int:
+    from core.models import SiteSetting
+
+    limit = SiteSetting.objects.values_list('homepage_category_product_limit', flat=True).first()
+    # No SiteSetting row yet: the field default. 0 turns the category sections off.
+    return DEFAULT_CATEGORY_PRODUCT_LIMIT if limit is None else limit
+
+
+def build_home_catalog(user) -> dict:
+    """
+    Featured products and the visible categories, each with its newest N products.
+    The sliced Prefetch is run by Django as a single query using
+    ROW_NUMBER() OVER (PARTITION BY category), so only N rows per category are loaded.
+    """
+    from product.models import Category, Product
+
+    featured_products = list(
+        visible_products(user, Product.objects.filter(is_featured=True))
+        .select_related('featured_image').order_by('-created_at')[:FEATURED_PRODUCT_LIMIT]
+    )
+
+    if user.is_authenticated:
+        # Every product in a category assigned to the user's groups is visible to them.
+        carousel_products_qs = Product.objects.all()
+    else:
+        carousel_products_qs = Product.objects.filter(members_only=False)
+    limit = category_product_limit()
+    categories_with_products = list(
+        Category.objects.filter(pk__in=visible_category_ids(user))
+        .order_by('display_order', 'name')
+        .prefetch_related(
+            Prefetch(
+                'products',
+                queryset=carousel_products_qs.select_related('featured_image').order_by('-created_at', 'pk')[:limit],
+            )
+        )
+    ) if limit else []
+    return {
+        'featured_products': featured_products,
+        'categories_with_products': categories_with_products,
+    }
@@ -0,0 +1,65 @@
+# distributorplatform/app/product/management/commands/benchmark_name_normalization.py
+
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from product.normalize import clear_normalize_cache, normalize_cache_info, normalize_name
+
+_WORDS = (
+    'Botox', 'Allergan', 'Wondertox', 'MOUNJARO®', 'KwikPen®', 'Restylane', 'Lyft', 'Kysse',
+    'HYALGAN', '(Fidia)', 'Sculptra', 'Vial', '1 Stk', '100u', '100 Units', '10mg', '15 MG',
+    '2.5 mg/ml', '5ml', '10 pcs', '-', '|', '护手霜', '旺德',
+)
+
+
+def _separate_passes(name):
+    """The pre-consolidation pipeline: three independent normalizations with inline patterns."""
+    base = re.sub(r"(\d+)\s*(u|unit|units)\b", r"\1unit", str(name).split("|", 1)[0], flags=re.IGNORECASE)
+    tokens = re.sub(r"[^a-zA-Z0-9\s]", " ", base).lower().split()
+    variant_pattern = (
+        r"\b(\d+(?:\.\d+)?)\s*(mg|g|ml|mcg|µg|ug|iu|u|unit|units|stk|st|pen|pack|pcs|pc|tablet|tab|capsule|cap|vial|dose|mg/ml)\b"
+    )
+    base = re.sub(r"(\d+)\s*(u|unit|units)\b", r"\1unit", str(name).split("|", 1)[0], flags=re.IGNORECASE)
+    variants = frozenset(
+        f"{m.group(1)}{m.group(2).lower()}" for m in re.finditer(variant_pattern, base, flags=re.IGNORECASE)
+    )
+    base = re.sub(r"(\d+)\s*(u|unit|units)\b", r"\1unit", str(name).split("|", 1)[0], flags=re.IGNORECASE)
+    base = re.sub(variant_pattern, " ", base, flags=re.IGNORECASE)
+    base_key = tuple(sorted(re.sub(r"[^a-zA-Z0-9\s]", " ", base).lower().split()))
+    return tokens, variants, base_key
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark for product name normalization (separate passes vs product.normalize, cold and cached).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--names', type=int, default=100_000, help='Names to normalize per run.')
+        parser.add_argument('--distinct', type=int, default=10_000, help='Distinct names among them (imports repeat names).')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        distinct = [
+            ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(2, 7)))
+            for _ in range(max(options['distinct'], 1))
+        ]
+        names = [rng.choice(distinct) for _ in range(options['names'])]
+
+        def timed(label, fn):
+            start = time.perf_counter()
+            for name in names:
+                fn(name)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{label:<28} {elapsed:8.3f}s  {len(names) / elapsed:>12,.0f} names/s')
+
+        timed('separate passes', _separate_passes)
+        clear_normalize_cache()
+        timed('normalize_name (cold)', normalize_name)
+        timed('normalize_name (cached)', normalize_name)
+        info = normalize_cache_info()
+        self.stdout.write(self.style.SUCCESS(
+            f'Normalized {len(names)} names ({len(distinct)} distinct); cache hits={info.hits} misses={info.misses}.'
+        ))
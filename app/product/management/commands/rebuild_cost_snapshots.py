@@ -0,0 +1,19 @@
+# distributorplatform/app/product/management/commands/rebuild_cost_snapshots.py
+
+from django.core.management.base import BaseCommand
+
+from product.cost_snapshot import rebuild_all_cost_snapshots
+from product.models import ProductCostSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the ProductCostSnapshot table from price matrices, invoices and quotations.'
+
+    def handle(self, *args, **options):
+        product_count = rebuild_all_cost_snapshots()
+        base_count = ProductCostSnapshot.objects.filter(supplier__isnull=True).count()
+        supplier_count = ProductCostSnapshot.objects.filter(supplier__isnull=False).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt cost snapshots for {product_count} products: '
+            f'{base_count} base rows, {supplier_count} supplier rows.'
+        ))
@@ -0,0 +1,13 @@
+# distributorplatform/app/product/management/commands/rebuild_duplicate_index.py
+
+from django.core.management.base import BaseCommand
+
+from product.duplicates import rebuild_all_duplicate_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the duplicate-product index (name keys, LSH bands and candidate pairs) for every product.'
+
+    def handle(self, *args, **options):
+        product_count = rebuild_all_duplicate_index()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt duplicate index for {product_count} products.'))
@@ -0,0 +1,18 @@
+# distributorplatform/app/product/management/commands/rebuild_product_visibility.py
+
+from django.core.management.base import BaseCommand
+
+from product.models import ProductVisibility
+from product.visibility import rebuild_all_visibility
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the ProductVisibility table from categories, user groups and members_only flags.'
+
+    def handle(self, *args, **options):
+        rebuild_all_visibility()
+        public_count = ProductVisibility.objects.filter(user_group__isnull=True).count()
+        group_count = ProductVisibility.objects.filter(user_group__isnull=False).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt product visibility: {group_count} group rows, {public_count} public rows.'
+        ))
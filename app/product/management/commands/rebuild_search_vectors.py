@@ -0,0 +1,13 @@
+# distributorplatform/app/product/management/commands/rebuild_search_vectors.py
+
+from django.core.management.base import BaseCommand
+
+from product.search import rebuild_all_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds Product.search_vector (full-text search document) for every product.'
+
+    def handle(self, *args, **options):
+        product_count = rebuild_all_search_vectors()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search vectors for {product_count} products.'))
@@ -0,0 +1,48 @@
+# distributorplatform/app/product/management/commands/reconcile_saved_base_costs.py
+# Run on a schedule (e.g. cron every minute) to keep Product.saved_base_cost in step with supplier costs.
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from product.models import Product
+from product.pricing_sync import (
+    pop_dirty_products,
+    queue_dirty_products,
+    reconcile_saved_base_costs_for_products,
+)
+
+
+class Command(BaseCommand):
+    help = 'Reconciles saved_base_cost for products whose cost inputs changed (queued in Redis).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Reconcile every product instead of draining the dirty set.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        processed = 0
+
+        if options['all']:
+            product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+            for start in range(0, len(product_ids), batch_size):
+                with transaction.atomic():
+                    processed += reconcile_saved_base_costs_for_products(product_ids[start:start + batch_size])
+        else:
+            while True:
+                batch = pop_dirty_products(batch_size)
+                if not batch:
+                    break
+                try:
+                    with transaction.atomic():
+                        processed += reconcile_saved_base_costs_for_products(batch)
+                except Exception:
+                    # Put the batch back so the next scheduled run retries it.
+                    queue_dirty_products(batch)
+                    raise
+
+        self.stdout.write(self.style.SUCCESS(f'Reconciled saved_base_cost for {processed} products.'))
@@ -0,0 +1,110 @@
+# distributorplatform/app/product/matching.py
+# Resolve imported (sku, name) pairs to catalog products with pg_trgm, many rows per query.
+from __future__ import annotations
+
+from django.db import connection
+
+from .normalize import normalize_name
+
+# Minimum word_similarity(imported name, product name or alias) for a fuzzy match;
+# the same value as pg_trgm's default word_similarity_threshold used by `<%`.
+FUZZY_MATCH_THRESHOLD = 0.6
+# Four bind parameters per row keeps each statement far below Postgres' 65535 limit.
+RESOLVE_CHUNK_SIZE = 1000
+
+MATCH_SKU = 'matched_sku'
+MATCH_NAME_EXACT = 'matched_name_exact'
+MATCH_NAME_FUZZY = 'matched_name_fuzzy'
+MATCH_NEW = 'new'
+
+
+def normalize_name_for_match(value):
+    """(normalized name, tokens) for fuzzy matching; see product.normalize.normalize_name."""
+    normalized = normalize_name(value)
+    return normalized.normalized, list(normalized.tokens)
+
+
+def _like_exact(value: str) -> str:
+    """ILIKE pattern matching `value` exactly (case-insensitive); served by the trigram indexes."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _resolve_sql(table: str, row_count: int) -> str:
+    values = ', '.join(['(%s::int, %s::text, %s::text, %s::text)'] * row_count)
+    # Per input row, the best of: exact SKU, exact name, then the closest name/alias by
+    # word_similarity. `<%` narrows fuzzy candidates through the GIN trigram indexes.
+    return f"""
+        WITH wanted (idx, sku_pattern, name_pattern, norm) AS (VALUES {values})
+        SELECT wanted.idx, best.id, best.match_type
+        FROM wanted
+        LEFT JOIN LATERAL (
+            SELECT ranked.id, ranked.match_type
+            FROM (
+                (SELECT p.id, '{MATCH_SKU}' AS match_type, 3 AS tier, 1.0::real AS score
+                 FROM {table} p
+                 WHERE wanted.sku_pattern <> '' AND p.sku ILIKE wanted.sku_pattern
+                 ORDER BY p.id LIMIT 1)
+                UNION ALL
+                (SELECT p.id, '{MATCH_NAME_EXACT}', 2, 1.0::real
+                 FROM {table} p
+                 WHERE wanted.name_pattern <> '' AND p.name ILIKE wanted.name_pattern
+                 ORDER BY p.id LIMIT 1)
+                UNION ALL
+                (SELECT p.id, '{MATCH_NAME_FUZZY}', 1,
+                        GREATEST(word_similarity(wanted.norm, p.name), word_similarity(wanted.norm, p.alias_name))
+                 FROM {table} p
+                 WHERE wanted.norm <> '' AND (wanted.norm <%% p.name OR wanted.norm <%% p.alias_name)
+                 ORDER BY 4 DESC, p.id LIMIT 1)
+            ) ranked
+            WHERE ranked.score >= %s
+            ORDER BY ranked.tier DESC
+            LIMIT 1
+        ) best ON TRUE
+    """
+
+
+def resolve_products(pairs, *, allow_fuzzy=True) -> list[tuple]:
+    """
+    Batch form of resolve_product(): one (product, match_type) per input (sku, name)
+    pair, in input order. Every pair is resolved in a single statement (per 1000
+    distinct pairs), plus one query to load the matched products.
+    """
+    from product.models import Product
+
+    pairs = [((sku or '').strip(), (name or '').strip()) for sku, name in pairs]
+    distinct_pairs = list(dict.fromkeys(pairs))
+    params_by_pair = {}
+    for sku, name in distinct_pairs:
+        norm = normalize_name_for_match(name)[0] if allow_fuzzy and name else ''
+        # A row without a name can still match on SKU, but never by name.
+        params_by_pair[(sku, name)] = (_like_exact(sku), _like_exact(name), norm)
+
+    matches = {}
+    table = connection.ops.quote_name(Product._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(distinct_pairs), RESOLVE_CHUNK_SIZE):
+            chunk = distinct_pairs[start:start + RESOLVE_CHUNK_SIZE]
+            params = []
+            for idx, pair in enumerate(chunk):
+                params.extend((idx, *params_by_pair[pair]))
+            params.append(FUZZY_MATCH_THRESHOLD)
+            cursor.execute(_resolve_sql(table, len(chunk)), params)
+            for idx, product_id, match_type in cursor.fetchall():
+                if product_id is not None:
+                    matches[chunk[idx]] = (product_id, match_type)
+
+    products = Product.objects.in_bulk({product_id for product_id, _ in matches.values()})
+    results = []
+    for pair in pairs:
+        product_id, match_type = matches.get(pair, (None, MATCH_NEW))
+        product = products.get(product_id)
+        results.append((product, match_type) if product is not None else (None, MATCH_NEW))
+    return results
+
+
+def resolve_product(sku, name, *, allow_fuzzy=True):
+    """
+    Resolve product by SKU (exact) or by name (exact, then trigram similarity).
+    Returns (product, match_type) or (None, 'new').
+    """
+    return resolve_products([(sku, name)], allow_fuzzy=allow_fuzzy)[0]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_product_visibility(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    ProductVisibility = apps.get_model('product', 'ProductVisibility')
+    UserGroup = apps.get_model('user', 'UserGroup')
+
+    group_categories = UserGroup.product_categories.through.objects.values_list('usergroup_id', 'category_id')
+    products_by_category = {}
+    for category_id, product_id in Product.categories.through.objects.values_list('category_id', 'product_id'):
+        products_by_category.setdefault(category_id, []).append(product_id)
+    pairs = {
+        (group_id, product_id)
+        for group_id, category_id in group_categories
+        for product_id in products_by_category.get(category_id, ())
+    }
+    rows = [ProductVisibility(user_group_id=g, product_id=p) for g, p in pairs]
+    rows.extend(
+        ProductVisibility(user_group_id=None, product_id=pid)
+        for pid in Product.objects.filter(members_only=False).values_list('pk', flat=True)
+    )
+    ProductVisibility.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_usergroup_commission_type'),
+        ('product', '0013_product_display_order_zero_to_ninety_nine'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVisibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibility', to='product.product')),
+                ('user_group', models.ForeignKey(blank=True, help_text='Null marks the public bucket (visible to guests).', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='product_visibility', to='user.usergroup')),
+            ],
+            options={
+                'verbose_name': 'Product visibility',
+                'verbose_name_plural': 'Product visibility',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productvisibility',
+            constraint=models.UniqueConstraint(fields=('user_group', 'product'), name='uniq_product_visibility_group'),
+        ),
+        migrations.AddConstraint(
+            model_name='productvisibility',
+            constraint=models.UniqueConstraint(condition=models.Q(('user_group__isnull', True)), fields=('product',), name='uniq_product_visibility_public'),
+        ),
+        migrations.RunPython(populate_product_visibility, migrations.RunPython.noop),
+    ]
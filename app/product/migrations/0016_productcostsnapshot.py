@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_cost_snapshots(apps, schema_editor):
+    # The landed-cost rules live in inventory.supplier_pricing; reuse them rather
+    # than duplicating them against historical models.
+    from product.cost_snapshot import rebuild_all_cost_snapshots
+
+    rebuild_all_cost_snapshots()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_inventorybatch_batch_number_optional'),
+        ('sales', '0002_invoiceitem_source_currency'),
+        ('product', '0015_product_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCostSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cost', models.DecimalField(decimal_places=4, max_digits=14)),
+                ('source', models.CharField(choices=[('matrix', 'Price matrix'), ('invoice', 'Invoice'), ('quotation', 'Quotation')], max_length=10)),
+                ('cost_date', models.DateField(blank=True, null=True)),
+                ('source_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_snapshots', to='product.product')),
+                ('supplier', models.ForeignKey(blank=True, help_text='NULL for the product-level base cost row.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventory.supplier')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='productcostsnapshot',
+            constraint=models.UniqueConstraint(fields=('product', 'supplier'), name='uniq_cost_snapshot_supplier'),
+        ),
+        migrations.AddConstraint(
+            model_name='productcostsnapshot',
+            constraint=models.UniqueConstraint(condition=models.Q(('supplier__isnull', True)), fields=('product',), name='uniq_cost_snapshot_base'),
+        ),
+        migrations.RunPython(populate_cost_snapshots, migrations.RunPython.noop),
+    ]
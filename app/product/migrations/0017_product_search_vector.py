@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:03
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def populate_search_vectors(apps, schema_editor):
+    # Same document builder as the save signal, so existing rows index identically.
+    from product.search import rebuild_all_search_vectors
+
+    rebuild_all_search_vectors()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0016_productcostsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
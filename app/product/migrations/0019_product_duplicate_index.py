@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:10
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_duplicate_index(apps, schema_editor):
+    # Same key builder as the save signal, so existing products index identically.
+    from product.duplicates import rebuild_all_duplicate_index
+
+    rebuild_all_duplicate_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0018_product_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductDuplicateKey',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='duplicate_key', serialize=False, to='product.product')),
+                ('tokens', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), default=list, size=None)),
+                ('variant_key', models.TextField(blank=True, default='')),
+                ('base_key', models.TextField(blank=True, default='')),
+                ('lsh_bands', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, size=None)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['variant_key', 'base_key'], name='product_dup_key_idx'), django.contrib.postgres.indexes.GinIndex(fields=['lsh_bands'], name='product_dup_lsh_bands_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDuplicateCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('product_high', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.product')),
+                ('product_low', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['score'], name='product_dup_pair_score_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productduplicatecandidate',
+            constraint=models.UniqueConstraint(fields=('product_low', 'product_high'), name='uniq_product_duplicate_pair'),
+        ),
+        migrations.RunPython(populate_duplicate_index, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
 # distributorplatform/app/product/models.py
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.urls import reverse
 from tinymce.models import HTMLField
@@ -202,12 +205,24 @@ class Product(models.Model):
         blank=True,
         help_text="Suppliers who provide this product."
     )
+    # Maintained by product.signals / product.search from name, alias, SKU and description.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         # --- UPDATE ORDERING ---
         # Sort by display_order first (ascending), then by creation date (newest first)
         ordering = ['display_order', '-created_at']
         # -----------------------
+        indexes = [
+            # Back the product_list keyset cursor (display_order, name, id).
+            models.Index(fields=['display_order', 'name'], name='product_display_name_idx'),
+            models.Index(fields=['is_promotion', 'display_order'], name='product_promo_display_idx'),
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            # pg_trgm: fuzzy and case-insensitive exact lookups in product.matching.
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='product_name_trgm_idx'),
+            GinIndex(fields=['alias_name'], opclasses=['gin_trgm_ops'], name='product_alias_trgm_idx'),
+            GinIndex(fields=['sku'], opclasses=['gin_trgm_ops'], name='product_sku_trgm_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -246,8 +261,9 @@ class Product(models.Model):
         """
         Base cost used for pricing. If the user pinned a supplier in Set Product
         Pricing (saved_base_cost_supplier), saved_base_cost is kept in sync with
-        that supplier's quotations. Otherwise the latest landed cost from the most
-        recent Quotation Item is used so "Latest Quoted Cost" follows quote changes.
+        that supplier's quotations. Otherwise the product-level ProductCostSnapshot
+        row (latest matrix price, then invoice landed cost, then quotation landed
+        cost) is used, so "Latest Quoted Cost" follows cost changes.
         """
         if (
             self.saved_base_cost is not None
@@ -255,71 +271,15 @@ class Product(models.Model):
         ):
             return self.saved_base_cost
 
-        from inventory.supplier_pricing import latest_matrix_unit_price_for_product
-
-        matrix_cost = latest_matrix_unit_price_for_product(self)
-        if matrix_cost is not None:
-            return matrix_cost
-
-        from inventory.supplier_pricing import latest_invoice_landed_cost_for_product
-
-        invoice_cost = latest_invoice_landed_cost_for_product(self)
-        if invoice_cost is not None:
-            return invoice_cost
-
-        from decimal import Decimal
-
-        from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
-
-        from inventory.models import QuotationItem
-
-        # Check if data was prefetched by an API view
-        if hasattr(self, 'latest_quotation_items'):
-            latest_item = self.latest_quotation_items[0] if self.latest_quotation_items else None
-            if latest_item:
-                return latest_item.landed_cost_per_unit
-            return None
-
-        # Use a correlated subquery to get the quotation total inline — avoids
-        # prefetch_related('quotation__items') which loads all sibling rows.
-        quotation_total_sq = (
-            QuotationItem.objects.filter(quotation_id=OuterRef('quotation_id'))
-            .values('quotation_id')
-            .annotate(
-                total=Sum(
-                    ExpressionWrapper(
-                        F('quantity') * F('quoted_price'),
-                        output_field=DecimalField(max_digits=20, decimal_places=4),
-                    )
-                )
-            )
-            .values('total')
-        )
-        latest_item = (
-            QuotationItem.objects.filter(product=self)
-            .select_related('quotation')
-            .annotate(
-                _quotation_total=Subquery(
-                    quotation_total_sq,
-                    output_field=DecimalField(max_digits=20, decimal_places=4),
-                )
-            )
-            .order_by('-quotation__date_quoted', '-pk')
+        # Check if the snapshot was prefetched by a list view (base_cost_snapshot_prefetch)
+        if hasattr(self, 'base_cost_snapshots'):
+            return self.base_cost_snapshots[0].cost if self.base_cost_snapshots else None
+
+        return (
+            ProductCostSnapshot.objects.filter(product_id=self.pk, supplier__isnull=True)
+            .values_list('cost', flat=True)
             .first()
         )
-        if latest_item and latest_item.quantity and latest_item.quoted_price:
-            qty = Decimal(str(latest_item.quantity))
-            price = latest_item.quoted_price
-            transport = latest_item.quotation.transportation_cost or Decimal('0')
-            quotation_total = latest_item._quotation_total or Decimal('0')
-            if quotation_total > 0 and transport > 0:
-                item_total = qty * price
-                landed = (item_total + transport * (item_total / quotation_total)) / qty
-            else:
-                landed = price
-            return landed
-
-        return None
 
     def get_absolute_url(self):
         """
@@ -414,3 +374,152 @@ class IgnoredMergeSuggestion(models.Model):
 
     def __str__(self):
         return f"Dismissed: {self.product_ids_signature}"
+
+
+class ProductDuplicateKey(models.Model):
+    """
+    Normalized name data for duplicate detection, one row per product with a
+    comparable name: tokens, variant (strength/dose) key, base-name key and the
+    MinHash LSH band keys. Maintained by product.duplicates from the save signal.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='duplicate_key',
+    )
+    tokens = ArrayField(models.TextField(), default=list)
+    variant_key = models.TextField(blank=True, default='')
+    base_key = models.TextField(blank=True, default='')
+    lsh_bands = ArrayField(models.BigIntegerField(), default=list)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['variant_key', 'base_key'], name='product_dup_key_idx'),
+            GinIndex(fields=['lsh_bands'], name='product_dup_lsh_bands_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.base_key} [{self.variant_key}]"
+
+
+class ProductDuplicateCandidate(models.Model):
+    """
+    Precomputed duplicate candidate pair (product_low < product_high) with its
+    token-overlap score. Merge suggestions are the connected components of the
+    pairs at or above the requested min_score.
+    """
+    product_low = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    product_high = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product_low', 'product_high'],
+                name='uniq_product_duplicate_pair',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['score'], name='product_dup_pair_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_low_id} ~ {self.product_high_id} ({self.score:.2f})"
+
+
+class ProductVisibility(models.Model):
+    """
+    Materialized catalog ACL: one row per (UserGroup, Product) the group can see
+    through its product categories, plus one public-bucket row (user_group NULL)
+    per non members-only product. Maintained by product.visibility via signals so
+    catalog views filter with an indexed semi-join instead of a DISTINCT join.
+    """
+    user_group = models.ForeignKey(
+        'user.UserGroup',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='product_visibility',
+        help_text="Null marks the public bucket (visible to guests).",
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='visibility',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_group', 'product'],
+                name='uniq_product_visibility_group',
+            ),
+            models.UniqueConstraint(
+                fields=['product'],
+                condition=models.Q(user_group__isnull=True),
+                name='uniq_product_visibility_public',
+            ),
+        ]
+        verbose_name = "Product visibility"
+        verbose_name_plural = "Product visibility"
+
+    def __str__(self):
+        bucket = self.user_group_id or 'public'
+        return f"{bucket}: {self.product_id}"
+
+
+class ProductCostSnapshot(models.Model):
+    """
+    Denormalized landed cost per product (supplier NULL: the unpinned base_cost
+    fallback) and per (product, supplier) (matrix > invoice > quotation winner).
+    Maintained by product.cost_snapshot from signals on the cost sources.
+    """
+
+    class Source(models.TextChoices):
+        MATRIX = 'matrix', 'Price matrix'
+        INVOICE = 'invoice', 'Invoice'
+        QUOTATION = 'quotation', 'Quotation'
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='cost_snapshots',
+    )
+    supplier = models.ForeignKey(
+        'inventory.Supplier',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="NULL for the product-level base cost row.",
+    )
+    cost = models.DecimalField(max_digits=14, decimal_places=4)
+    source = models.CharField(max_length=10, choices=Source.choices)
+    cost_date = models.DateField(null=True, blank=True)
+    source_updated_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'supplier'],
+                name='uniq_cost_snapshot_supplier',
+            ),
+            models.UniqueConstraint(
+                fields=['product'],
+                condition=models.Q(supplier__isnull=True),
+                name='uniq_cost_snapshot_base',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} / {self.supplier_id or 'base'}: {self.cost} ({self.source})"
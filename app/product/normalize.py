@@ -0,0 +1,77 @@
+# distributorplatform/app/product/normalize.py
+# Shared product-name normalization: every derived form in one pass, memoized per raw name.
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+# Imports and duplicate scans normalize the same names over and over; 50k entries
+# covers the catalog plus a large import file at a few MB.
+NORMALIZE_CACHE_SIZE = 50_000
+
+# 100u, 100U, 100 u, 100unit, 100 units, 100 Units  ->  "100unit"
+_UNIT_RE = re.compile(r"(\d+)\s*(u|unit|units)\b", re.IGNORECASE)
+# Strength/dose/pack-size tokens that distinguish product variants (e.g. 10mg vs 15mg).
+_VARIANT_RE = re.compile(
+    r"\b(\d+(?:\.\d+)?)\s*(mg|g|ml|mcg|µg|ug|iu|u|unit|units|stk|st|pen|pack|pcs|pc|tablet|tab|capsule|cap|vial|dose|mg/ml)\b",
+    re.IGNORECASE,
+)
+_SYMBOL_RE = re.compile(r"[^a-zA-Z0-9\s]")
+_UNIT_ALIASES = frozenset({"u", "unit", "units"})
+
+
+class NormalizedName(NamedTuple):
+    normalized: str
+    # English-part tokens, lowercased, units folded ("100unit"), symbols stripped.
+    tokens: tuple[str, ...]
+    # Strength/dose tokens ("10mg", "100unit"); duplicates must share the same set.
+    variant_tokens: frozenset
+    # Sorted tokens with the variant tokens removed: the duplicate bucket key.
+    base_key: tuple[str, ...]
+
+
+_EMPTY = NormalizedName("", (), frozenset(), ())
+
+
+def normalize_name(value) -> NormalizedName:
+    """
+    Normalize a product name for matching and duplicate detection:
+    - Use only the part before '|' (English name)
+    - Normalise unit notations so '100u', '100 Unit' and '100Units' compare the same
+    - Strip special characters, lowercase and collapse whitespace
+    Returns every derived form at once; results are cached by raw name.
+    """
+    if not value:
+        return _EMPTY
+    return _normalize(str(value))
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize(name: str) -> NormalizedName:
+    folded = _UNIT_RE.sub(r"\1unit", name.split("|", 1)[0])
+
+    variant_tokens = set()
+
+    def take_variant(match):
+        unit = match.group(2).lower()
+        variant_tokens.add(f"{match.group(1)}{'unit' if unit in _UNIT_ALIASES else unit}")
+        return " "
+
+    without_variants = _VARIANT_RE.sub(take_variant, folded)
+    tokens = tuple(_SYMBOL_RE.sub(" ", folded).lower().split())
+    return NormalizedName(
+        normalized=" ".join(tokens),
+        tokens=tokens,
+        variant_tokens=frozenset(variant_tokens),
+        base_key=tuple(sorted(_SYMBOL_RE.sub(" ", without_variants).lower().split())),
+    )
+
+
+def normalize_cache_info():
+    """functools cache statistics (hits, misses, maxsize, currsize) for diagnostics and benchmarks."""
+    return _normalize.cache_info()
+
+
+def clear_normalize_cache() -> None:
+    _normalize.cache_clear()
@@ -0,0 +1,51 @@
+# distributorplatform/app/product/pagination.py
+# Keyset (cursor) pagination for the public product list.
+from __future__ import annotations
+
+import base64
+import json
+
+from django.db.models import Q
+
+KEYSET_ORDERING = ('display_order', 'name', 'id')
+
+
+def encode_cursor(product) -> str:
+    """Opaque URL-safe cursor pointing just after the given product."""
+    payload = json.dumps([product.display_order, product.name, product.pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str | None):
+    """Return (display_order, name, id) or None for a missing or malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        display_order, name, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(display_order), str(name), int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_page(queryset, cursor: str | None, page_size: int):
+    """
+    One page of queryset ordered by (display_order, name, id), starting after cursor.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    Fetches page_size + 1 rows so no COUNT(*) is needed.
+    """
+    queryset = queryset.order_by(*KEYSET_ORDERING)
+    position = decode_cursor(cursor)
+    if position is not None:
+        display_order, name, pk = position
+        queryset = queryset.filter(
+            Q(display_order__gt=display_order)
+            | Q(display_order=display_order, name__gt=name)
+            | Q(display_order=display_order, name=name, id__gt=pk)
+        )
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1])
+    return items, next_cursor
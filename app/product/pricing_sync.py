@@ -1,8 +1,19 @@
 # Keep Product.saved_base_cost aligned with quotation landed costs.
 from __future__ import annotations
 
+import logging
 from decimal import Decimal
 
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache import redis_connection
+
+logger = logging.getLogger(__name__)
+
+# Redis set of product ids whose cost inputs changed since the last reconciliation run.
+DIRTY_PRODUCTS_KEY = 'pricing:saved_base_cost:dirty'
+
 
 def _as_decimal(value):
     if value is None:
@@ -12,37 +23,60 @@ def _as_decimal(value):
     return Decimal(str(value))
 
 
-def _latest_quotation_item_for_product(product_pk: int):
+CENT = Decimal("0.01")
+
+
+def _to_cents(value):
+    """Round like DecimalField(decimal_places=2) does on save, so comparisons match stored values."""
+    value = _as_decimal(value)
+    return value.quantize(CENT) if value is not None else None
+
+
+def latest_quotation_landed_costs(product_ids) -> dict[int, tuple[Decimal, int]]:
+    """
+    {product_id: (landed_cost, supplier_id)} for each product's latest quotation line
+    (by date quoted, then id), in one windowed query for any number of products.
+    """
     from inventory.models import QuotationItem
 
-    return (
-        QuotationItem.objects.filter(product_id=product_pk)
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    items = (
+        QuotationItem.objects.filter(product_id__in=product_ids)
+        .whole_quotations().with_landed_cost()
         .select_related("quotation")
-        .prefetch_related("quotation__items")
-        .order_by("-quotation__date_quoted", "-id")
-        .first()
+        .order_by("product_id", "-quotation__date_quoted", "-id")
+        .distinct("product_id")
     )
+    latest = {}
+    for item in items:
+        if item.product_id not in product_ids:
+            continue
+        landed = item.annotated_landed_cost_per_unit
+        if landed is not None:
+            latest[item.product_id] = (_to_cents(landed), item.quotation.supplier_id)
+    return latest
 
 
-def reconcile_saved_base_cost_with_quotations(product, supplier_costs: list[dict]) -> None:
+def saved_base_cost_updates(product, supplier_costs: list[dict], latest_quote) -> dict:
     """
-    Refresh saved_base_cost (and supplier pin) when quotation pricing changed but the
-    product row still holds an old snapshot. Called when opening the pricing modal (GET).
+    Field changes that bring saved_base_cost (and its supplier pin) in line with the
+    current supplier costs. `latest_quote` is (landed_cost, supplier_id) of the latest
+    quotation line or None. Pure: no queries, so callers can batch the inputs.
     """
-    from product.models import Product
-
     if not supplier_costs:
-        return
+        return {}
 
     cost_rows = []
     for sc in supplier_costs:
         sid = sc.get("supplier_id")
-        c = _as_decimal(sc.get("cost"))
+        c = _to_cents(sc.get("cost"))
         if sid is not None and c is not None:
             cost_rows.append({"supplier_id": int(sid), "cost": c})
 
     if not cost_rows:
-        return
+        return {}
 
     current_costs = {r["cost"] for r in cost_rows}
     updates = {}
@@ -54,12 +88,9 @@ def reconcile_saved_base_cost_with_quotations(product, supplier_costs: list[dict
         if match is not None:
             if product.saved_base_cost != match["cost"]:
                 updates["saved_base_cost"] = match["cost"]
-        else:
-            qi = _latest_quotation_item_for_product(product.pk)
-            if qi and qi.landed_cost_per_unit is not None:
-                landed = _as_decimal(qi.landed_cost_per_unit)
-                updates["saved_base_cost"] = landed
-                updates["saved_base_cost_supplier_id"] = qi.quotation.supplier_id
+        elif latest_quote is not None:
+            updates["saved_base_cost"] = latest_quote[0]
+            updates["saved_base_cost_supplier_id"] = latest_quote[1]
     elif product.saved_base_cost is not None:
         s = _as_decimal(product.saved_base_cost)
         if len(cost_rows) == 1:
@@ -72,21 +103,29 @@ def reconcile_saved_base_cost_with_quotations(product, supplier_costs: list[dict
             matches = [r for r in cost_rows if r["cost"] == s]
             if len(matches) == 1:
                 updates["saved_base_cost_supplier_id"] = matches[0]["supplier_id"]
-            elif s not in current_costs:
-                qi = _latest_quotation_item_for_product(product.pk)
-                if qi and qi.landed_cost_per_unit is not None:
-                    landed = _as_decimal(qi.landed_cost_per_unit)
-                    updates["saved_base_cost"] = landed
-                    updates["saved_base_cost_supplier_id"] = qi.quotation.supplier_id
+            elif s not in current_costs and latest_quote is not None:
+                updates["saved_base_cost"] = latest_quote[0]
+                updates["saved_base_cost_supplier_id"] = latest_quote[1]
 
     # No pinned supplier: saved_base_cost is a cache of the latest landed cost only.
-    if not sup_fk:
-        qi = _latest_quotation_item_for_product(product.pk)
-        if qi and qi.landed_cost_per_unit is not None:
-            landed = _as_decimal(qi.landed_cost_per_unit)
-            if product.saved_base_cost != landed:
-                updates["saved_base_cost"] = landed
+    if not sup_fk and latest_quote is not None:
+        if product.saved_base_cost != latest_quote[0]:
+            updates["saved_base_cost"] = latest_quote[0]
 
+    return updates
+
+
+def reconcile_saved_base_cost_with_quotations(product, supplier_costs: list[dict]) -> None:
+    """
+    Refresh saved_base_cost (and supplier pin) when quotation pricing changed but the
+    product row still holds an old snapshot. Called when opening the pricing modal (GET).
+    """
+    from product.models import Product
+
+    if not supplier_costs:
+        return
+    latest_quote = latest_quotation_landed_costs([product.pk]).get(product.pk)
+    updates = saved_base_cost_updates(product, supplier_costs, latest_quote)
     if updates:
         Product.objects.filter(pk=product.pk).update(**updates)
         for k, v in updates.items():
@@ -96,40 +135,81 @@ def reconcile_saved_base_cost_with_quotations(product, supplier_costs: list[dict
 def sync_saved_base_costs_for_quotation(quotation) -> None:
     """
     After quotation items or transport/date are saved (bulk_update bypasses signals).
-    Updates saved_base_cost for pinned products when this supplier's line changes;
-    for unpinned products, aligns saved_base_cost to the globally latest landed cost
-    so stored amounts and exports stay current.
+    Refreshes the cost snapshots of the quotation's products, then reconciles their
+    saved_base_cost set-based: pinned products follow their supplier's current cost,
+    unpinned products the globally latest landed cost.
     """
     from inventory.models import QuotationItem
+    from product.cost_snapshot import refresh_cost_snapshots
+
+    product_ids = list(
+        QuotationItem.objects.filter(quotation_id=quotation.pk).values_list("product_id", flat=True).distinct()
+    )
+    refresh_cost_snapshots(product_ids)
+    reconcile_saved_base_costs_for_products(product_ids)
+
+
+def queue_dirty_products(product_ids: list[int]) -> None:
+    """Add product ids to the dirty set immediately (see mark_saved_base_cost_dirty)."""
+    try:
+        redis = redis_connection()
+        if redis is not None:
+            redis.sadd(DIRTY_PRODUCTS_KEY, *product_ids)
+            return
+        # Non-Redis caches: best-effort (not atomic), good enough for development.
+        pending = cache.get(DIRTY_PRODUCTS_KEY) or set()
+        cache.set(DIRTY_PRODUCTS_KEY, pending | set(product_ids), None)
+    except Exception:
+        logger.warning("[pricing_sync] could not queue %d products for reconciliation", len(product_ids), exc_info=True)
+
+
+def mark_saved_base_cost_dirty(product_ids) -> None:
+    """Queue products for the background reconciliation once the current transaction commits."""
+    product_ids = sorted({int(pid) for pid in product_ids if pid is not None})
+    if product_ids:
+        transaction.on_commit(lambda: queue_dirty_products(product_ids))
+
+
+def pop_dirty_products(limit: int) -> list[int]:
+    """Remove and return up to `limit` queued product ids."""
+    redis = redis_connection()
+    if redis is not None:
+        return [int(pid) for pid in redis.spop(DIRTY_PRODUCTS_KEY, limit) or []]
+    pending = cache.get(DIRTY_PRODUCTS_KEY) or set()
+    batch = sorted(pending)[:limit]
+    cache.set(DIRTY_PRODUCTS_KEY, pending - set(batch), None)
+    return batch
+
+
+def reconcile_saved_base_costs_for_products(product_ids) -> int:
+    """
+    Set-based reconciliation against the (already refreshed) cost snapshots: three
+    reads for all products (products, snapshot costs, latest quotation lines + totals)
+    and one bulk UPDATE for the rows that changed. Returns the number of products processed.
+    """
+    from inventory.supplier_pricing import get_supplier_costs_for_products
     from product.models import Product
 
-    supplier_id = quotation.supplier_id
-    items = (
-        QuotationItem.objects.filter(quotation_id=quotation.pk)
-        .select_related("product", "quotation")
-        .prefetch_related("quotation__items")
+    product_ids = list({int(pid) for pid in product_ids if pid is not None})
+    if not product_ids:
+        return 0
+    products = list(
+        Product.objects.filter(pk__in=product_ids).only("pk", "saved_base_cost", "saved_base_cost_supplier_id")
     )
-    affected_product_ids = set()
-    for item in items:
-        affected_product_ids.add(item.product_id)
-        product = item.product
-        landed = item.landed_cost_per_unit
-        if landed is None:
-            continue
-        ld = _as_decimal(landed)
-        pin = getattr(product, "saved_base_cost_supplier_id", None)
-        if pin == supplier_id:
-            if product.saved_base_cost != ld:
-                Product.objects.filter(pk=product.pk).update(saved_base_cost=ld)
-                product.saved_base_cost = ld
-
-    for pid in affected_product_ids:
-        product = Product.objects.get(pk=pid)
-        if getattr(product, "saved_base_cost_supplier_id", None) is not None:
-            continue
-        qi = _latest_quotation_item_for_product(pid)
-        if qi is None or qi.landed_cost_per_unit is None:
-            continue
-        landed = _as_decimal(qi.landed_cost_per_unit)
-        if product.saved_base_cost != landed:
-            Product.objects.filter(pk=product.pk).update(saved_base_cost=landed)
+    costs_by_product = get_supplier_costs_for_products(product_ids)
+    latest_quotes = latest_quotation_landed_costs(product_ids)
+
+    changed = []
+    for product in products:
+        updates = saved_base_cost_updates(
+            product, costs_by_product.get(product.pk, []), latest_quotes.get(product.pk),
+        )
+        if updates:
+            for k, v in updates.items():
+                setattr(product, k, v)
+            changed.append(product)
+    if changed:
+        Product.objects.bulk_update(
+            changed, ["saved_base_cost", "saved_base_cost_supplier"], batch_size=500,
+        )
+    return len(products)
@@ -0,0 +1,133 @@
+# distributorplatform/app/product/search.py
+# Full-text product search over the maintained Product.search_vector column.
+from __future__ import annotations
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, Q, Value
+from django.utils.html import strip_tags
+
+# 'simple' keeps lexemes unstemmed so prefix queries behave the same for English,
+# SKUs and CJK text; ranking weights carry the field importance instead.
+SEARCH_CONFIG = 'simple'
+SEARCH_FIELDS = frozenset({'name', 'alias_name', 'sku', 'description'})
+BATCH_SIZE = 500
+
+_TOKEN_RE = re.compile(r'[^\W_]+')
+# One whitespace-free token of 3+ characters containing a digit: probably (part of) a SKU.
+_SKU_FRAGMENT_RE = re.compile(r'^(?=\S*\d)\S{3,}$')
+# CJK ideographs, kana and hangul.
+_CJK_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af]+')
+
+
+def cjk_terms(text: str) -> list[str]:
+    """
+    Postgres does not segment CJK text: "耐克气垫" is a single lexeme, so a search
+    for "气垫" would miss it. Index every character bigram (and lone characters)
+    so any substring of two or more characters can be matched.
+    """
+    terms = []
+    for run in _CJK_RE.findall(text or ''):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def search_document(product) -> dict[str, str]:
+    """Weighted text for a product: names and SKU rank above the (HTML-stripped) description."""
+    names = ' | '.join(part for part in (product.name, product.alias_name) if part)
+    return {
+        'A': ' '.join(filter(None, [names, product.sku or ''])),
+        'B': ' '.join(cjk_terms(names)),
+        'D': strip_tags(product.description or ''),
+    }
+
+
+def search_vector_for(product):
+    """Expression that computes the product's tsvector from its current field values."""
+    vector = None
+    for weight, text in search_document(product).items():
+        part = SearchVector(Value(text), config=SEARCH_CONFIG, weight=weight)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def update_search_vector(product) -> None:
+    """Write search_vector for a saved product instance (single UPDATE, no signals)."""
+    from product.models import Product
+
+    Product.objects.filter(pk=product.pk).update(search_vector=search_vector_for(product))
+
+
+def refresh_search_vectors(product_ids) -> None:
+    """Recompute search_vector for the given products (one bulk UPDATE per batch)."""
+    from product.models import Product
+
+    product_ids = list({int(pid) for pid in product_ids if pid is not None})
+    for start in range(0, len(product_ids), BATCH_SIZE):
+        products = list(
+            Product.objects.filter(pk__in=product_ids[start:start + BATCH_SIZE])
+            .only('pk', *SEARCH_FIELDS)
+        )
+        for product in products:
+            product.search_vector = search_vector_for(product)
+        Product.objects.bulk_update(products, ['search_vector'])
+
+
+def rebuild_all_search_vectors() -> int:
+    """Full rebuild (initial population / repair). Returns the number of products processed."""
+    from product.models import Product
+
+    product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+    refresh_search_vectors(product_ids)
+    return len(product_ids)
+
+
+def search_terms(text: str) -> list[str]:
+    """Query terms in the same shape as the indexed document (CJK runs become bigrams)."""
+    terms = []
+    for token in _TOKEN_RE.findall((text or '').lower()):
+        cjk = cjk_terms(token)
+        rest = _CJK_RE.sub(' ', token).split()
+        terms.extend(cjk + rest)
+    return terms
+
+
+def build_search_query(text: str) -> SearchQuery | None:
+    """Prefix match on every term (AND), so partial words and SKUs match as the user types."""
+    terms = search_terms(text)
+    if not terms:
+        return None
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), config=SEARCH_CONFIG, search_type='raw')
+
+
+def sku_fragment(text: str) -> str | None:
+    """The stripped text when it looks like a whole or partial SKU, else None."""
+    text = (text or '').strip()
+    return text if _SKU_FRAGMENT_RE.match(text) else None
+
+
+def search_products(queryset, text: str, *, rank: bool = True):
+    """
+    Restrict a Product queryset to matches for `text` using the GIN-indexed
+    search_vector. Prefix queries cannot find the middle of a SKU, so SKU-like
+    text (see sku_fragment) also matches any SKU containing it. With rank=True
+    the result is annotated with search_rank and ordered best match first
+    (then name); callers with their own ordering or keyset pagination pass
+    rank=False. Text without any searchable term matches nothing.
+    """
+    query = build_search_query(text)
+    if query is None:
+        return queryset.none()
+    condition = Q(search_vector=query)
+    fragment = sku_fragment(text)
+    if fragment:
+        # ~* (iregex) can use the pg_trgm index on sku; icontains' UPPER(sku) LIKE cannot.
+        condition |= Q(sku__iregex=re.escape(fragment))
+    queryset = queryset.filter(condition)
+    if rank:
+        queryset = queryset.annotate(search_rank=SearchRank(F('search_vector'), query)).order_by('-search_rank', 'name')
+    return queryset
@@ -1,8 +1,24 @@
 # distributorplatform/app/product/signals.py
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
 from django.dispatch import receiver
-from .models import Product
+from core.models import SiteSetting
+from inventory.models import (
+    Quotation,
+    QuotationItem,
+    Supplier,
+    SupplierPriceMatrixEntry,
+    SupplierPriceMatrixTier,
+)
+from sales.models import Invoice, InvoiceItem
+from .context_processors import category_nav_cache
+from .cost_snapshot import request_cost_snapshot_refresh
+from .duplicates import refresh_duplicate_index
+from .home_catalog import home_catalog_cache
+from .models import Product, Category, CategoryGroup
+from .search import SEARCH_FIELDS, update_search_vector
+from .visibility import rebuild_group_visibility, rebuild_product_visibility
 from seo.models import PageMetadata
+from user.models import UserGroup
 from django.utils.text import slugify
 
 @receiver(post_save, sender=Product)
@@ -48,3 +64,202 @@ def delete_seo_for_product(sender, instance, **kwargs):
     except Exception:
         # Fail silently
         pass
+
+
+# --- Category navigation cache invalidation ---
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=CategoryGroup)
+@receiver(post_delete, sender=CategoryGroup)
+@receiver(post_delete, sender=UserGroup)
+def invalidate_category_nav_on_change(sender, **kwargs):
+    category_nav_cache.invalidate()
+
+
+@receiver(m2m_changed, sender=UserGroup.product_categories.through)
+@receiver(m2m_changed, sender=Product.categories.through)
+def invalidate_category_nav_on_m2m_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        category_nav_cache.invalidate()
+
+
+@receiver(post_save, sender=Product)
+def invalidate_category_nav_on_product_save(sender, instance, created, update_fields=None, **kwargs):
+    """Guest nav depends on members_only; partial saves that skip it (pricing, ordering) are ignored."""
+    if update_fields is not None and 'members_only' not in update_fields:
+        return
+    category_nav_cache.invalidate()
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_category_nav_on_product_delete(sender, instance, **kwargs):
+    category_nav_cache.invalidate()
+
+
+# --- Home page catalog cache invalidation ---
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=UserGroup)
+@receiver(post_save, sender=SiteSetting)
+def invalidate_home_catalog_on_change(sender, **kwargs):
+    # Any product field may be shown on the home page, so every save counts.
+    home_catalog_cache.invalidate()
+
+
+@receiver(m2m_changed, sender=UserGroup.product_categories.through)
+@receiver(m2m_changed, sender=Product.categories.through)
+def invalidate_home_catalog_on_m2m_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        home_catalog_cache.invalidate()
+
+
+# --- ProductVisibility (catalog ACL) maintenance ---
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def sync_visibility_on_product_categories(sender, instance, action, reverse, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._visibility_group_ids = list(instance.user_groups.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # category.products.add/remove/clear: every group holding this category is affected.
+        group_ids = getattr(instance, '_visibility_group_ids', None)
+        if group_ids is None:
+            group_ids = instance.user_groups.values_list('pk', flat=True)
+        rebuild_group_visibility(group_ids)
+    else:
+        rebuild_product_visibility([instance.pk])
+
+
+@receiver(m2m_changed, sender=UserGroup.product_categories.through)
+def sync_visibility_on_group_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._visibility_group_ids = list(instance.user_groups.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # category.user_groups.add/remove/clear: pk_set holds the affected groups.
+        group_ids = pk_set if pk_set is not None else getattr(instance, '_visibility_group_ids', [])
+        rebuild_group_visibility(group_ids)
+    else:
+        rebuild_group_visibility([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def sync_visibility_on_product_save(sender, instance, created, update_fields=None, **kwargs):
+    """Keeps the public bucket in step with members_only (group rows follow the category M2M)."""
+    if update_fields is not None and 'members_only' not in update_fields:
+        return
+    rebuild_product_visibility([instance.pk])
+
+
+# --- Full-text search document maintenance ---
+
+@receiver(post_save, sender=Product)
+def update_search_vector_on_product_save(sender, instance, update_fields=None, **kwargs):
+    """Partial saves that skip every searchable field (pricing, ordering) leave the vector alone."""
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    update_search_vector(instance)
+
+
+@receiver(post_save, sender=Product)
+def refresh_duplicate_index_on_product_save(sender, instance, update_fields=None, **kwargs):
+    """Duplicate keys depend only on the name; deletes cascade to the key and pair rows."""
+    if update_fields is not None and 'name' not in update_fields:
+        return
+    refresh_duplicate_index([instance.pk])
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_groups(sender, instance, **kwargs):
+    instance._visibility_group_ids = list(instance.user_groups.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def sync_visibility_on_category_delete(sender, instance, **kwargs):
+    # The cascade removes the M2M rows without m2m_changed; rebuild the groups that held it.
+    rebuild_group_visibility(getattr(instance, '_visibility_group_ids', []))
+
+
+# --- ProductCostSnapshot maintenance ---
+# Handlers run inside the writer's transaction so the snapshot commits with the change.
+# Bulk paths (bulk_create / bulk_update / queryset.update) refresh explicitly; row-by-row
+# imports wrap their loop in deferred_cost_snapshot_refresh() to recompute each product once.
+
+def _deleted_via_product_or_supplier(instance, origin):
+    # Product/Supplier deletes cascade into the cost sources; refreshing mid-cascade would
+    # re-insert snapshot rows for the rows being deleted. Supplier deletes are handled below.
+    return origin is not None and origin is not instance and isinstance(origin, (Product, Supplier))
+
+
+@receiver(pre_save, sender=SupplierPriceMatrixEntry)
+@receiver(pre_save, sender=InvoiceItem)
+@receiver(pre_save, sender=QuotationItem)
+def remember_previous_cost_product(sender, instance, **kwargs):
+    """Record the stored product so a line remapped to another product refreshes both."""
+    instance._cost_previous_product_id = None
+    if instance.pk:
+        instance._cost_previous_product_id = (
+            sender.objects.filter(pk=instance.pk).values_list('product_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=SupplierPriceMatrixEntry)
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_save, sender=QuotationItem)
+def refresh_cost_snapshot_on_line_save(sender, instance, **kwargs):
+    request_cost_snapshot_refresh([instance.product_id, getattr(instance, '_cost_previous_product_id', None)])
+
+
+@receiver(post_delete, sender=SupplierPriceMatrixEntry)
+@receiver(post_delete, sender=InvoiceItem)
+@receiver(post_delete, sender=QuotationItem)
+def refresh_cost_snapshot_on_line_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_via_product_or_supplier(instance, origin):
+        return
+    request_cost_snapshot_refresh([instance.product_id])
+
+
+@receiver(post_save, sender=SupplierPriceMatrixTier)
+@receiver(post_delete, sender=SupplierPriceMatrixTier)
+def refresh_cost_snapshot_on_tier_change(sender, instance, origin=None, **kwargs):
+    if _deleted_via_product_or_supplier(instance, origin) or isinstance(origin, SupplierPriceMatrixEntry):
+        return
+    product_id = (
+        SupplierPriceMatrixEntry.objects.filter(pk=instance.entry_id).values_list('product_id', flat=True).first()
+    )
+    request_cost_snapshot_refresh([product_id])
+
+
+@receiver(post_save, sender=Invoice)
+def refresh_cost_snapshot_on_invoice_save(sender, instance, created, **kwargs):
+    """Transport cost, supplier and date feed every line's landed cost."""
+    if created:
+        return
+    request_cost_snapshot_refresh(instance.items.values_list('product_id', flat=True))
+
+
+@receiver(post_save, sender=Quotation)
+def refresh_cost_snapshot_on_quotation_save(sender, instance, created, **kwargs):
+    if created:
+        return
+    request_cost_snapshot_refresh(instance.items.values_list('product_id', flat=True))
+
+
+@receiver(pre_delete, sender=Supplier)
+def remember_supplier_cost_products(sender, instance, **kwargs):
+    from .models import ProductCostSnapshot
+
+    instance._cost_product_ids = list(
+        ProductCostSnapshot.objects.filter(supplier=instance).values_list('product_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Supplier)
+def refresh_cost_snapshot_on_supplier_delete(sender, instance, **kwargs):
+    request_cost_snapshot_refresh(getattr(instance, '_cost_product_ids', []))
@@ -0,0 +1,56 @@
+# distributorplatform/app/product/tasks.py
+# Background jobs (core.jobs) for product spreadsheet uploads and the product XLSX export.
+from __future__ import annotations
+
+import datetime
+
+from core.jobs import JobFailed, job_task
+
+from .upload_import import import_product_upload, preview_product_upload
+from .resources import ProductResource
+
+
+@job_task('product.upload_preview')
+def product_upload_preview(job, *, filename):
+    """Dry-run the uploaded file (job.input_file); the result is the preview shown for confirmation."""
+    job.report_progress(0, 1, 'Validating file')
+    result = preview_product_upload(job.input_file.path, filename)
+    if not result['success']:
+        job.input_file.delete(save=True)
+        raise JobFailed(result['error'], detail=result)
+    return result
+
+
+@job_task('product.upload_import')
+def product_upload_import(job, *, preview_job_id):
+    """Import the file of a finished preview job, then drop the stored upload."""
+    from core.models import Job
+
+    preview_job = Job.objects.get(pk=preview_job_id)
+    if not preview_job.input_file:
+        raise JobFailed('Uploaded file not found. Please re-upload.')
+    job.report_progress(0, 1, 'Importing products')
+    try:
+        import_product_upload(preview_job.input_file.path, preview_job.payload.get('filename', ''))
+    finally:
+        preview_job.input_file.delete(save=True)
+    return {'success': True, 'message': 'Imported successfully!'}
+
+
+@job_task('product.export_xlsx')
+def product_export_xlsx(job, *, ids=()):
+    """
+    Export products to an Excel (.xlsx) workbook (native Unicode; symbols like ® display
+    correctly): the given product ids, or every product when ids is empty.
+    """
+    from product.models import Product
+
+    queryset = Product.objects.all().order_by('name')
+    if ids:
+        queryset = queryset.filter(id__in=ids)
+    job.report_progress(0, 1, 'Building workbook')
+    dataset = ProductResource().export(queryset)
+    today = datetime.date.today()
+    filename = f"products-selected-{today}.xlsx" if ids else f"products-{today}.xlsx"
+    job.save_result_file(filename, dataset.export('xlsx'))
+    return {'success': True, 'filename': filename}
@@ -1,12 +1,31 @@
 import json
+from io import StringIO
+from decimal import Decimal
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-from inventory.models import Supplier
-from product.models import Product
-from product.views import _build_merge_candidate_groups, _products_are_merge_candidates
+from core.models import SiteSetting
+from core.tests import LOCMEM_CACHES
+from inventory.models import Quotation, QuotationItem, Supplier, SupplierPriceMatrixEntry, SupplierPriceMatrixTier
+from product.catalog import CatalogMatcher
+from product.context_processors import category_nav_cache, category_nav_context
+from product.duplicates import lsh_band_keys, merge_candidate_groups, products_are_merge_candidates
+from product.models import Category, CategoryGroup, IgnoredMergeSuggestion, Product, ProductDuplicateKey, ProductVisibility
+from product.home_catalog import build_home_catalog
+from product.normalize import normalize_cache_info, normalize_name
+from product.matching import _like_exact, normalize_name_for_match, resolve_product, resolve_products
+from product.pagination import keyset_page
+from product.pricing_sync import sync_saved_base_costs_for_quotation
+from product.search import search_document, search_products, search_terms, sku_fragment
+from product.visibility import visible_products
 from sales.models import Invoice, InvoiceItem
+from user.models import UserGroup
+from user.utils import user_group_fingerprint
 
 
 class ProductMergeSuggestionTests(TestCase):
@@ -22,21 +41,34 @@ class ProductMergeSuggestionTests(TestCase):
 
     def test_different_doses_are_not_merge_candidates(self):
         self.assertFalse(
-            _products_are_merge_candidates(self.mounjaro_10.name, self.mounjaro_15.name)
-        )
-        groups = _build_merge_candidate_groups(
-            [self.mounjaro_10, self.mounjaro_15],
+            products_are_merge_candidates(self.mounjaro_10.name, self.mounjaro_15.name)
         )
+        groups = merge_candidate_groups(within=[self.mounjaro_10.pk, self.mounjaro_15.pk])
         self.assertEqual(groups, [])
 
     def test_spelling_variants_are_merge_candidates(self):
         self.assertTrue(
-            _products_are_merge_candidates(self.master.name, self.duplicate.name)
+            products_are_merge_candidates(self.master.name, self.duplicate.name)
         )
-        groups = _build_merge_candidate_groups([self.master, self.duplicate])
+        groups = merge_candidate_groups(within=[self.master.pk, self.duplicate.pk])
         self.assertEqual(len(groups), 1)
         self.assertEqual(len(groups[0]), 2)
 
+    def test_index_follows_renames_and_finds_pairs_across_base_keys(self):
+        vial = Product.objects.create(name='Botox Allergan 100u Vial')
+        plain = Product.objects.create(name='BOTOX Allergan 100 Units')
+        # Different base keys ("vial"), so only the LSH bands bring the pair together.
+        self.assertEqual(merge_candidate_groups(within=[vial.pk, plain.pk]), [sorted([vial.pk, plain.pk])])
+
+        plain.name = 'Dysport 300u'
+        plain.save(update_fields=['name'])
+        self.assertEqual(merge_candidate_groups(within=[vial.pk, plain.pk]), [])
+        self.assertTrue(ProductDuplicateKey.objects.filter(product=plain, variant_key='300unit').exists())
+
+    def test_lsh_band_keys_are_stable_and_order_insensitive(self):
+        self.assertEqual(lsh_band_keys(['botox', '100unit']), lsh_band_keys(['100unit', 'botox', 'botox']))
+        self.assertEqual(len(lsh_band_keys(['botox'])), 12)
+
 
 class ProductMergeApiTests(TestCase):
     def setUp(self):
@@ -83,6 +115,26 @@ class ProductMergeApiTests(TestCase):
         ]
         self.assertEqual(len(hyalgan_groups), 1)
 
+    def test_merge_suggestions_skip_dismissed_groups_and_paginate(self):
+        lyft = [Product.objects.create(name='Restylane Lyft 1ml'), Product.objects.create(name='Restylane Lyft - 1ml')]
+        kysse = [Product.objects.create(name='Restylane Kysse 1ml'), Product.objects.create(name='Restylane - Kysse 1ml')]
+        sculptra = [Product.objects.create(name='Sculptra Vial 5ml'), Product.objects.create(name='Sculptra - Vial 5ml')]
+        IgnoredMergeSuggestion.objects.create(
+            product_ids_signature=','.join(str(p.pk) for p in sorted(sculptra, key=lambda p: p.pk)),
+        )
+
+        def page(number):
+            return self.client.get(
+                f'/api/product-merge-suggestions/?page_size=1&page={number}',
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            ).json()
+
+        first, second, past_end = page(1), page(2), page(3)
+        self.assertEqual((first['total_groups'], first['has_next'], second['has_next']), (2, True, False))
+        self.assertEqual((past_end['total_groups'], past_end['groups']), (2, []))
+        self.assertEqual({p['id'] for p in first['groups'][0]['products']}, {p.pk for p in kysse})
+        self.assertEqual({p['id'] for p in second['groups'][0]['products']}, {p.pk for p in lyft})
+
     def test_merge_suggestions_selection_mode_returns_manual_group(self):
         unrelated_a = Product.objects.create(name='Alpha Widget')
         unrelated_b = Product.objects.create(name='Beta Gadget')
@@ -138,3 +190,342 @@ class ProductMergeTests(TestCase):
         self.assertFalse(Product.objects.filter(pk=self.duplicate.pk).exists())
         item = InvoiceItem.objects.get(pk=self.invoice.items.first().pk)
         self.assertEqual(item.product_id, self.master.pk)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CategoryNavCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category_nav_cache.clear_local()
+        self.factory = RequestFactory()
+        group = CategoryGroup.objects.create(name='Brands')
+        self.public_category = Category.objects.create(name='Public', group=group, code='PUB')
+        self.member_category = Category.objects.create(name='Members', group=group, code='MEM')
+        public_product = Product.objects.create(name='Public Product')
+        public_product.categories.add(self.public_category)
+        member_product = Product.objects.create(name='Member Product', members_only=True)
+        member_product.categories.add(self.member_category)
+        self.user_group = UserGroup.objects.create(name='Agents')
+        self.user_group.product_categories.add(self.member_category)
+        self.user = get_user_model().objects.create_user(
+            username='navuser', email='nav@example.com', password='testpass123', phone_number='+60123456789',
+        )
+        self.user.user_groups.add(self.user_group)
+
+    def _nav_codes(self, user):
+        request = self.factory.get('/')
+        request.user = user
+        return [category.code for category in category_nav_context(request)['allowed_categories_list']]
+
+    def test_anonymous_and_member_buckets(self):
+        from django.contrib.auth.models import AnonymousUser
+
+        self.assertEqual(self._nav_codes(AnonymousUser()), ['PUB'])
+        self.assertEqual(self._nav_codes(self.user), ['MEM'])
+
+    def test_group_category_change_invalidates_nav(self):
+        self.assertEqual(self._nav_codes(self.user), ['MEM'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_group.product_categories.add(self.public_category)
+        user = get_user_model().objects.get(pk=self.user.pk)
+        self.assertEqual(self._nav_codes(user), ['MEM', 'PUB'])
+
+    def test_group_fingerprint_is_cached_per_user_until_membership_changes(self):
+        self.assertEqual(user_group_fingerprint(self.user), f'groups-{self.user_group.pk}')
+        fresh = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_group_fingerprint(fresh), f'groups-{self.user_group.pk}')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_group.users.remove(self.user)
+        fresh = get_user_model().objects.get(pk=self.user.pk)
+        self.assertEqual(user_group_fingerprint(fresh), 'groups-none')
+
+
+class ProductVisibilityTests(TestCase):
+    def setUp(self):
+        group = CategoryGroup.objects.create(name='Lines')
+        self.category = Category.objects.create(name='Injectables', group=group, code='INJ')
+        self.product = Product.objects.create(name='Member Vial', members_only=True)
+        self.product.categories.add(self.category)
+        self.user_group = UserGroup.objects.create(name='Clinics')
+        self.user = get_user_model().objects.create_user(
+            username='clinic', email='clinic@example.com', password='testpass123', phone_number='+60123456780',
+        )
+        self.user.user_groups.add(self.user_group)
+
+    def _visible_ids(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        return set(visible_products(user).values_list('pk', flat=True))
+
+    def test_group_rows_follow_category_assignment(self):
+        self.assertEqual(self._visible_ids(), set())
+        self.user_group.product_categories.add(self.category)
+        self.assertEqual(self._visible_ids(), {self.product.pk})
+        self.category.user_groups.remove(self.user_group)
+        self.assertEqual(self._visible_ids(), set())
+
+    def test_public_bucket_follows_members_only(self):
+        self.assertFalse(ProductVisibility.objects.filter(product=self.product, user_group__isnull=True).exists())
+        self.product.members_only = False
+        self.product.save()
+        self.assertTrue(ProductVisibility.objects.filter(product=self.product, user_group__isnull=True).exists())
+
+
+class ProductListKeysetTests(TestCase):
+    def setUp(self):
+        for name in ['Delta', 'Alpha', 'Charlie', 'Bravo']:
+            Product.objects.create(name=name, display_order=1)
+        Product.objects.create(name='Zulu', display_order=0)
+        Product.objects.create(name='Promo', display_order=0, is_promotion=True)
+
+    def test_pages_walk_catalog_in_order_without_overlap(self):
+        queryset = Product.objects.filter(is_promotion=False)
+        seen, cursor = [], None
+        while True:
+            items, cursor = keyset_page(queryset, cursor, 2)
+            seen.extend(p.name for p in items)
+            if cursor is None:
+                break
+        self.assertEqual(seen, ['Zulu', 'Alpha', 'Bravo', 'Charlie', 'Delta'])
+
+    def test_malformed_cursor_starts_from_first_page(self):
+        items, _ = keyset_page(Product.objects.filter(is_promotion=False), 'not-a-cursor', 1)
+        self.assertEqual([p.name for p in items], ['Zulu'])
+
+    def test_promotions_are_listed_separately_on_first_page_only(self):
+        client = Client()
+        with override_settings(CACHES=LOCMEM_CACHES):
+            ProductVisibility.objects.bulk_create(
+                [ProductVisibility(product=p) for p in Product.objects.all()],
+                ignore_conflicts=True,
+            )
+            response = client.get('/products/')
+            self.assertEqual([p.name for p in response.context['promotional_products']], ['Promo'])
+            self.assertNotIn('Promo', [p.name for p in response.context['products']])
+
+
+class HomeCatalogTests(TestCase):
+    def setUp(self):
+        group = CategoryGroup.objects.create(name='Home')
+        self.categories = [
+            Category.objects.create(name=f'Cat {i}', group=group, code=f'HC{i}') for i in range(2)
+        ]
+        for category in self.categories:
+            for i in range(5):
+                product = Product.objects.create(name=f'{category.code} item {i}')
+                product.categories.add(category)
+
+    def test_category_carousels_are_bounded_by_site_setting(self):
+        from django.contrib.auth.models import AnonymousUser
+
+        site_settings = SiteSetting.load()
+        site_settings.homepage_category_product_limit = 3
+        site_settings.save()
+        catalog = build_home_catalog(AnonymousUser())
+        self.assertEqual(
+            [len(category.products.all()) for category in catalog['categories_with_products']],
+            [3, 3],
+        )
+
+    def test_zero_limit_turns_the_category_sections_off(self):
+        from django.contrib.auth.models import AnonymousUser
+
+        site_settings = SiteSetting.load()
+        site_settings.homepage_category_product_limit = 0
+        site_settings.save()
+        self.assertEqual(build_home_catalog(AnonymousUser())['categories_with_products'], [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SavedBaseCostReconciliationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.supplier = Supplier.objects.create(name='Pinned Supplier')
+        self.product = Product.objects.create(
+            name='Pinned Product',
+            saved_base_cost=Decimal('5.00'),
+            saved_base_cost_supplier=self.supplier,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            entry = SupplierPriceMatrixEntry.objects.create(
+                supplier=self.supplier, product=self.product, line_medication='Pinned Product',
+            )
+            SupplierPriceMatrixTier.objects.create(entry=entry, min_quantity=1, unit_price=Decimal('9.00'))
+        staff = get_user_model().objects.create_user(username='costs', password='testpass123', is_staff=True)
+        self.client = Client()
+        self.client.force_login(staff)
+
+    def test_manage_products_list_is_read_only(self):
+        response = self.client.get('/api/manage-products/', HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.saved_base_cost, Decimal('5.00'))
+
+    def test_command_reconciles_dirty_products(self):
+        call_command('reconcile_saved_base_costs', stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.saved_base_cost, Decimal('9.00'))
+
+
+class SetBasedQuotationSyncTests(TestCase):
+    def _quotation_with_products(self, count):
+        supplier = Supplier.objects.create(name=f'Sync Supplier {count}')
+        quotation = Quotation.objects.create(
+            supplier=supplier, date_quoted='2024-05-01', transportation_cost=Decimal('10.00'),
+        )
+        for i in range(count):
+            product = Product.objects.create(name=f'Sync {count} #{i}')
+            QuotationItem.objects.create(quotation=quotation, product=product, quantity=1, quoted_price=Decimal('10.00'))
+        return quotation
+
+    def test_unpinned_products_follow_latest_landed_cost(self):
+        quotation = self._quotation_with_products(2)
+        sync_saved_base_costs_for_quotation(quotation)
+        # Two lines of 10.00 share 10.00 transport: 15.00 landed each.
+        self.assertEqual(
+            set(Product.objects.filter(quotationitem__quotation=quotation).values_list('saved_base_cost', flat=True)),
+            {Decimal('15.00')},
+        )
+
+    def test_query_count_does_not_grow_with_products(self):
+        small = self._quotation_with_products(2)
+        large = self._quotation_with_products(8)
+        with CaptureQueriesContext(connection) as small_queries:
+            sync_saved_base_costs_for_quotation(small)
+        with CaptureQueriesContext(connection) as large_queries:
+            sync_saved_base_costs_for_quotation(large)
+        self.assertEqual(len(small_queries), len(large_queries))
+
+
+class NameNormalizationTests(SimpleTestCase):
+    def test_every_form_in_one_pass(self):
+        name = normalize_name('MOUNJARO® KwikPen®, 1 Stk 100 Units | 蒙扎罗')
+        self.assertEqual(name.normalized, 'mounjaro kwikpen 1 stk 100unit')
+        self.assertEqual(name.tokens, ('mounjaro', 'kwikpen', '1', 'stk', '100unit'))
+        self.assertEqual(name.variant_tokens, frozenset({'1stk', '100unit'}))
+        self.assertEqual(name.base_key, ('kwikpen', 'mounjaro'))
+        self.assertEqual(normalize_name(None), normalize_name(''))
+
+    def test_results_are_memoized_by_raw_name(self):
+        normalize_name('Wondertox 100u')
+        hits = normalize_cache_info().hits
+        self.assertIs(normalize_name('Wondertox 100u'), normalize_name('Wondertox 100u'))
+        self.assertEqual(normalize_cache_info().hits, hits + 2)
+
+
+class SearchTermTests(SimpleTestCase):
+    def test_cjk_runs_become_bigrams(self):
+        self.assertEqual(search_terms('Nike 耐克气垫'), ['nike', '耐克', '克气', '气垫'])
+        self.assertEqual(search_terms('ABC-12 气'), ['abc', '12', '气'])
+        self.assertEqual(search_terms(' -- '), [])
+
+    def test_sku_fragment_needs_one_token_with_a_digit(self):
+        self.assertEqual(sku_fragment(' k-10 '), 'k-10')
+        self.assertIsNone(sku_fragment('cream'))
+        self.assertIsNone(sku_fragment('10'))
+        self.assertIsNone(sku_fragment('nk 100'))
+
+    def test_document_strips_html_and_indexes_both_names(self):
+        product = Product(name='Nike Air | 耐克气垫', alias_name='Air', sku='NK-1', description='<p>Soft <b>sole</b></p>')
+        document = search_document(product)
+        self.assertEqual(document['A'], 'Nike Air | 耐克气垫 | Air NK-1')
+        self.assertEqual(document['B'], '耐克 克气 气垫')
+        self.assertEqual(document['D'], 'Soft sole')
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.shoe = Product.objects.create(name='Nike Air | 耐克气垫', sku='NK-100')
+        self.cream = Product.objects.create(
+            name='Hand Cream', alias_name='Moisturiser', description='<p>For dry <em>skin</em></p>',
+        )
+
+    def _search(self, text):
+        return list(search_products(Product.objects.all(), text))
+
+    def test_matches_names_sku_prefix_and_description(self):
+        self.assertEqual(self._search('气垫'), [self.shoe])
+        self.assertEqual(self._search('nk-10'), [self.shoe])
+        self.assertEqual(self._search('moist'), [self.cream])
+        self.assertEqual(self._search('dry skin'), [self.cream])
+        self.assertEqual(self._search('cream nike'), [])
+
+    def test_sku_substring_matches_middle_of_sku(self):
+        self.assertEqual(self._search('K-10'), [self.shoe])
+        self.assertEqual(self._search('100'), [self.shoe])
+
+    def test_vector_follows_saves(self):
+        self.cream.name = 'Body Lotion'
+        self.cream.save()
+        self.assertEqual(self._search('lotion'), [self.cream])
+        self.assertEqual(self._search('cream'), [])
+
+
+class ProductMatchingTests(TestCase):
+    def setUp(self):
+        self.toxin = Product.objects.create(name='WONDERTOX 100Unit | 旺德', sku='WT_100')
+        self.gel = Product.objects.create(name='HYALGAN (Fidia)', alias_name='Hyalgan gel')
+
+    def test_normalization_and_like_escaping(self):
+        self.assertEqual(normalize_name_for_match('Wondertox 100 u | 旺德')[0], 'wondertox 100unit')
+        self.assertEqual(_like_exact('WT_100%'), 'WT\\_100\\%')
+
+    def test_resolve_single(self):
+        self.assertEqual(resolve_product('wt_100', 'anything'), (self.toxin, 'matched_sku'))
+        self.assertEqual(resolve_product(None, 'hyalgan (fidia)'), (self.gel, 'matched_name_exact'))
+        self.assertEqual(resolve_product('', 'Wondertox 100u'), (self.toxin, 'matched_name_fuzzy'))
+        self.assertEqual(resolve_product('', 'Wondertox 100u', allow_fuzzy=False), (None, 'new'))
+        self.assertEqual(resolve_product('WT%100', 'Completely different'), (None, 'new'))
+
+    def test_batch_keeps_input_order_in_two_queries(self):
+        pairs = [('', 'Hyalgan gel'), ('WT_100', ''), ('', ''), ('', 'Hyalgan gel')]
+        with self.assertNumQueries(2):
+            results = resolve_products(pairs)
+        self.assertEqual(results, [
+            (self.gel, 'matched_name_fuzzy'),
+            (self.toxin, 'matched_sku'),
+            (None, 'new'),
+            (self.gel, 'matched_name_fuzzy'),
+        ])
+
+
+class CatalogMatcherTests(TestCase):
+    def setUp(self):
+        self.toxin = Product.objects.create(name='WONDERTOX 100Unit | 旺德', sku='WT_100')
+        self.gel = Product.objects.create(name='HYALGAN (Fidia)', alias_name='Hyalgan gel')
+
+    def test_match_order_sku_name_alias_then_tokens(self):
+        with self.assertNumQueries(1):
+            matcher = CatalogMatcher()
+        self.assertEqual(matcher.match('wt_100', 'anything'), (self.toxin.pk, 'matched_sku'))
+        self.assertEqual(matcher.match('', ' hyalgan (FIDIA) '), (self.gel.pk, 'matched_name_exact'))
+        self.assertEqual(matcher.match('', 'HYALGAN GEL'), (self.gel.pk, 'matched_name_exact'))
+        self.assertEqual(matcher.match('', 'Wondertox 100 u'), (None, 'new'))
+        self.assertEqual(matcher.match('', 'Wondertox 100 u', fuzzy=True), (self.toxin.pk, 'matched_name_fuzzy'))
+
+    def test_resolve_all_creates_missing_names_once(self):
+        matcher = CatalogMatcher()
+        rows = [('WT_100', ''), ('NEW-1', 'Brand New'), ('', 'brand new'), ('', ''), ('wt_100', 'Other')]
+        products = matcher.resolve_all(rows, defaults={'description': 'Auto-imported'}, assign_sku=True)
+
+        created = Product.objects.get(name='Brand New')
+        self.assertEqual(products, [self.toxin, created, created, None, self.toxin])
+        self.assertEqual(matcher.created_ids, {created.pk})
+        self.assertEqual((created.sku, created.description), ('NEW-1', 'Auto-imported'))
+        # The bulk-created row gets the same derived data as a saved product.
+        self.assertIsNotNone(Product.objects.values_list('search_vector', flat=True).get(pk=created.pk))
+        self.assertTrue(ProductVisibility.objects.filter(product=created, user_group__isnull=True).exists())
+        with self.assertNumQueries(0):
+            self.assertEqual(matcher.product('', 'BRAND NEW'), created)
+
+    def test_name_only_ignores_sku_and_alias_owners(self):
+        matcher = CatalogMatcher()
+        products = matcher.resolve_all(
+            [('WT_100', 'Wondertox Generic'), ('', 'Hyalgan gel')], assign_sku=True, name_only=True,
+        )
+
+        self.assertNotIn(self.toxin, products)
+        self.assertNotIn(self.gel, products)
+        # The taken SKU is not copied onto the new product.
+        self.assertIsNone(Product.objects.get(name='Wondertox Generic').sku)
@@ -0,0 +1,342 @@
+# distributorplatform/app/product/upload_import.py
+# Product spreadsheet uploads (django-import-export): dry-run preview rows and the final import.
+from __future__ import annotations
+
+import logging
+import re
+from decimal import Decimal
+
+from django.db import transaction
+from tablib import Dataset
+
+from .resources import ProductResource
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_ROW_LIMIT = 15
+
+
+def load_upload_dataset(path: str, filename: str) -> Dataset:
+    """Read an uploaded .csv (UTF-8, falling back to latin-1) or Excel file into a Dataset."""
+    dataset = Dataset()
+    with open(path, 'rb') as f:
+        file_content = f.read()
+    if filename.lower().endswith('.csv'):
+        try:
+            decoded_content = file_content.decode('utf-8')
+        except UnicodeDecodeError:
+            logger.warning("[upload_products] UTF-8 decode failed for CSV, falling back to latin-1.")
+            decoded_content = file_content.decode('latin-1')
+        dataset.load(decoded_content, format='csv')
+    else:
+        dataset.load(file_content, format='xlsx')
+    return dataset
+
+
+def _upload_row_values_dict(row_result):
+    rv = getattr(row_result, 'row_values', None)
+    if rv is None:
+        return {}
+    if isinstance(rv, dict):
+        return dict(rv)
+    try:
+        return dict(rv)
+    except (TypeError, ValueError):
+        return {}
+
+
+def _upload_row_get_str(row_values_dict, *header_names):
+    """First non-empty cell matching any header name (case-insensitive)."""
+    if not row_values_dict:
+        return ''
+    for name in header_names:
+        v = row_values_dict.get(name)
+        if v is not None and str(v).strip():
+            return str(v).strip()
+    lower_to_key = {str(k).lower(): k for k in row_values_dict}
+    for name in header_names:
+        key = lower_to_key.get(str(name).lower())
+        if key is None:
+            continue
+        v = row_values_dict.get(key)
+        if v is not None and str(v).strip():
+            return str(v).strip()
+    return ''
+
+
+def _upload_norm_m2m_csv(value):
+    if value is None:
+        return ''
+    parts = [
+        p.strip()
+        for p in str(value).replace('，', ',').split(',')
+        if p and str(p).strip()
+    ]
+    return ', '.join(sorted(parts, key=str.lower))
+
+
+def _upload_preview_scalar(val):
+    if val is None:
+        return None
+    if isinstance(val, bool):
+        return 'Yes' if val else 'No'
+    if isinstance(val, Decimal):
+        s = format(val, 'f').rstrip('0').rstrip('.')
+        return s or '0'
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        return str(val)
+    text = str(val).strip()
+    return text if text else None
+
+
+def _upload_preview_description_short(html_val, max_len=120):
+    if not html_val:
+        return None
+    plain = re.sub(r'<[^>]+>', ' ', str(html_val))
+    plain = re.sub(r'\s+', ' ', plain).strip()
+    if not plain:
+        return None
+    if len(plain) > max_len:
+        return plain[: max_len - 1] + '…'
+    return plain
+
+
+def _upload_categories_db_csv(product):
+    return ', '.join(sorted(product.categories.values_list('name', flat=True)))
+
+
+def _upload_suppliers_db_csv(product):
+    return ', '.join(sorted(product.suppliers.values_list('name', flat=True)))
+
+
+def build_product_upload_row_changes(row_result):
+    """Build a list of {field, label, old, new} for the upload confirmation modal."""
+    from product.models import Product
+
+    changes = []
+    instance = None
+    for attr in ('instance', 'object'):
+        instance = getattr(row_result, attr, None)
+        if instance is not None:
+            break
+    if instance is None:
+        return changes
+
+    rv = _upload_row_values_dict(row_result)
+    itype = str(getattr(row_result, 'import_type', '') or '').lower()
+
+    if itype == 'new':
+        changes.append({
+            'field': '_action',
+            'label': 'Action',
+            'old': None,
+            'new': 'Create new product',
+        })
+        for attr, label in (
+            ('sku', 'SKU'),
+            ('name', 'Name'),
+            ('origin_country', 'Origin country'),
+            ('display_order', 'Display order'),
+            ('members_only', 'Members only'),
+            ('selling_price', 'Selling price'),
+            ('profit_margin', 'Profit margin'),
+        ):
+            disp = _upload_preview_scalar(getattr(instance, attr, None))
+            if disp is not None:
+                changes.append({'field': attr, 'label': label, 'old': None, 'new': disp})
+        desc = _upload_preview_description_short(getattr(instance, 'description', None))
+        if desc:
+            changes.append({'field': 'description', 'label': 'Description', 'old': None, 'new': desc})
+        cat_raw = _upload_row_get_str(rv, 'categories', 'Categories')
+        if cat_raw:
+            changes.append({'field': 'categories', 'label': 'Categories', 'old': None, 'new': cat_raw})
+        sup_raw = _upload_row_get_str(rv, 'suppliers', 'Suppliers')
+        if sup_raw:
+            changes.append({'field': 'suppliers', 'label': 'Suppliers', 'old': None, 'new': sup_raw})
+        return changes
+
+    if itype == 'update' and instance.pk:
+        try:
+            old = Product.objects.prefetch_related('categories', 'suppliers').get(pk=instance.pk)
+        except Product.DoesNotExist:
+            return changes
+
+        for attr, label in (
+            ('sku', 'SKU'),
+            ('name', 'Name'),
+            ('origin_country', 'Origin country'),
+            ('display_order', 'Display order'),
+            ('members_only', 'Members only'),
+            ('selling_price', 'Selling price'),
+            ('profit_margin', 'Profit margin'),
+        ):
+            o_val = _upload_preview_scalar(getattr(old, attr, None))
+            n_val = _upload_preview_scalar(getattr(instance, attr, None))
+            if o_val != n_val:
+                changes.append({'field': attr, 'label': label, 'old': o_val or '—', 'new': n_val or '—'})
+
+        o_desc = _upload_preview_description_short(old.description)
+        n_desc = _upload_preview_description_short(instance.description)
+        if o_desc != n_desc:
+            changes.append({
+                'field': 'description',
+                'label': 'Description',
+                'old': o_desc or '—',
+                'new': n_desc or '—',
+            })
+
+        old_c = _upload_categories_db_csv(old)
+        new_c = _upload_categories_db_csv(instance)
+        cat_raw = _upload_row_get_str(rv, 'categories', 'Categories')
+        categories_differ = _upload_norm_m2m_csv(old_c) != _upload_norm_m2m_csv(new_c)
+        if categories_differ or (
+            cat_raw and _upload_norm_m2m_csv(cat_raw) != _upload_norm_m2m_csv(old_c)
+        ):
+            new_disp = cat_raw if cat_raw else (new_c or '—')
+            changes.append({
+                'field': 'categories',
+                'label': 'Categories',
+                'old': old_c or '—',
+                'new': new_disp,
+            })
+
+        old_s = _upload_suppliers_db_csv(old)
+        new_s = _upload_suppliers_db_csv(instance)
+        sup_raw = _upload_row_get_str(rv, 'suppliers', 'Suppliers')
+        suppliers_differ = _upload_norm_m2m_csv(old_s) != _upload_norm_m2m_csv(new_s)
+        if suppliers_differ or (
+            sup_raw and _upload_norm_m2m_csv(sup_raw) != _upload_norm_m2m_csv(old_s)
+        ):
+            new_disp = sup_raw if sup_raw else (new_s or '—')
+            changes.append({
+                'field': 'suppliers',
+                'label': 'Suppliers',
+                'old': old_s or '—',
+                'new': new_disp,
+            })
+
+    return changes
+
+
+def preview_product_upload(path: str, filename: str) -> dict:
+    """
+    Dry-run the import and describe it for the confirmation step. Returns the JSON the
+    upload endpoint sends back: success + total_rows + preview_data (first rows with
+    their field changes), or success False with error and details.
+    """
+    try:
+        dataset = load_upload_dataset(path, filename)
+    except Exception as e:
+        logger.error(f"[upload_products] Error reading upload into dataset: {e}", exc_info=True)
+        return {'success': False, 'error': f'Error reading file: {e}'}
+
+    product_resource = ProductResource()
+    try:
+        result = product_resource.import_data(dataset, dry_run=True, use_transactions=True)
+    except Exception as e:
+        logger.error(f"[upload_products] Error during dry run import: {e}", exc_info=True)
+        return {'success': False, 'error': f'Error validating file: {e}'}
+
+    # Check for hard errors first
+    if result.has_errors():
+        errors = []
+        try:
+            for err in result.row_errors():
+                row_num, row_errors_list = err[0], err[1]
+                if row_errors_list:
+                    first_err = row_errors_list[0]
+                    err_msg = getattr(first_err, 'error', str(first_err))
+                else:
+                    err_msg = "Unknown error"
+                errors.append(f"Row {row_num}: {err_msg}")
+        except Exception as e:
+            errors.append(str(e))
+        return {'success': False, 'error': "Import errors found.", 'details': errors}
+
+    # Build dataset row dicts once for fallback (same order as result.rows)
+    headers = list(dataset.headers) if dataset.headers else []
+    dataset_row_dicts = [dict(zip(headers, row)) for row in dataset]
+
+    # Safely generate preview data
+    preview_rows = []
+    valid_rows_count = 0
+
+    for idx, row_result in enumerate(result.rows):
+        itype = getattr(row_result, 'import_type', None)
+        if itype is None or str(itype).lower() not in ('new', 'update'):
+            continue
+        valid_rows_count += 1
+        if len(preview_rows) >= PREVIEW_ROW_LIMIT:
+            continue
+
+        final_sku = None
+        final_name = None
+
+        # 1. Primary: generated model instance (django-import-export may use .instance or .object)
+        for attr in ('instance', 'object'):
+            obj = getattr(row_result, attr, None)
+            if obj is not None:
+                final_sku = getattr(obj, 'sku', None)
+                final_name = getattr(obj, 'name', None)
+                if final_sku or final_name:
+                    break
+
+        # 2. Fallback: raw row dict (raw_values / row_values; may be dict or OrderedDict)
+        if not final_sku or not final_name:
+            raw_dict = getattr(row_result, 'raw_values', None) or getattr(row_result, 'row_values', None)
+            if raw_dict is not None and not isinstance(raw_dict, dict):
+                raw_dict = dict(raw_dict) if hasattr(raw_dict, 'items') else {}
+            elif raw_dict is None:
+                raw_dict = {}
+            final_sku = final_sku or (raw_dict.get('sku') if raw_dict else None)
+            final_name = final_name or (raw_dict.get('name') if raw_dict else None)
+
+        # 3. Fallback: same row from the dataset we imported (name + recompute SKU to match before_import_row)
+        if (not final_sku or not final_name) and idx < len(dataset_row_dicts):
+            row_dict = dataset_row_dicts[idx]
+            final_name = final_name or row_dict.get('name') or 'Unknown'
+            final_sku = final_sku or ProductResource.get_effective_sku_for_row(row_dict) or 'N/A'
+
+        final_sku = final_sku or 'N/A'
+        final_name = final_name or 'Unknown'
+
+        instance = None
+        for attr in ('instance', 'object'):
+            instance = getattr(row_result, attr, None)
+            if instance is not None:
+                break
+        price_disp = _upload_preview_scalar(
+            getattr(instance, 'selling_price', None) if instance else None
+        )
+
+        preview_rows.append({
+            'status': str(itype).upper() if itype is not None else 'NEW',
+            'name': final_name,
+            'generated_sku': final_sku,
+            'price': price_disp,
+            'changes': build_product_upload_row_changes(row_result),
+        })
+
+    # Check if valid_rows_count is 0 but we have validation errors
+    if valid_rows_count == 0 and result.has_validation_errors():
+        return {
+            'success': False,
+            'error': "All rows failed validation.",
+            'details': ["Check file formatting."],
+        }
+
+    return {
+        'success': True,
+        'require_confirmation': True,
+        'total_rows': valid_rows_count,
+        'preview_data': preview_rows,
+    }
+
+
+def import_product_upload(path: str, filename: str) -> None:
+    """Run the real import of a previewed upload in one transaction."""
+    dataset = load_upload_dataset(path, filename)
+    with transaction.atomic():
+        result = ProductResource().import_data(dataset, dry_run=False, use_transactions=True)
+    if result.has_errors() or result.has_validation_errors():
+        logger.warning("[upload_products] Final import reported errors after dry-run success.")
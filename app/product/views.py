@@ -4,16 +4,14 @@ from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
-from django.http import HttpResponse, JsonResponse
-from tablib import Dataset
+from django.http import JsonResponse
 from decimal import Decimal, InvalidOperation
 
 import datetime
 import logging
 import json
-import os
 import re
-import tempfile
+from django.core.exceptions import ValidationError
 from django.core.serializers.json import DjangoJSONEncoder
 
 from django.db.models import Q, Subquery, OuterRef, Sum, Prefetch, F, DecimalField, ExpressionWrapper, Count
@@ -21,13 +19,22 @@ from django.db.models.deletion import ProtectedError
 from django.db.models.functions import Coalesce
 from django.core.paginator import Paginator, EmptyPage
 from inventory.models import QuotationItem, InventoryBatch, Supplier
-from inventory.supplier_pricing import get_product_supplier_costs
+from inventory.supplier_pricing import get_supplier_costs_for_products
 from inventory.views import staff_required
 
 from .models import Product, Category, CategoryGroup, ProductContentSection, IgnoredMergeSuggestion, ProductPriceTier
 from .pricing_sync import reconcile_saved_base_cost_with_quotations
+from .home_catalog import build_home_catalog, home_catalog_cache
+from .duplicates import dismissed_signatures, group_signature, merge_candidate_page
+from .cost_snapshot import (
+    base_cost_snapshot_prefetch,
+    deferred_cost_snapshot_refresh,
+    request_cost_snapshot_refresh,
+)
+from .pagination import keyset_page
+from .search import search_products
+from .visibility import visible_products
 from .forms import ProductUploadForm, ProductForm, CategoryForm
-from .resources import ProductResource
 
 from blog.models import Post
 from blog.views import get_accessible_posts
@@ -35,7 +42,10 @@ from product.models import Product, Category, CategoryGroup, ProductContentSecti
 from images.models import MediaImage, ImageCategory
 from images.forms import ImageUploadForm
 from order.views import agent_required
+from user.utils import user_group_fingerprint
 from images.models import MediaImage
+from core.jobs import enqueue, job_accepted_response
+from core.models import Job
 
 
 logger = logging.getLogger(__name__)
@@ -45,16 +55,11 @@ def home(request):
     """
     Renders the new site home page with a sidebar layout.
     """
-    # 1. Featured Products Logic (Unchanged)
-    products_query = Product.objects.filter(is_featured=True).select_related('featured_image').order_by('-created_at')
-
-    if request.user.is_authenticated and not request.user.is_anonymous:
-        allowed_categories = Category.objects.filter(user_groups__users=request.user)
-        products_query = products_query.filter(categories__in=allowed_categories).distinct()
-    else:
-        products_query = products_query.filter(members_only=False).distinct()
-
-    featured_products = products_query[:6]
+    # 1. Featured products + category carousels, cached per visitor group set
+    home_catalog = home_catalog_cache.get_or_build(
+        user_group_fingerprint(request.user),
+        lambda: build_home_catalog(request.user),
+    )
 
     # --- 2. SIDEBAR DATA (Unchanged) ---
     accessible_posts = get_accessible_posts(request.user).select_related('featured_image', 'author')
@@ -76,35 +81,12 @@ def home(request):
         post_type=Post.PostType.FAQ
     ).order_by('created_at')
 
-    # 3. Categories Products Logic
-    # FIX: Updated ordering to match Navigation Bar (display_order, name)
-    categories_with_products = []
-    if request.user.is_authenticated and not request.user.is_anonymous:
-        cats_qs = Category.objects.filter(
-            user_groups__users=request.user
-        ).distinct().order_by('display_order', 'name') # <--- UPDATED
-        product_prefetch = Prefetch(
-            'products',
-            queryset=Product.objects.select_related('featured_image').order_by('-created_at')
-        )
-        categories_with_products = cats_qs.prefetch_related(product_prefetch)
-    else:
-        cats_qs = Category.objects.filter(
-            products__members_only=False
-        ).distinct().order_by('display_order', 'name') # <--- UPDATED
-        public_products_qs = Product.objects.filter(
-            members_only=False
-        ).select_related('featured_image').order_by('-created_at')
-        categories_with_products = cats_qs.prefetch_related(
-            Prefetch('products', queryset=public_products_qs)
-        )
-
     context = {
-        'featured_products': featured_products,
+        'featured_products': home_catalog['featured_products'],
         'announcements': announcements,
         'sidebar_posts': market_insights,
         'latest_news_posts': latest_news_posts,
-        'categories_with_products': categories_with_products,
+        'categories_with_products': home_catalog['categories_with_products'],
         'faq_posts': faq_posts,
     }
     return render(request, 'product/home.html', context)
@@ -123,39 +105,54 @@ def staff_required(view_func):
     return _wrapped_view
 
 
+PRODUCT_LIST_PAGE_SIZE = 24
+PRODUCT_LIST_PROMOTION_LIMIT = 12
+
 
 def product_list(request):
     """
     Product list with DEBUG logging to trace visibility issues.
     """
     selected_category_code = request.GET.get('category')
-    search_query = request.GET.get('q')
+    search_query = (request.GET.get('q') or '').strip()
 
     # --- 1. Product Filtering Logic ---
-    products_query = None
-    if request.user.is_authenticated and not request.user.is_anonymous:
-        allowed_categories = Category.objects.filter(user_groups__users=request.user)
-        products_query = Product.objects.filter(categories__in=allowed_categories).distinct()
-    else:
-        products_query = Product.objects.filter(members_only=False)
+    products_query = visible_products(request.user)
 
     # Apply Category filtering
     if selected_category_code:
         products_query = products_query.filter(categories__code=selected_category_code)
 
-    # Apply Search Filtering
+    # Apply Search Filtering (full-text; the keyset cursor keeps the list ordering)
     if search_query:
-        products_query = products_query.filter(
-            Q(name__icontains=search_query) |
-            Q(sku__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        products_query = search_products(products_query, search_query, rank=False)
 
-    all_products = list(products_query.select_related('featured_image').distinct().order_by('display_order', 'name'))
+    products_query = products_query.select_related('featured_image')
+    cursor = request.GET.get('cursor')
 
     # --- SPLIT LOGIC ---
-    promotional_products = [p for p in all_products if getattr(p, 'is_promotion', False)]
-    regular_products = [p for p in all_products if not getattr(p, 'is_promotion', False)]
+    # Regular products are paged with a keyset cursor; promotions are a separate bounded
+    # query shown on the first page only.
+    regular_products, next_cursor = keyset_page(
+        products_query.filter(is_promotion=False), cursor, PRODUCT_LIST_PAGE_SIZE,
+    )
+    promotional_products = []
+    if not cursor:
+        promotional_products = list(
+            products_query.filter(is_promotion=True)
+            .order_by('display_order', 'name')[:PRODUCT_LIST_PROMOTION_LIMIT]
+        )
+
+    next_page_query = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_page_query = params.urlencode()
+    first_page_query = None
+    if cursor:
+        params = request.GET.copy()
+        params.pop('cursor', None)
+        first_page_query = params.urlencode()
 
     # --- 2. Sidebar Data ---
     accessible_posts = get_accessible_posts(request.user).select_related('featured_image', 'author')
@@ -170,6 +167,8 @@ def product_list(request):
     context = {
         'products': regular_products,
         'promotional_products': promotional_products,
+        'next_page_query': next_page_query,
+        'first_page_query': first_page_query,
         'product_upload_form': product_upload_form,
         'search_query': search_query,
         'announcements': announcements,
@@ -293,416 +292,46 @@ def manage_category_edit(request, category_id):
     }
     return render(request, 'product/manage_category_form.html', context)
 
-def _upload_row_values_dict(row_result):
-    rv = getattr(row_result, 'row_values', None)
-    if rv is None:
-        return {}
-    if isinstance(rv, dict):
-        return dict(rv)
-    try:
-        return dict(rv)
-    except (TypeError, ValueError):
-        return {}
-
-
-def _upload_row_get_str(row_values_dict, *header_names):
-    """First non-empty cell matching any header name (case-insensitive)."""
-    if not row_values_dict:
-        return ''
-    for name in header_names:
-        v = row_values_dict.get(name)
-        if v is not None and str(v).strip():
-            return str(v).strip()
-    lower_to_key = {str(k).lower(): k for k in row_values_dict}
-    for name in header_names:
-        key = lower_to_key.get(str(name).lower())
-        if key is None:
-            continue
-        v = row_values_dict.get(key)
-        if v is not None and str(v).strip():
-            return str(v).strip()
-    return ''
-
-
-def _upload_norm_m2m_csv(value):
-    if value is None:
-        return ''
-    parts = [
-        p.strip()
-        for p in str(value).replace('，', ',').split(',')
-        if p and str(p).strip()
-    ]
-    return ', '.join(sorted(parts, key=str.lower))
-
-
-def _upload_preview_scalar(val):
-    if val is None:
-        return None
-    if isinstance(val, bool):
-        return 'Yes' if val else 'No'
-    if isinstance(val, Decimal):
-        s = format(val, 'f').rstrip('0').rstrip('.')
-        return s or '0'
-    if isinstance(val, (int, float)) and not isinstance(val, bool):
-        return str(val)
-    text = str(val).strip()
-    return text if text else None
-
-
-def _upload_preview_description_short(html_val, max_len=120):
-    if not html_val:
-        return None
-    plain = re.sub(r'<[^>]+>', ' ', str(html_val))
-    plain = re.sub(r'\s+', ' ', plain).strip()
-    if not plain:
-        return None
-    if len(plain) > max_len:
-        return plain[: max_len - 1] + '…'
-    return plain
-
-
-def _upload_categories_db_csv(product):
-    return ', '.join(sorted(product.categories.values_list('name', flat=True)))
-
-
-def _upload_suppliers_db_csv(product):
-    return ', '.join(sorted(product.suppliers.values_list('name', flat=True)))
-
-
-def build_product_upload_row_changes(row_result):
-    """Build a list of {field, label, old, new} for the upload confirmation modal."""
-    changes = []
-    instance = None
-    for attr in ('instance', 'object'):
-        instance = getattr(row_result, attr, None)
-        if instance is not None:
-            break
-    if instance is None:
-        return changes
-
-    rv = _upload_row_values_dict(row_result)
-    itype = str(getattr(row_result, 'import_type', '') or '').lower()
-
-    if itype == 'new':
-        changes.append({
-            'field': '_action',
-            'label': 'Action',
-            'old': None,
-            'new': 'Create new product',
-        })
-        for attr, label in (
-            ('sku', 'SKU'),
-            ('name', 'Name'),
-            ('origin_country', 'Origin country'),
-            ('display_order', 'Display order'),
-            ('members_only', 'Members only'),
-            ('selling_price', 'Selling price'),
-            ('profit_margin', 'Profit margin'),
-        ):
-            disp = _upload_preview_scalar(getattr(instance, attr, None))
-            if disp is not None:
-                changes.append({'field': attr, 'label': label, 'old': None, 'new': disp})
-        desc = _upload_preview_description_short(getattr(instance, 'description', None))
-        if desc:
-            changes.append({'field': 'description', 'label': 'Description', 'old': None, 'new': desc})
-        cat_raw = _upload_row_get_str(rv, 'categories', 'Categories')
-        if cat_raw:
-            changes.append({'field': 'categories', 'label': 'Categories', 'old': None, 'new': cat_raw})
-        sup_raw = _upload_row_get_str(rv, 'suppliers', 'Suppliers')
-        if sup_raw:
-            changes.append({'field': 'suppliers', 'label': 'Suppliers', 'old': None, 'new': sup_raw})
-        return changes
-
-    if itype == 'update' and instance.pk:
-        try:
-            old = Product.objects.prefetch_related('categories', 'suppliers').get(pk=instance.pk)
-        except Product.DoesNotExist:
-            return changes
-
-        for attr, label in (
-            ('sku', 'SKU'),
-            ('name', 'Name'),
-            ('origin_country', 'Origin country'),
-            ('display_order', 'Display order'),
-            ('members_only', 'Members only'),
-            ('selling_price', 'Selling price'),
-            ('profit_margin', 'Profit margin'),
-        ):
-            o_val = _upload_preview_scalar(getattr(old, attr, None))
-            n_val = _upload_preview_scalar(getattr(instance, attr, None))
-            if o_val != n_val:
-                changes.append({'field': attr, 'label': label, 'old': o_val or '—', 'new': n_val or '—'})
-
-        o_desc = _upload_preview_description_short(old.description)
-        n_desc = _upload_preview_description_short(instance.description)
-        if o_desc != n_desc:
-            changes.append({
-                'field': 'description',
-                'label': 'Description',
-                'old': o_desc or '—',
-                'new': n_desc or '—',
-            })
-
-        old_c = _upload_categories_db_csv(old)
-        new_c = _upload_categories_db_csv(instance)
-        cat_raw = _upload_row_get_str(rv, 'categories', 'Categories')
-        categories_differ = _upload_norm_m2m_csv(old_c) != _upload_norm_m2m_csv(new_c)
-        if categories_differ or (
-            cat_raw and _upload_norm_m2m_csv(cat_raw) != _upload_norm_m2m_csv(old_c)
-        ):
-            new_disp = cat_raw if cat_raw else (new_c or '—')
-            changes.append({
-                'field': 'categories',
-                'label': 'Categories',
-                'old': old_c or '—',
-                'new': new_disp,
-            })
-
-        old_s = _upload_suppliers_db_csv(old)
-        new_s = _upload_suppliers_db_csv(instance)
-        sup_raw = _upload_row_get_str(rv, 'suppliers', 'Suppliers')
-        suppliers_differ = _upload_norm_m2m_csv(old_s) != _upload_norm_m2m_csv(new_s)
-        if suppliers_differ or (
-            sup_raw and _upload_norm_m2m_csv(sup_raw) != _upload_norm_m2m_csv(old_s)
-        ):
-            new_disp = sup_raw if sup_raw else (new_s or '—')
-            changes.append({
-                'field': 'suppliers',
-                'label': 'Suppliers',
-                'old': old_s or '—',
-                'new': new_disp,
-            })
-
-    return changes
-
-
 @staff_required
 def upload_products(request):
     """
-    AJAX-only, two-step product upload:
-    1) Preview (dry_run) with temp file and first 10 rows.
-    2) Confirm import using stored temp file path.
+    AJAX-only, two-step product upload, each step a background job (product.tasks):
+    1) Preview: the file is stored with a product.upload_preview job (dry run, first rows).
+    2) Confirm: upload_job_id (the finished preview job) → product.upload_import job.
+    Both steps respond 202 with the job to poll.
     """
     if request.method != 'POST' or request.headers.get('X-Requested-With') != 'XMLHttpRequest':
         return JsonResponse({'success': False, 'error': 'Invalid request method.'}, status=400)
 
-    try:
-        confirm_flag = request.POST.get('confirm', 'false').lower() == 'true'
-        product_resource = ProductResource()
-
-        # --- Phase 2: Confirm & Import ---
-        if confirm_flag:
-            temp_file_path = request.POST.get('temp_file_path')
-            if not temp_file_path:
-                return JsonResponse({'success': False, 'error': 'Missing temp_file_path.'}, status=400)
-
-            if not os.path.exists(temp_file_path):
-                return JsonResponse({'success': False, 'error': 'Temporary file not found. Please re-upload.'}, status=400)
-
-            try:
-                dataset = Dataset()
-                # Determine format based on extension
-                if temp_file_path.endswith('.csv'):
-                    with open(temp_file_path, 'rb') as f:
-                        file_content = f.read()
-                    try:
-                        decoded_content = file_content.decode('utf-8')
-                    except UnicodeDecodeError:
-                        logger.warning("[upload_products] UTF-8 decode failed for temp CSV, falling back to latin-1.")
-                        decoded_content = file_content.decode('latin-1')
-                    dataset.load(decoded_content, format='csv')
-                else:
-                    with open(temp_file_path, 'rb') as f:
-                        dataset.load(f.read(), format='xlsx')
-
-                logger.info(f"[upload_products] Loaded dataset from temp file for final import: {temp_file_path}")
-
-                with transaction.atomic():
-                    result = product_resource.import_data(dataset, dry_run=False, use_transactions=True)
-
-                os.remove(temp_file_path)
-                logger.info("[upload_products] Final import successful, temp file removed.")
-
-                if result.has_errors() or result.has_validation_errors():
-                    logger.warning("[upload_products] Final import reported errors after dry-run success.")
-                return JsonResponse({'success': True, 'message': 'Imported successfully!'})
-
-            except Exception as e:
-                logger.error(f"[upload_products] Error during confirm import: {e}", exc_info=True)
-                # Best-effort cleanup
-                try:
-                    if os.path.exists(temp_file_path):
-                        os.remove(temp_file_path)
-                except Exception:
-                    pass
-                return JsonResponse({'success': False, 'error': str(e)}, status=500)
-
-        # --- Phase 1: Preview / Dry Run ---
-        upload_file = request.FILES.get('file')
-        if upload_file is None:
-            return JsonResponse({'success': False, 'error': 'No file uploaded.'}, status=400)
-
-        filename = upload_file.name
-        logger.info(f"[upload_products] Preview requested for file: {filename}")
-
-        if not filename.endswith(('.csv', '.xls', '.xlsx')):
-            return JsonResponse({'success': False, 'error': 'Invalid file format. Please upload a .csv, .xls, or .xlsx file.'}, status=400)
-
-        # Save to a secure temporary file
+    # --- Phase 2: Confirm & Import ---
+    if request.POST.get('confirm', 'false').lower() == 'true':
         try:
-            suffix = os.path.splitext(filename)[1] or ''
-            fd, temp_path = tempfile.mkstemp(prefix='product_upload_', suffix=suffix)
-            with os.fdopen(fd, 'wb') as tmp:
-                for chunk in upload_file.chunks():
-                    tmp.write(chunk)
-            logger.info(f"[upload_products] Temp file created at: {temp_path}")
-        except Exception as e:
-            logger.error(f"[upload_products] Failed to create temp file: {e}", exc_info=True)
-            return JsonResponse({'success': False, 'error': 'Could not save uploaded file for processing.'}, status=500)
-
-        try:
-            dataset = Dataset()
-            if filename.endswith('.csv'):
-                with open(temp_path, 'rb') as f:
-                    file_content = f.read()
-                try:
-                    decoded_content = file_content.decode('utf-8')
-                except UnicodeDecodeError:
-                    logger.warning("[upload_products] UTF-8 decode failed for CSV, falling back to latin-1.")
-                    decoded_content = file_content.decode('latin-1')
-                dataset.load(decoded_content, format='csv')
-            else:
-                with open(temp_path, 'rb') as f:
-                    dataset.load(f.read(), format='xlsx')
-            logger.info("[upload_products] Dataset loaded from temp file for preview.")
-        except Exception as e:
-            logger.error(f"[upload_products] Error reading temp file into dataset: {e}", exc_info=True)
-            try:
-                os.remove(temp_path)
-            except Exception:
-                pass
-            return JsonResponse({'success': False, 'error': f'Error reading file: {e}'}, status=500)
-
-        # Perform dry run
-        try:
-            result = product_resource.import_data(dataset, dry_run=True, use_transactions=True)
-        except Exception as e:
-            logger.error(f"[upload_products] Error during dry run import: {e}", exc_info=True)
-            try:
-                os.remove(temp_path)
-            except Exception:
-                pass
-            return JsonResponse({'success': False, 'error': f'Error validating file: {e}'}, status=500)
-
-        # Check for hard errors first
-        if result.has_errors():
-            try:
-                os.remove(temp_path)
-            except Exception:
-                pass
-            errors = []
-            try:
-                for err in result.row_errors():
-                    row_num, row_errors_list = err[0], err[1]
-                    if row_errors_list:
-                        first_err = row_errors_list[0]
-                        err_msg = getattr(first_err, 'error', str(first_err))
-                    else:
-                        err_msg = "Unknown error"
-                    errors.append(f"Row {row_num}: {err_msg}")
-            except Exception as e:
-                errors.append(str(e))
-            return JsonResponse({
-                'success': False,
-                'error': "Import errors found.",
-                'details': errors
-            }, status=400)
-
-        # Build dataset row dicts once for fallback (same order as result.rows)
-        headers = list(dataset.headers) if dataset.headers else []
-        dataset_row_dicts = [dict(zip(headers, row)) for row in dataset]
-
-        # Safely generate preview data
-        preview_rows = []
-        valid_rows_count = 0
-
-        for idx, row_result in enumerate(result.rows):
-            itype = getattr(row_result, 'import_type', None)
-            if itype is None or str(itype).lower() not in ('new', 'update'):
-                continue
-            valid_rows_count += 1
-
-            final_sku = None
-            final_name = None
-
-            # 1. Primary: generated model instance (django-import-export may use .instance or .object)
-            for attr in ('instance', 'object'):
-                obj = getattr(row_result, attr, None)
-                if obj is not None:
-                    final_sku = getattr(obj, 'sku', None)
-                    final_name = getattr(obj, 'name', None)
-                    if final_sku or final_name:
-                        break
-
-            # 2. Fallback: raw row dict (raw_values / row_values; may be dict or OrderedDict)
-            if not final_sku or not final_name:
-                raw_dict = getattr(row_result, 'raw_values', None) or getattr(row_result, 'row_values', None)
-                if raw_dict is not None and not isinstance(raw_dict, dict):
-                    raw_dict = dict(raw_dict) if hasattr(raw_dict, 'items') else {}
-                elif raw_dict is None:
-                    raw_dict = {}
-                final_sku = final_sku or (raw_dict.get('sku') if raw_dict else None)
-                final_name = final_name or (raw_dict.get('name') if raw_dict else None)
-
-            # 3. Fallback: same row from the dataset we imported (name + recompute SKU to match before_import_row)
-            if (not final_sku or not final_name) and idx < len(dataset_row_dicts):
-                row_dict = dataset_row_dicts[idx]
-                final_name = final_name or row_dict.get('name') or 'Unknown'
-                final_sku = final_sku or ProductResource.get_effective_sku_for_row(row_dict) or 'N/A'
-
-            final_sku = final_sku or 'N/A'
-            final_name = final_name or 'Unknown'
-
-            instance = None
-            for attr in ('instance', 'object'):
-                instance = getattr(row_result, attr, None)
-                if instance is not None:
-                    break
-            price_disp = _upload_preview_scalar(
-                getattr(instance, 'selling_price', None) if instance else None
+            preview_job = Job.objects.get(
+                pk=request.POST.get('upload_job_id'),
+                kind='product.upload_preview',
+                status=Job.Status.SUCCEEDED,
+                created_by=request.user,
             )
+        except (Job.DoesNotExist, ValidationError, ValueError):
+            preview_job = None
+        if preview_job is None or not preview_job.input_file:
+            return JsonResponse({'success': False, 'error': 'Uploaded file not found. Please re-upload.'}, status=400)
+        job = enqueue('product.upload_import', user=request.user, payload={'preview_job_id': str(preview_job.pk)})
+        return job_accepted_response(job)
 
-            preview_rows.append({
-                'status': str(itype).upper() if itype is not None else 'NEW',
-                'name': final_name,
-                'generated_sku': final_sku,
-                'price': price_disp,
-                'changes': build_product_upload_row_changes(row_result),
-            })
+    # --- Phase 1: Preview / Dry Run ---
+    upload_file = request.FILES.get('file')
+    if upload_file is None:
+        return JsonResponse({'success': False, 'error': 'No file uploaded.'}, status=400)
 
-        # Check if valid_rows_count is 0 but we have validation errors
-        if valid_rows_count == 0 and result.has_validation_errors():
-            try:
-                os.remove(temp_path)
-            except Exception:
-                pass
-            return JsonResponse({
-                'success': False,
-                'error': "All rows failed validation.",
-                'details': ["Check file formatting."]
-            }, status=400)
+    filename = upload_file.name
+    logger.info(f"[upload_products] Preview requested for file: {filename}")
 
-        return JsonResponse({
-            'success': True,
-            'require_confirmation': True,
-            'temp_file_path': temp_path,
-            'total_rows': valid_rows_count,
-            'preview_data': preview_rows[:15],
-        })
+    if not filename.endswith(('.csv', '.xls', '.xlsx')):
+        return JsonResponse({'success': False, 'error': 'Invalid file format. Please upload a .csv, .xls, or .xlsx file.'}, status=400)
 
-    except Exception as e:
-        logger.error(f"[upload_products] Unexpected error: {e}", exc_info=True)
-        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+    job = enqueue('product.upload_preview', user=request.user, payload={'filename': filename}, input_file=upload_file)
+    return job_accepted_response(job)
 
 
 @staff_required
@@ -719,40 +348,17 @@ def scrape_website_products(request):
 @staff_required
 def export_products_xlsx(request):
     """
-    Export products to an Excel (.xlsx) workbook (native Unicode; symbols like ® display correctly).
+    Export products to an Excel (.xlsx) workbook in a background job (product.export_xlsx);
+    responds 202 with the job whose file the browser downloads when it finishes.
 
     Query parameter `ids`: comma-separated product PKs. When present and valid, only those rows
     are exported; otherwise all products are exported.
     """
-    logger.info("[export_products_xlsx] View called. Starting export.")
-    try:
-        product_resource = ProductResource()
-        queryset = Product.objects.all().order_by('name')
-        ids_param = (request.GET.get('ids') or '').strip()
-        id_list = []
-        if ids_param:
-            id_list = [int(p) for p in ids_param.split(',') if p.strip().isdigit()]
-            if id_list:
-                queryset = Product.objects.filter(id__in=id_list).order_by('name')
-
-        dataset = product_resource.export(queryset)
-        xlsx_bytes = dataset.export('xlsx')
-        response = HttpResponse(
-            xlsx_bytes,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        )
-        today = datetime.date.today()
-        if id_list:
-            filename = f"products-selected-{today}.xlsx"
-        else:
-            filename = f"products-{today}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        logger.info(f"[export_products_xlsx] Successfully created XLSX: {filename}")
-        return response
-    except Exception as e:
-        logger.error(f"[export_products_xlsx] Error during export: {e}", exc_info=True)
-        messages.error(request, f"An error occurred during export: {e}")
-        return redirect(reverse('core:manage_dashboard') + '#products')
+    ids_param = (request.GET.get('ids') or '').strip()
+    id_list = [int(p) for p in ids_param.split(',') if p.strip().isdigit()] if ids_param else []
+    job = enqueue('product.export_xlsx', user=request.user, payload={'ids': id_list})
+    logger.info(f"[export_products_xlsx] Export queued as job {job.pk}.")
+    return job_accepted_response(job)
 
 def _save_product_content_sections(product, sections_json):
     """Replace product content sections from JSON payload (shared by create/edit)."""
@@ -875,7 +481,7 @@ def api_manage_products(request):
     if not request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({'error': 'Invalid request'}, status=400)
 
-    search_query = request.GET.get('search', '')
+    search_query = request.GET.get('search', '').strip()
     group_filter = request.GET.get('group', '')
     category_filter = request.GET.get('category', '')
     supplier_ids = _parse_supplier_ids(request.GET.get('supplier', ''))
@@ -897,13 +503,8 @@ def api_manage_products(request):
             queryset=Category.objects.select_related('group').order_by('display_order', 'name'),
         ),
         'suppliers',
-        Prefetch(
-            'quotationitem_set',
-            queryset=QuotationItem.objects.select_related('quotation', 'quotation__supplier')
-                                          .prefetch_related('quotation__items')
-                                          .order_by('-quotation__date_quoted'),
-            to_attr='latest_quotation_items'
-        ),
+        'gallery_images',
+        base_cost_snapshot_prefetch(),
         Prefetch(
             'price_tiers',
             queryset=ProductPriceTier.objects.order_by('min_quantity'),
@@ -911,11 +512,7 @@ def api_manage_products(request):
     )
 
     if search_query:
-        queryset = queryset.filter(
-            Q(name__icontains=search_query)
-            | Q(sku__icontains=search_query)
-            | Q(alias_name__icontains=search_query)
-        )
+        queryset = search_products(queryset, search_query)
     if group_filter:
         queryset = queryset.filter(categories__group__name=group_filter)
     if category_filter:
@@ -953,6 +550,8 @@ def api_manage_products(request):
 
     if order_cols:
         queryset = queryset.order_by(*order_cols, 'display_order', 'name')
+    elif search_query:
+        queryset = queryset.order_by('-search_rank', 'display_order', 'name')
     else:
         queryset = queryset.order_by('display_order', 'name')
 
@@ -962,8 +561,11 @@ def api_manage_products(request):
     except EmptyPage:
         return JsonResponse({'items': [], 'pagination': {}})
 
+    page_products = list(page_obj.object_list)
+    costs_by_product = get_supplier_costs_for_products([product.pk for product in page_products])
+
     serialized_products = []
-    for product in page_obj.object_list:
+    for product in page_products:
         category_list = [cat.name for cat in product.categories.all()]
         group_list = [cat.group.name for cat in product.categories.all() if cat.group]
 
@@ -971,13 +573,11 @@ def api_manage_products(request):
         m2m_supplier_list = [s.name for s in product.suppliers.all()]
         supplier_costs = [
             {k: v for k, v in sc.items() if k not in ('source', 'updated_at')}
-            for sc in get_product_supplier_costs(product)
+            for sc in costs_by_product.get(product.pk, [])
         ]
 
-        reconcile_saved_base_cost_with_quotations(product, supplier_costs)
-        product.refresh_from_db(
-            fields=["saved_base_cost", "saved_base_cost_supplier_id"]
-        )
+        # Read-only: saved_base_cost is reconciled in the background by the
+        # reconcile_saved_base_costs command (products are queued when their costs change).
 
         # For the "Suppliers" column in Manage Products, we want to reflect all
         # suppliers that currently have pricing for this product, not just those
@@ -1020,7 +620,7 @@ def api_manage_products(request):
             'featured_image_alt': product.featured_image.alt_text if product.featured_image else product.name,
             'featured_image_id': product.featured_image_id,
             'featured_image_title': product.featured_image.title if product.featured_image else None,
-            'gallery_image_ids': list(product.gallery_images.all().values_list('id', flat=True)),
+            'gallery_image_ids': [image.id for image in product.gallery_images.all()],
             'is_best_seller': product.is_best_seller, # --- NEW: Included in API response ---
         }
         serialized_products.append(product_data)
@@ -1062,163 +662,6 @@ def api_update_product_display_order(request):
     return JsonResponse({"success": True, "id": product_id, "display_order": display_order})
 
 
-_VARIANT_TOKEN_PATTERN = re.compile(
-    r"\b(\d+(?:\.\d+)?)\s*(mg|g|ml|mcg|µg|ug|iu|u|unit|units|stk|st|pen|pack|pcs|pc|tablet|tab|capsule|cap|vial|dose|mg/ml)\b",
-    re.IGNORECASE,
-)
-
-
-def _normalize_product_name_for_fuzzy(value):
-    """
-    Helper for cleaning product names before fuzzy comparison.
-    - Use only part before '|' (English name)
-    - Normalise common unit patterns (100u, 100 Unit -> 100unit)
-    - Strip special characters
-    - Lowercase and collapse whitespace
-    """
-    if not value:
-        return "", []
-    base = str(value).split("|", 1)[0]
-    base = re.sub(
-        r"(\d+)\s*(u|unit|units)\b",
-        r"\1unit",
-        base,
-        flags=re.IGNORECASE,
-    )
-    cleaned = re.sub(r"[^a-zA-Z0-9\s]", " ", base).lower()
-    tokens = [t for t in cleaned.split() if t]
-    return " ".join(tokens), tokens
-
-
-def _extract_variant_tokens(value):
-    """Strength/dose/pack-size tokens that distinguish product variants (e.g. 10mg vs 15mg)."""
-    if not value:
-        return frozenset()
-    base = str(value).split("|", 1)[0]
-    base = re.sub(
-        r"(\d+)\s*(u|unit|units)\b",
-        r"\1unit",
-        base,
-        flags=re.IGNORECASE,
-    )
-    tokens = set()
-    for match in _VARIANT_TOKEN_PATTERN.finditer(base):
-        num = match.group(1)
-        unit = match.group(2).lower()
-        if unit in ("u", "unit", "units"):
-            unit = "unit"
-        tokens.add(f"{num}{unit}")
-    return frozenset(tokens)
-
-
-def _product_base_key(name):
-    """Bucket key: normalized name with strength/dose tokens removed."""
-    if not name:
-        return ()
-    base = str(name).split("|", 1)[0]
-    base = re.sub(
-        r"(\d+)\s*(u|unit|units)\b",
-        r"\1unit",
-        base,
-        flags=re.IGNORECASE,
-    )
-    base = _VARIANT_TOKEN_PATTERN.sub(" ", base)
-    cleaned = re.sub(r"[^a-zA-Z0-9\s]", " ", base).lower()
-    return tuple(sorted(t for t in cleaned.split() if t))
-
-
-def _variant_tokens_compatible(variant_a, variant_b):
-    """Duplicates must share the same strength/dose signature (or both lack one)."""
-    return variant_a == variant_b
-
-
-def _name_similarity(tokens_a, tokens_b):
-    """Simple token-overlap similarity between two token lists."""
-    if not tokens_a or not tokens_b:
-        return 0.0
-    set_a = set(tokens_a)
-    set_b = set(tokens_b)
-    overlap = len(set_a & set_b)
-    return (2.0 * overlap) / (len(set_a) + len(set_b))
-
-
-def _products_are_merge_candidates(name_a, name_b, *, min_score=0.7):
-    """True when two product names look like duplicates, not merely same brand/dose line."""
-    tokens_a = _normalize_product_name_for_fuzzy(name_a)[1]
-    tokens_b = _normalize_product_name_for_fuzzy(name_b)[1]
-    if not tokens_a or not tokens_b:
-        return False
-    variant_a = _extract_variant_tokens(name_a)
-    variant_b = _extract_variant_tokens(name_b)
-    if not _variant_tokens_compatible(variant_a, variant_b):
-        return False
-    return _name_similarity(tokens_a, tokens_b) >= min_score
-
-
-def _build_merge_candidate_groups(products, *, min_score=0.7):
-    """
-    Group products into duplicate merge candidates using base-name bucketing
-    and variant-aware similarity checks.
-    """
-    if len(products) < 2:
-        return []
-
-    norm_tokens = {}
-    variant_tokens = {}
-    base_keys = {}
-    for product in products:
-        _, tokens = _normalize_product_name_for_fuzzy(product.name)
-        norm_tokens[product.id] = tokens
-        variant_tokens[product.id] = _extract_variant_tokens(product.name)
-        base_keys[product.id] = _product_base_key(product.name)
-
-    buckets = {}
-    for product in products:
-        key = base_keys.get(product.id) or ()
-        buckets.setdefault(key, []).append(product)
-
-    adjacency = {product.id: set() for product in products}
-    for bucket in buckets.values():
-        if len(bucket) < 2:
-            continue
-        for i in range(len(bucket)):
-            product_a = bucket[i]
-            tokens_a = norm_tokens.get(product_a.id) or []
-            variant_a = variant_tokens.get(product_a.id, frozenset())
-            if not tokens_a:
-                continue
-            for j in range(i + 1, len(bucket)):
-                product_b = bucket[j]
-                tokens_b = norm_tokens.get(product_b.id) or []
-                variant_b = variant_tokens.get(product_b.id, frozenset())
-                if not tokens_b or not _variant_tokens_compatible(variant_a, variant_b):
-                    continue
-                if _name_similarity(tokens_a, tokens_b) >= min_score:
-                    adjacency[product_a.id].add(product_b.id)
-                    adjacency[product_b.id].add(product_a.id)
-
-    product_by_id = {product.id: product for product in products}
-    visited = set()
-    groups = []
-    for product in products:
-        if product.id in visited:
-            continue
-        stack = [product.id]
-        component_ids = []
-        while stack:
-            pid = stack.pop()
-            if pid in visited:
-                continue
-            visited.add(pid)
-            component_ids.append(pid)
-            stack.extend(adjacency.get(pid, []))
-        if len(component_ids) >= 2:
-            component_products = [product_by_id[pid] for pid in component_ids if pid in product_by_id]
-            component_products.sort(key=lambda item: item.name.lower())
-            groups.append(component_products)
-    return groups
-
-
 def _serialize_merge_group(products):
     return {
         "group_id": min(product.id for product in products),
@@ -1244,6 +687,9 @@ def api_product_merge_suggestions(request):
     - product_ids: comma-separated IDs — scan only within this selection (Manage Products checkboxes)
     - search: optional name/SKU filter when scanning the full catalog
     - min_score: similarity threshold (default 0.7)
+    - page, page_size: groups are paginated (default 50 per page, max 200)
+
+    Groups come from the precomputed duplicate index (product.duplicates), not a catalog scan.
     """
     if request.headers.get("X-Requested-With") != "XMLHttpRequest":
         return JsonResponse({"error": "Invalid request"}, status=400)
@@ -1266,47 +712,48 @@ def api_product_merge_suggestions(request):
             except ValueError:
                 continue
 
-    qs = Product.objects.prefetch_related("suppliers").only("id", "name", "sku", "selling_price")
+    try:
+        page = max(int(request.GET.get("page", "1")), 1)
+        page_size = min(max(int(request.GET.get("page_size", "50")), 1), 200)
+    except ValueError:
+        page, page_size = 1, 50
+
     selection_mode = len(scoped_product_ids) >= 2
+    within = None
     if selection_mode:
-        qs = qs.filter(pk__in=scoped_product_ids)
+        within = scoped_product_ids
     elif search_query:
-        qs = qs.filter(Q(name__icontains=search_query) | Q(sku__icontains=search_query))
-    products = list(qs.order_by("name"))
-
-    raw_groups = _build_merge_candidate_groups(products, min_score=min_score)
-    groups = [_serialize_merge_group(group_products) for group_products in raw_groups]
-
-    if selection_mode and not groups and len(products) >= 2:
-        groups = [{
-            "group_id": f"selected-{min(product.id for product in products)}",
-            "products": [
-                {
-                    "id": product.id,
-                    "sku": product.sku or "",
-                    "name": product.name,
-                    "selling_price": str(product.selling_price) if product.selling_price is not None else None,
-                    "suppliers": [supplier.name for supplier in product.suppliers.all()],
-                }
-                for product in sorted(products, key=lambda item: item.name.lower())
-            ],
-        }]
+        within = search_products(Product.objects.all(), search_query, rank=False).values("pk")
 
-    # Exclude groups that exactly match a previously dismissed combination (Duplicate Checklist memory)
-    ignored_signatures = set(
-        IgnoredMergeSuggestion.objects.values_list("product_ids_signature", flat=True)
+    # Components of the precomputed candidate pairs; groups matching a dismissed
+    # combination (Duplicate Checklist memory) are dropped and the page is sliced in SQL.
+    suggestions = merge_candidate_page(
+        min_score=min_score, within=within, offset=(page - 1) * page_size, limit=page_size,
     )
-    filtered_groups = []
-    for group in groups:
-        ids = sorted(product["id"] for product in group["products"])
-        signature = ",".join(str(product_id) for product_id in ids)
-        if signature not in ignored_signatures:
-            filtered_groups.append(group)
+    total_groups = suggestions.total
+
+    products_qs = Product.objects.prefetch_related("suppliers").only("id", "name", "sku", "selling_price")
+    product_by_id = products_qs.in_bulk([pid for ids in suggestions.groups for pid in ids])
+    groups = [
+        _serialize_merge_group(sorted(
+            (product_by_id[pid] for pid in ids if pid in product_by_id), key=lambda item: item.name.lower(),
+        ))
+        for ids in suggestions.groups
+    ]
+
+    if selection_mode and not suggestions.found:
+        products = sorted(products_qs.filter(pk__in=scoped_product_ids), key=lambda item: item.name.lower())
+        selected_ids = [product.id for product in products]
+        if len(products) >= 2 and not dismissed_signatures([selected_ids]):
+            groups = [dict(_serialize_merge_group(products), group_id=f"selected-{min(selected_ids)}")]
 
     return JsonResponse({
-        "groups": filtered_groups,
+        "groups": groups,
         "mode": "selection" if selection_mode else "scan",
         "selection_count": len(scoped_product_ids) if selection_mode else 0,
+        "page": page,
+        "has_next": page * page_size < total_groups,
+        "total_groups": total_groups,
     })
 
 
@@ -1348,7 +795,7 @@ def api_merge_products(request):
     from inventory.models import SupplierPriceMatrixEntry
 
     try:
-        with transaction.atomic():
+        with transaction.atomic(), deferred_cost_snapshot_refresh():
             # 1) Merge many-to-many relations on the primary (categories, suppliers, gallery)
             for s in secondaries:
                 primary.categories.add(*s.categories.all())
@@ -1361,6 +808,8 @@ def api_merge_products(request):
             InventoryBatch.objects.filter(product__in=secondaries).update(product=primary)
             OrderItem.objects.filter(product__in=secondaries).update(product=primary)
             ProductContentSection.objects.filter(product__in=secondaries).update(product=primary)
+            # queryset.update() skips model signals: the moved cost lines need a snapshot refresh.
+            request_cost_snapshot_refresh([primary.pk])
 
             for entry in SupplierPriceMatrixEntry.objects.filter(product__in=secondaries):
                 duplicate = SupplierPriceMatrixEntry.objects.filter(
@@ -1481,7 +930,7 @@ def api_ignore_merge_suggestion(request):
         ids = sorted(int(i) for i in product_ids)
     except (TypeError, ValueError):
         return JsonResponse({"success": False, "error": "product_ids must be a list of integers."}, status=400)
-    signature = ",".join(str(i) for i in ids)
+    signature = group_signature(ids)
     if len(signature) > 500:
         return JsonResponse({"success": False, "error": "Too many product IDs."}, status=400)
     IgnoredMergeSuggestion.objects.get_or_create(
@@ -1494,7 +943,8 @@ def api_ignore_merge_suggestion(request):
 @staff_required
 def api_product_search(request):
     """
-    GET ?search=...&limit=50. Returns products matching name or SKU (for Duplicate Checklist custom group).
+    GET ?search=...&limit=50. Returns products matching name, alias, SKU or description,
+    best match first (for Duplicate Checklist custom group).
     """
     if request.headers.get("X-Requested-With") != "XMLHttpRequest":
         return JsonResponse({"error": "Invalid request"}, status=400)
@@ -1505,8 +955,10 @@ def api_product_search(request):
         limit = 50
     qs = Product.objects.all().only("id", "name", "sku", "selling_price")
     if search_query:
-        qs = qs.filter(Q(name__icontains=search_query) | Q(sku__icontains=search_query))
-    products = list(qs.order_by("name")[:limit])
+        qs = search_products(qs, search_query)
+    else:
+        qs = qs.order_by("name")
+    products = list(qs[:limit])
     return JsonResponse({
         "products": [
             {
@@ -1685,13 +1137,7 @@ def api_get_product_details(request, sku):
     try:
         product = Product.objects.prefetch_related(
             'gallery_images',
-            Prefetch(
-                'quotationitem_set',
-                queryset=QuotationItem.objects.select_related('quotation')
-                                              .prefetch_related('quotation__items')
-                                              .order_by('-quotation__date_quoted'),
-                to_attr='latest_quotation_items'
-            )
+            base_cost_snapshot_prefetch(),
         ).select_related('featured_image').get(sku=sku)
     except Product.DoesNotExist:
         return JsonResponse({'error': 'Product not found'}, status=404)
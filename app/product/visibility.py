@@ -0,0 +1,160 @@
+# distributorplatform/app/product/visibility.py
+# Maintain and query the materialized ProductVisibility table (catalog ACL).
+from __future__ import annotations
+
+from django.db import transaction
+
+from user.utils import user_group_ids
+
+
+def _group_category_pairs(group_ids=None, category_ids=None):
+    from user.models import UserGroup
+
+    through = UserGroup.product_categories.through
+    qs = through.objects.all()
+    if group_ids is not None:
+        qs = qs.filter(usergroup_id__in=group_ids)
+    if category_ids is not None:
+        qs = qs.filter(category_id__in=category_ids)
+    return list(qs.values_list('usergroup_id', 'category_id'))
+
+
+def _category_product_pairs(category_ids=None, product_ids=None):
+    from product.models import Product
+
+    through = Product.categories.through
+    qs = through.objects.all()
+    if category_ids is not None:
+        qs = qs.filter(category_id__in=category_ids)
+    if product_ids is not None:
+        qs = qs.filter(product_id__in=product_ids)
+    return list(qs.values_list('category_id', 'product_id'))
+
+
+def _apply_group_rows(existing_qs, desired: set[tuple[int, int]]) -> None:
+    """Diff (user_group_id, product_id) rows in existing_qs against desired and write the delta."""
+    from product.models import ProductVisibility
+
+    existing = dict(
+        ((group_id, product_id), pk)
+        for pk, group_id, product_id in existing_qs.values_list('pk', 'user_group_id', 'product_id')
+    )
+    stale_pks = [pk for pair, pk in existing.items() if pair not in desired]
+    if stale_pks:
+        ProductVisibility.objects.filter(pk__in=stale_pks).delete()
+    missing = [pair for pair in desired if pair not in existing]
+    if missing:
+        ProductVisibility.objects.bulk_create(
+            [ProductVisibility(user_group_id=g, product_id=p) for g, p in missing],
+            ignore_conflicts=True,
+            batch_size=1000,
+        )
+
+
+def rebuild_group_visibility(group_ids) -> None:
+    """Recompute every visibility row for the given UserGroups."""
+    from product.models import ProductVisibility
+
+    group_ids = list({int(g) for g in group_ids})
+    if not group_ids:
+        return
+    group_categories = _group_category_pairs(group_ids=group_ids)
+    category_ids = {c for _, c in group_categories}
+    products_by_category: dict[int, list[int]] = {}
+    for category_id, product_id in _category_product_pairs(category_ids=category_ids):
+        products_by_category.setdefault(category_id, []).append(product_id)
+    desired = {
+        (group_id, product_id)
+        for group_id, category_id in group_categories
+        for product_id in products_by_category.get(category_id, ())
+    }
+    with transaction.atomic():
+        _apply_group_rows(ProductVisibility.objects.filter(user_group_id__in=group_ids), desired)
+
+
+def rebuild_product_visibility(product_ids) -> None:
+    """Recompute group rows and the public-bucket row for the given products."""
+    from product.models import Product, ProductVisibility
+
+    product_ids = list({int(p) for p in product_ids})
+    if not product_ids:
+        return
+    category_products = _category_product_pairs(product_ids=product_ids)
+    groups_by_category: dict[int, list[int]] = {}
+    for group_id, category_id in _group_category_pairs(category_ids={c for c, _ in category_products}):
+        groups_by_category.setdefault(category_id, []).append(group_id)
+    desired = {
+        (group_id, product_id)
+        for category_id, product_id in category_products
+        for group_id in groups_by_category.get(category_id, ())
+    }
+    public_ids = set(
+        Product.objects.filter(pk__in=product_ids, members_only=False).values_list('pk', flat=True)
+    )
+    with transaction.atomic():
+        _apply_group_rows(
+            ProductVisibility.objects.filter(product_id__in=product_ids, user_group__isnull=False),
+            desired,
+        )
+        ProductVisibility.objects.filter(
+            product_id__in=product_ids, user_group__isnull=True,
+        ).exclude(product_id__in=public_ids).delete()
+        ProductVisibility.objects.bulk_create(
+            [ProductVisibility(user_group=None, product_id=pid) for pid in public_ids],
+            ignore_conflicts=True,
+        )
+
+
+def rebuild_all_visibility() -> None:
+    """Full rebuild (initial population / repair)."""
+    from product.models import Product, ProductVisibility
+    from user.models import UserGroup
+
+    with transaction.atomic():
+        ProductVisibility.objects.all().delete()
+        rebuild_group_visibility(UserGroup.objects.values_list('pk', flat=True))
+        ProductVisibility.objects.bulk_create(
+            [
+                ProductVisibility(user_group=None, product_id=pid)
+                for pid in Product.objects.filter(members_only=False).values_list('pk', flat=True)
+            ],
+            batch_size=1000,
+        )
+
+
+def visible_product_ids(user):
+    """
+    Subquery of product IDs the visitor may see: the public bucket for guests,
+    otherwise the rows of the user's UserGroups. Use with pk__in for a semi-join.
+    """
+    from product.models import ProductVisibility
+
+    if not user or not user.is_authenticated:
+        return ProductVisibility.objects.filter(user_group__isnull=True).values('product_id')
+    return ProductVisibility.objects.filter(user_group_id__in=user_group_ids(user)).values('product_id')
+
+
+def visible_products(user, queryset=None):
+    """Restrict a Product queryset to what the visitor may see (no DISTINCT needed)."""
+    from product.models import Product
+
+    if queryset is None:
+        queryset = Product.objects.all()
+    return queryset.filter(pk__in=visible_product_ids(user))
+
+
+def visible_category_ids(user):
+    """
+    Subquery of category IDs for navigation and home carousels: categories assigned
+    to the user's groups, or for guests every category holding a public product.
+    """
+    from product.models import Product
+    from user.models import UserGroup
+
+    if not user or not user.is_authenticated:
+        return Product.categories.through.objects.filter(
+            product_id__in=visible_product_ids(user),
+        ).values('category_id')
+    return UserGroup.product_categories.through.objects.filter(
+        usergroup_id__in=user_group_ids(user),
+    ).values('category_id')
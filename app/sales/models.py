@@ -6,7 +6,7 @@ from decimal import Decimal
 import uuid
 
 # Import related models from other apps
-from inventory.models import Quotation, Supplier, InventoryBatch
+from inventory.models import Quotation, Supplier, InventoryBatch, landed_cost_window_annotations
 from product.models import Product
 from user.models import CustomUser # Assuming you might link invoices to users later
 
@@ -131,6 +131,26 @@ class Invoice(models.Model):
     def __str__(self):
         return f"Invoice {self.invoice_id} for {self.supplier.name}"
 
+class InvoiceItemQuerySet(models.QuerySet):
+    def whole_invoices(self):
+        """Every line of the invoices that have a line in this queryset."""
+        return self.model._default_manager.filter(invoice_id__in=self.values('invoice_id'))
+
+    def with_landed_cost(self):
+        """
+        Annotate invoice_total (the subtotal), annotated_transport_cost_per_unit and
+        annotated_landed_cost_per_unit in SQL. As with quotations, the window only
+        sums rows left after WHERE, so apply it to whole invoices.
+        """
+        return self.annotate(**landed_cost_window_annotations('invoice', 'unit_price')).annotate(
+            annotated_landed_cost_per_unit=models.Case(
+                models.When(quantity__gt=0, then=F('unit_price') + F('annotated_transport_cost_per_unit')),
+                default=None,
+                output_field=DecimalField(max_digits=20, decimal_places=4),
+            ),
+        )
+
+
 class InvoiceItem(models.Model):
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(
@@ -162,6 +182,8 @@ class InvoiceItem(models.Model):
         help_text="Line gross in original currency.",
     )
 
+    objects = InvoiceItemQuerySet.as_manager()
+
     @property
     def total_price(self):
         """Calculates the total price for this line item."""
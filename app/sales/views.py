@@ -17,6 +17,7 @@ from core.dates import format_display_date
 from .models import Invoice, InvoiceItem
 
 from inventory.views import staff_required
+from product.cost_snapshot import refresh_cost_snapshots_for_bulk_items
 
 @staff_required
 def api_manage_invoices(request):
@@ -165,6 +166,7 @@ def create_invoice_from_quotation(request, quotation_id):
             for item in order_lines
         ]
         InvoiceItem.objects.bulk_create(invoice_items_to_create)
+        refresh_cost_snapshots_for_bulk_items(invoice_items_to_create)
 
         messages.success(request, f"Successfully created Invoice {invoice.invoice_id} from Quotation {quotation.quotation_id}.")
         return redirect(f"{reverse('core:manage_dashboard')}#invoices")
@@ -0,0 +1,28 @@
+# distributorplatform/app/user/signals.py
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+
+from .models import CustomUser, UserGroup
+from .utils import invalidate_user_group_ids
+
+
+# --- Cached UserGroup IDs (user_group_ids / user_group_fingerprint) ---
+
+@receiver(m2m_changed, sender=CustomUser.user_groups.through)
+def invalidate_user_group_ids_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.user_groups.add/remove/set/clear
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            instance.__dict__.pop('_user_group_ids', None)
+            invalidate_user_group_ids([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        # group.users.add/remove
+        invalidate_user_group_ids(pk_set or [])
+    elif action == 'pre_clear':
+        invalidate_user_group_ids(list(instance.users.values_list('pk', flat=True)))
+
+
+@receiver(pre_delete, sender=UserGroup)
+def invalidate_user_group_ids_on_group_delete(sender, instance, **kwargs):
+    # Deleting a group removes its membership rows without m2m_changed.
+    invalidate_user_group_ids(list(instance.users.values_list('pk', flat=True)))
@@ -1,8 +1,10 @@
 # distributorplatform/app/user/utils.py
 import random
 import logging
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 
 logger = logging.getLogger(__name__)
 
@@ -46,3 +48,67 @@ def send_verification_code(email, code):
                 "Set EMAIL_BACKEND to smtp and configure EMAIL_HOST / credentials in production."
             )
         return False
+
+
+ANONYMOUS_GROUP_FINGERPRINT = 'anonymous'
+# Group IDs per user in the shared cache; user.signals drops the entry when memberships change.
+USER_GROUP_IDS_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _user_group_ids_cache_key(user_pk):
+    return f'user_group_ids:{user_pk}'
+
+
+def user_group_ids(user):
+    """
+    Sorted tuple of the user's UserGroup IDs (empty for guests).
+    Cached per user across requests and memoized on the user object, so an
+    authenticated request normally runs no group query at all.
+    """
+    if not user or not user.is_authenticated:
+        return ()
+    cached = getattr(user, '_user_group_ids', None)
+    if cached is None:
+        key = _user_group_ids_cache_key(user.pk)
+        try:
+            stored = cache.get(key)
+        except Exception:
+            logger.warning('[utils.py] user group cache unavailable', exc_info=True)
+            stored = None
+        if stored is None:
+            cached = tuple(sorted(user.user_groups.values_list('pk', flat=True)))
+            try:
+                cache.set(key, cached, USER_GROUP_IDS_CACHE_TIMEOUT)
+            except Exception:
+                logger.warning('[utils.py] user group cache unavailable', exc_info=True)
+        else:
+            cached = tuple(stored)
+        user._user_group_ids = cached
+    return cached
+
+
+def invalidate_user_group_ids(user_pks):
+    """Drop the cached group IDs of these users once the surrounding transaction commits."""
+    keys = [_user_group_ids_cache_key(pk) for pk in user_pks]
+    if not keys:
+        return
+
+    def delete():
+        try:
+            cache.delete_many(keys)
+        except Exception:
+            logger.warning('[utils.py] could not invalidate user group cache', exc_info=True)
+
+    transaction.on_commit(delete)
+
+
+def user_group_fingerprint(user):
+    """
+    Cache key fragment for data whose visibility depends only on the visitor's
+    set of UserGroups: 'anonymous' for guests, otherwise the sorted group IDs
+    (e.g. 'groups-3-7'; 'groups-none' for members without a group).
+    """
+    if not user or not user.is_authenticated:
+        return ANONYMOUS_GROUP_FINGERPRINT
+    ids = user_group_ids(user)
+    return 'groups-' + ('-'.join(str(pk) for pk in ids) if ids else 'none')
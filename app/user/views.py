@@ -35,6 +35,7 @@ from django.core.exceptions import ValidationError
 from inventory.views import staff_required
 from decimal import Decimal
 from order.models import Order
+from order.search import search_orders_by_words
 from commission.models import CommissionLedger
 from .forms import UserSettingsForm
 
@@ -524,20 +525,10 @@ def api_order_history(request):
 
     base_orders = Order.objects.filter(agent=user).prefetch_related('items__product')
 
-    # Optional search: by customer name, phone, product name or SKU (word-based)
+    # Optional search: by order ID, customer name, phone, product name or SKU (word-based)
     order_search_query = (request.GET.get('order_search') or '').strip()
     if order_search_query:
-        terms = [t for t in order_search_query.split() if t]
-        for term in terms:
-            base_orders = base_orders.filter(
-                Q(id__icontains=term) |
-                Q(customer_name__icontains=term) |
-                Q(company_name__icontains=term) |
-                Q(customer_phone__icontains=term) |
-                Q(items__product__name__icontains=term) |
-                Q(items__product__sku__icontains=term)
-            )
-        base_orders = base_orders.distinct()
+        base_orders = search_orders_by_words(base_orders, order_search_query)
 
     # Apply sorting — Date column uses transaction_date when set, else local calendar date of created_at
     sort_field_map = {